@@ -0,0 +1,192 @@
+# file: cache.py
+import os
+import json
+import copy
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", ".cache/extractions")
+EXTRACTION_CACHE_MAX_ITEMS = int(os.getenv("EXTRACTION_CACHE_MAX_ITEMS", "512"))
+# Byte budget of the disk tier; least recently used entries (by mtime) are evicted past it
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def make_cache_key(content_hash: str, prompt: str, deployment: str, schema: Dict[str, Any]) -> str:
+    """
+    Content-addressed key: the same bytes sent through the same prompt,
+    model deployment and output schema always give the same extraction.
+    Changing any of the four naturally misses the old entries.
+    """
+    digest = hashlib.sha256()
+    for part in (content_hash, prompt, deployment, json.dumps(schema, sort_keys=True)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier cache for validated `raw_extraction` dicts.
+    Tier 1: bounded in-memory LRU (per process).
+    Tier 2: one JSON file per key on disk, so the cache survives restarts
+            and is shared by every process pointing at the same folder.
+            Kept under max_bytes: a file's mtime is its last use, so every
+            process evicts in the same LRU order.
+    """
+
+    def __init__(self, cache_dir: str = EXTRACTION_CACHE_DIR, max_items: int = EXTRACTION_CACHE_MAX_ITEMS,
+                 max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "writes": 0, "evicted": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                value = copy.deepcopy(self._memory[key])
+            else:
+                value = None
+        if value is not None:
+            # Keeps the entry recent for the disk tier's eviction too
+            _touch(self._path(key))
+            return value
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            self._remember(key, value)
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Dict[str, Any]):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            self._stats["writes"] += 1
+        self._write_disk(key, value)
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """
+        Drops one entry (key given) or the whole cache (key=None) from both tiers.
+        Returns the number of disk entries removed.
+        """
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(key, None)
+
+        removed = 0
+        if key is not None:
+            paths = [self._path(key)]
+        elif os.path.isdir(self.cache_dir):
+            paths = [os.path.join(root, name) for root, _, files in os.walk(self.cache_dir) for name in files]
+        else:
+            paths = []
+
+        for path in paths:
+            if path.endswith(".json") and os.path.exists(path):
+                os.remove(path)
+                removed += 1
+
+        logger.info(f"Extraction cache invalidated ({'all' if key is None else key[:12]}): {removed} entries removed.")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "memory_items": len(self._memory)}
+
+    # --- INTERNALS ---
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        """Insert into the LRU (caller holds the lock)."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        # Shard by prefix so one folder never holds every entry
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        _touch(path)
+        return value
+
+    def _write_disk(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so readers never see a half written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not persist cache entry {key[:12]}: {e}")
+
+    def _evict(self):
+        """Deletes least recently used entries (oldest mtime first) until the disk tier fits max_bytes."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue   # in-flight .tmp writes
+                try:
+                    entries.append((os.path.join(root, name), os.stat(os.path.join(root, name))))
+                except FileNotFoundError:
+                    pass   # evicted by another process meanwhile
+        total = sum(stat.st_size for _, stat in entries)
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime_ns):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            evicted += 1
+        with self._lock:
+            self._stats["evicted"] += evicted
+        logger.info(f"Extraction cache over {self.max_bytes} bytes on disk: evicted {evicted} entries.")
+
+
+def _touch(path: str):
+    """Marks a disk entry as just used (its mtime is the LRU clock)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+# Shared instance used by the extractor node
+extraction_cache = ExtractionCache()
@@ -0,0 +1,317 @@
+# file: downloader.py
+import os
+import json
+import shutil
+import hashlib
+import asyncio
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+# Number of hosts kept in the pool, and keep-alive connections per host
+DOWNLOAD_POOL_HOSTS = int(os.getenv("DOWNLOAD_POOL_HOSTS", "16"))
+DOWNLOAD_POOL_MAXSIZE = int(os.getenv("DOWNLOAD_POOL_MAXSIZE", "32"))
+# Documents are buffered in memory up to this size, and only spill to a temp file above it
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+# Hard cap for any single document (download, upload or file://)
+MAX_DOCUMENT_BYTES = int(os.getenv("MAX_DOCUMENT_BYTES", str(50 * 1024 * 1024)))
+# Conditional-GET cache (ETag / Last-Modified); empty string disables it
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", ".cache/downloads")
+# Byte budget for cached bodies; least recently used blobs are evicted past it
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when a document goes over MAX_DOCUMENT_BYTES."""
+
+
+@dataclass
+class DownloadResult:
+    """A downloaded document, positioned at offset 0 and ready to parse."""
+    buffer: Any             # binary file-like object (caller closes it)
+    content_hash: str       # sha256 of the body, computed while streaming
+    size: int
+    not_modified: bool      # True when served from the local cache after a 304
+
+
+class DocumentDownloader:
+    """
+    Shared HTTP downloader for the parse node.
+    - One pooled requests.Session (sync) and one httpx.AsyncClient per event
+      loop (async), so repeated downloads from the same blob host reuse
+      TCP+TLS connections.
+    - Connect/read timeouts and a max-bytes limit on every request.
+    - ETag/Last-Modified validators stored on disk: a repeated URL is
+      revalidated with a conditional GET and a 304 is served locally.
+      Cached bodies are kept under cache_max_bytes; a blob's mtime is its
+      last use, so every process sharing the folder evicts in LRU order.
+    """
+
+    def __init__(self, cache_dir: str = DOWNLOAD_CACHE_DIR, max_bytes: int = MAX_DOCUMENT_BYTES,
+                 cache_max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_max_bytes = cache_max_bytes
+        self.stats = {"requests": 0, "not_modified": 0, "bytes_downloaded": 0, "evicted": 0}
+        self._stats_lock = threading.Lock()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_HOSTS, pool_maxsize=DOWNLOAD_POOL_MAXSIZE)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # httpx clients are bound to the loop they were first used on
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    # --- PUBLIC API ---
+
+    def download(self, url: str) -> DownloadResult:
+        meta = self._load_meta(url)
+        response = self._session.get(
+            url,
+            stream=True,
+            headers=_conditional_headers(meta),
+            timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT),
+        )
+        try:
+            if response.status_code == 304 and meta:
+                cached = self._serve_cached(url, meta)
+                if cached:
+                    return cached
+                # Evicted since the revalidation was sent: fetch it whole
+                response.close()
+                return self.download(url)
+            response.raise_for_status()
+            _check_declared_size(response.headers, self.max_bytes)
+
+            buffer, digest, size = _new_buffer(), hashlib.sha256(), 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                size = self._write_capped(buffer, chunk, digest, size)
+        finally:
+            response.close()
+
+        return self._finish(url, response.headers, buffer, digest, size)
+
+    async def adownload(self, url: str) -> DownloadResult:
+        meta = await asyncio.to_thread(self._load_meta, url)
+        client = self._get_async_client()
+        async with client.stream("GET", url, headers=_conditional_headers(meta)) as response:
+            revalidated = response.status_code == 304 and meta
+            if revalidated:
+                cached = await asyncio.to_thread(self._serve_cached, url, meta)
+            else:
+                response.raise_for_status()
+                _check_declared_size(response.headers, self.max_bytes)
+
+                buffer, digest, size = _new_buffer(), hashlib.sha256(), 0
+                async for chunk in response.aiter_bytes(chunk_size=CHUNK_SIZE):
+                    size = self._write_capped(buffer, chunk, digest, size)
+
+        if revalidated:
+            # None when evicted since the revalidation was sent: fetch it whole
+            return cached or await self.adownload(url)
+        return await asyncio.to_thread(self._finish, url, response.headers, buffer, digest, size)
+
+    def close(self):
+        self._session.close()
+
+    # --- INTERNALS ---
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(DOWNLOAD_READ_TIMEOUT, connect=DOWNLOAD_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=DOWNLOAD_POOL_HOSTS * DOWNLOAD_POOL_MAXSIZE,
+                    max_keepalive_connections=DOWNLOAD_POOL_MAXSIZE,
+                ),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _write_capped(self, buffer, chunk: bytes, digest, size: int) -> int:
+        """Appends a chunk, hashing it and enforcing the max-bytes limit."""
+        size += len(chunk)
+        if size > self.max_bytes:
+            buffer.close()
+            raise DocumentTooLargeError(f"Document exceeds {self.max_bytes} bytes")
+        buffer.write(chunk)
+        digest.update(chunk)
+        return size
+
+    def _finish(self, url: str, headers, buffer, digest, size: int) -> DownloadResult:
+        content_hash = digest.hexdigest()
+        self._count(requests=1, bytes_downloaded=size)
+        self._store(url, headers, buffer, content_hash, size)
+        buffer.seek(0)
+        logger.info(f"Downloaded {size} bytes (sha256 {content_hash[:12]}).")
+        return DownloadResult(buffer=buffer, content_hash=content_hash, size=size, not_modified=False)
+
+    def _serve_cached(self, url: str, meta: Dict[str, Any]) -> Optional[DownloadResult]:
+        """The cached body after a 304, or None if another process just evicted it."""
+        blob_path = self._blob_path(meta["content_hash"])
+        try:
+            blob = open(blob_path, "rb")
+        except FileNotFoundError:
+            return None
+        _touch(blob_path)
+        self._count(requests=1, not_modified=1)
+        logger.info(f"304 Not Modified: serving cached copy of {url}")
+        return DownloadResult(buffer=blob, content_hash=meta["content_hash"], size=meta["size"], not_modified=True)
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    # --- CONDITIONAL-GET CACHE (disk) ---
+
+    def _meta_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, "meta", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", content_hash)
+
+    def _load_meta(self, url: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = self._meta_path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        # Validators are useless without the body they describe
+        return meta if os.path.exists(self._blob_path(meta["content_hash"])) else None
+
+    def _store(self, url: str, headers, buffer, content_hash: str, size: int):
+        """Keeps body + validators when the server sent any."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not self.cache_dir or not (etag or last_modified) or size > self.cache_max_bytes:
+            return
+        try:
+            blob_path = self._blob_path(content_hash)
+            if os.path.exists(blob_path):
+                _touch(blob_path)
+            else:
+                buffer.seek(0)
+                _atomic_write(blob_path, lambda f: shutil.copyfileobj(buffer, f))
+            meta = {"etag": etag, "last_modified": last_modified, "content_hash": content_hash, "size": size}
+            _atomic_write(self._meta_path(url), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not cache download of {url}: {e}")
+
+    def _evict(self):
+        """
+        Deletes least recently used blobs (oldest mtime first) until the
+        folder fits cache_max_bytes, then the validators left without a body.
+        """
+        blobs = _list_files(os.path.join(self.cache_dir, "blobs"))
+        total = sum(stat.st_size for _, stat in blobs)
+        if total <= self.cache_max_bytes:
+            return
+        evicted = 0
+        for path, stat in sorted(blobs, key=lambda item: item[1].st_mtime_ns):
+            if total <= self.cache_max_bytes:
+                break
+            _remove(path)
+            total -= stat.st_size
+            evicted += 1
+        for path, _ in _list_files(os.path.join(self.cache_dir, "meta")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content_hash = json.load(f)["content_hash"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if not os.path.exists(self._blob_path(content_hash)):
+                _remove(path)
+        self._count(evicted=evicted)
+        logger.info(f"Download cache over {self.cache_max_bytes} bytes: evicted {evicted} blobs.")
+
+
+# --- HELPER FUNCTIONS ---
+
+def _new_buffer():
+    """In-memory buffer that only rolls over to disk past SPOOL_MAX_BYTES."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+
+def _conditional_headers(meta: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def _check_declared_size(headers, max_bytes: int):
+    """Fail fast when Content-Length already says the body is too big."""
+    declared = headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise DocumentTooLargeError(f"Document exceeds {max_bytes} bytes")
+
+
+def _touch(path: str):
+    """Marks a cached blob as just used (its mtime is the LRU clock)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _list_files(folder: str):
+    """(path, stat) of the finished files in a cache folder (skips in-flight .tmp files)."""
+    entries = []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    try:
+                        entries.append((entry.path, entry.stat()))
+                    except FileNotFoundError:
+                        pass   # removed by another process meanwhile
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _atomic_write(path: str, write_fn):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Shared instance used by the parse node
+downloader = DocumentDownloader()
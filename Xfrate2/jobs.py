@@ -0,0 +1,211 @@
+# file: jobs.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import closing
+from typing import Dict, Any, Optional
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Job lifecycle: queued -> running -> completed | failed
+# A 'running' job whose lease has expired (worker crashed / was killed)
+# is treated as 'queued' again by the next claim().
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id        TEXT PRIMARY KEY,
+    status        TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    result        TEXT,
+    error         TEXT,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    worker_id     TEXT,
+    lease_expires REAL,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """
+    Durable local job queue backed by SQLite (no external broker).
+    Safe to share between the API process and any number of worker
+    processes on the same host: every state change is a short transaction,
+    and claim() takes the write lock so two workers never get the same job.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None -> we control transactions explicitly (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- PRODUCER SIDE (API) ---
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        """Persists a new job and returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, json.dumps(payload), now, now)
+            )
+        logger.info(f"Job {job_id} queued.")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job record (payload/result decoded) or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    # --- CONSUMER SIDE (Workers) ---
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically takes the oldest runnable job (queued, or running with an
+        expired lease) and leases it to `worker_id`. Returns None if idle.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = ? OR (status = ? AND lease_expires < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (STATUS_QUEUED, STATUS_RUNNING, now)
+            ).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            if row["status"] == STATUS_RUNNING:
+                logger.warning(f"Job {row['job_id']} lease expired (worker {row['worker_id']}). Reclaiming.")
+
+            # A job that keeps killing its workers must not loop forever
+            if row["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                    (STATUS_FAILED, "Max attempts reached (lease expired)", now, row["job_id"])
+                )
+                conn.execute("COMMIT")
+                return self.claim(worker_id)
+
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, attempts = attempts + 1, worker_id = ?, lease_expires = ?, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (STATUS_RUNNING, worker_id, now + self.lease_seconds, now, row["job_id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return self.get(row["job_id"])
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease of a job this worker still owns."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, worker_id, STATUS_RUNNING)
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        Stores the final payload and marks the job completed, if this worker
+        still holds it. False (result dropped) if its lease was lost.
+        """
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                """
+                UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires = NULL, updated_at = ?
+                WHERE job_id = ? AND worker_id = ? AND status = ?
+                """,
+                (STATUS_COMPLETED, json.dumps(result), time.time(), job_id, worker_id, STATUS_RUNNING)
+            )
+        if cur.rowcount != 1:
+            logger.warning(f"Job {job_id} is no longer held by {worker_id}; result dropped.")
+            return False
+        logger.info(f"Job {job_id} completed.")
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Requeues the job, or marks it failed once attempts are used up, if
+        this worker still holds it. False (nothing changed) if its lease was lost.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, STATUS_RUNNING)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                logger.warning(f"Job {job_id} is no longer held by {worker_id}; failure not recorded.")
+                return False
+            status = STATUS_FAILED if row["attempts"] >= self.max_attempts else STATUS_QUEUED
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        logger.warning(f"Job {job_id} attempt {row['attempts']} failed: {error} -> {status}")
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status (for health checks)."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# --- HELPER FUNCTIONS ---
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
@@ -1,39 +1,87 @@
 # file: main.py
 import os
 import sys
-from langgraph.graph import StateGraph, END
+import functools
+from typing import List, Optional, Callable
 # from langchain_core.runnables.graph import MermaidDrawMethod
-from Xfrate2.utils import logger
+from Xfrate2.utils import logger, bind_request_context
 from Xfrate2.state import AgentState
+from Xfrate2.metrics import instrument_node
 
 # --- IMPORT NODES ---
 # We assume your nodes are in the 'nodes' folder. 
 # Make sure you have an empty __init__.py in the 'nodes' folder to make it a package.
-from Xfrate2.nodes.file_reader import parse_document      # Node 1
-from Xfrate2.nodes.extractor import extract_order    # Node 2
-from Xfrate2.nodes.validate_node import validate_data   # Node 3
-from Xfrate2.nodes.finalize_node import finalize_and_route # Node 4
+from Xfrate2.nodes.file_reader import parse_document, aparse_document      # Node 1
+from Xfrate2.nodes.compactor import compact_text, acompact_text   # Node 1.5
+from Xfrate2.nodes.tabular import extract_tables, aextract_tables   # Node 1.8
+from Xfrate2.nodes.extractor import extract_order, aextract_order    # Node 2
+from Xfrate2.nodes.extractor import extract_scanned_pages, aextract_scanned_pages  # Node 2b
+from Xfrate2.nodes.extractor import extract_sheet, aextract_sheet  # Node 2c
+from Xfrate2.nodes.validate_node import validate_data, avalidate_data   # Node 3
+from Xfrate2.nodes.finalize_node import finalize_and_route, afinalize_and_route # Node 4
 
 
-def build_agent():
+def build_agent(async_mode: bool = False, wrap_node: Optional[Callable[[str, Callable], Callable]] = None):
     """
     Constructs the Phase 1 FTL Order Extraction Graph.
-    Flow: Parse -> Extract -> Validate -> Finalize -> END
+    Flow: Parse -> Compact -> Tables -> Extract -> Validate -> Finalize -> END
+    Scanned PDF pages go to the Vision node instead, in parallel with
+    the text pages: Tables -> [Extract | Extract Scanned] -> Validate
+    Table rows read by the fast path (Tables) never reach the LLM.
+    CSV/XLSX documents are streamed in row batches by the Sheet node.
+
+    async_mode=True wires in the async node versions; the compiled graph
+    must then be run with `await app.ainvoke(...)`.
+    Every node records its duration and outcome (metrics.py, GET /metrics)
+    and logs under the request id in its state (utils.request_context);
+    wrap_node(name, node) -> node, if given, wraps the instrumented nodes.
     """
+    # langgraph is the slowest import of the service: loaded when a graph is built
+    from langgraph.graph import StateGraph, END
+
     # 1. Initialize the Graph with the State Schema
     workflow = StateGraph(AgentState)
 
     # 2. Add Nodes
-    workflow.add_node("parse_node", parse_document)
-    workflow.add_node("extract_node", extract_order)
-    workflow.add_node("validate_node", validate_data)
-    workflow.add_node("finalize_node", finalize_and_route)
+    if async_mode:
+        nodes = {
+            "parse_node": aparse_document,
+            "compact_node": acompact_text,
+            "tabular_node": aextract_tables,
+            "extract_node": aextract_order,
+            "vision_extract_node": aextract_scanned_pages,
+            "sheet_extract_node": aextract_sheet,
+            "validate_node": avalidate_data,
+            "finalize_node": afinalize_and_route,
+        }
+    else:
+        nodes = {
+            "parse_node": parse_document,
+            "compact_node": compact_text,
+            "tabular_node": extract_tables,
+            "extract_node": extract_order,
+            "vision_extract_node": extract_scanned_pages,
+            "sheet_extract_node": extract_sheet,
+            "validate_node": validate_data,
+            "finalize_node": finalize_and_route,
+        }
+    for name, node in nodes.items():
+        node = bind_request_context(instrument_node(name, node))
+        workflow.add_node(name, wrap_node(name, node) if wrap_node else node)
 
     # 3. Define Edges (The Flow)
     workflow.set_entry_point("parse_node")
     
-    workflow.add_edge("parse_node", "extract_node")
+    workflow.add_edge("parse_node", "compact_node")
+    workflow.add_edge("compact_node", "tabular_node")
+    workflow.add_conditional_edges(
+        "tabular_node",
+        route_extraction,
+        ["extract_node", "vision_extract_node", "sheet_extract_node", "validate_node"],
+    )
     workflow.add_edge("extract_node", "validate_node")
+    workflow.add_edge("vision_extract_node", "validate_node")
+    workflow.add_edge("sheet_extract_node", "validate_node")
     workflow.add_edge("validate_node", "finalize_node")
     workflow.add_edge("finalize_node", END)
 
@@ -41,6 +89,74 @@ def build_agent():
     app = workflow.compile()
     return app
 
+@functools.lru_cache(maxsize=2)
+def get_agent(async_mode: bool = True):
+    """The compiled graph, built once per process on first use (or by the warmup hook)."""
+    return build_agent(async_mode=async_mode)
+
+def route_extraction(state: AgentState) -> List[str]:
+    """
+    Picks the extraction branches for a parsed document:
+    text (or a plain image) -> extract_node, scanned PDF pages -> vision_extract_node,
+    both for mixed PDFs. A document with neither (or fully read by the
+    tabular fast path) skips the LLM entirely. CSV/XLSX -> sheet_extract_node.
+    """
+    if state.get("sheet_bytes") is not None:
+        return ["sheet_extract_node"]
+
+    branches = []
+    if state.get("extracted_text", "").strip():
+        branches.append("extract_node")
+    if state.get("page_images"):
+        branches.append("vision_extract_node")
+    if not branches:
+        if state.get("raw_extraction", {}).get("orders"):
+            logger.info("Every order was read by the tabular fast path; skipping the LLM.")
+        else:
+            logger.warning("Document has no text layer and no extractable images; skipping extraction.")
+        return ["validate_node"]
+    return branches
+
+def build_initial_state(document_url: str, document_bytes: bytes = None,
+                        request_id: str = None, log_level: str = None) -> dict:
+    """
+    Fresh graph input for one document (shared by the API and the job workers).
+    `document_bytes` carries an uploaded file; document_url then only names it.
+    `request_id` tags the run's log records; `log_level` overrides LOG_LEVEL for it.
+    """
+    return {
+        "document_url": document_url,
+        "document_bytes": document_bytes,
+        "request_id": request_id or "-",
+        "log_level": log_level,
+        "file_path": "", # Will be handled by Node 1
+        "extracted_text": "",
+        "file_type": "",
+        "raw_extraction": {},
+        "validation_errors": [],
+        "final_orders": [],
+        "needs_review": []
+    }
+
+def build_response_payload(request_id: str, result: dict) -> dict:
+    """
+    Formats a finished graph state into the ExtractionResponse shape.
+    """
+    success_list = result.get("final_orders", [])
+    review_list = result.get("needs_review", [])
+
+    return {
+        "status": "completed",
+        "request_id": request_id,
+        "metrics": {
+            "total_found": len(success_list) + len(review_list),
+            "success": len(success_list),
+            "needs_review": len(review_list)
+        },
+        "successful_orders": success_list,
+        "orders_requiring_review": review_list
+    }
+
 def run_pipeline(file_path: str):
     """
     Helper to run the agent on a single file.
@@ -0,0 +1,279 @@
+# file: metrics.py
+"""
+Process-local metrics, exposed on GET /metrics in the Prometheus text
+format (version 0.0.4).
+
+Every graph node is timed by build_agent() (instrument_node), and the LLM
+calls of the extraction nodes count attempts, retries, latency and the
+tokens reported in completion.usage. Series are labelled with the
+document's file type and the Azure deployment.
+
+A small registry of its own (counters and histograms) rather than
+prometheus_client: the service needs two metric types and no push or
+multiprocess support, and it keeps the dependency list unchanged.
+"""
+import os
+import time
+import bisect
+import asyncio
+import functools
+import threading
+import contextvars
+from typing import Dict, Any, List, Tuple, Optional, Callable, Sequence
+from Xfrate2.utils import logger, deployment_name
+
+# --- CONFIGURATION ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Node and LLM latency buckets (seconds): parsing is milliseconds, large documents minutes
+LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120,300"
+    ).split(",")
+)
+
+# File type of the document being processed; set by instrument_node for everything the node calls
+_file_type: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_file_type", default="unknown")
+
+
+class _Metric:
+    """Labelled series of one metric; thread-safe."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for key, value in series:
+                lines.extend(self._samples(dict(zip(self.labelnames, key)), value))
+        return lines
+
+    def _samples(self, labels: Dict[str, str], value) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+    def _samples(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, +Inf last; then count and sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += 1
+            series[2] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[1] if series else 0
+
+    def _samples(self, labels, value):
+        counts, total, value_sum = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {total}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value_sum)}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered together for GET /metrics."""
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Drops every series (tests)."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+# Global instance, like extraction_cache and rate_limiter
+registry = MetricsRegistry()
+
+NODE_DURATION = registry.register(Histogram(
+    "xfrate_node_duration_seconds", "Time spent in each graph node, by outcome (ok, error).",
+    ["node", "file_type", "deployment", "outcome"],
+))
+LLM_ATTEMPTS = registry.register(Counter(
+    "xfrate_llm_attempts_total",
+    "Extraction attempts of the LLM retry loop, by outcome (ok, unusable_response, timeout, error).",
+    ["file_type", "deployment", "outcome"],
+))
+LLM_RETRIES = registry.register(Counter(
+    "xfrate_llm_retries_total",
+    "LLM requests sent again, by reason (rate_limited, transient, timeout, unusable_response, repair).",
+    ["file_type", "deployment", "reason"],
+))
+LLM_REQUEST_DURATION = registry.register(Histogram(
+    "xfrate_llm_request_duration_seconds",
+    "Latency of single chat-completion requests, by result (ok, rate_limited, transient, timeout, error).",
+    ["file_type", "deployment", "result"],
+))
+LLM_TOKENS = registry.register(Counter(
+    "xfrate_llm_tokens_total", "Tokens reported in completion.usage, by kind (prompt, completion).",
+    ["file_type", "deployment", "kind"],
+))
+
+
+# --- RECORDING ---
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """
+    Wraps a graph node (sync or async) to record its duration and outcome.
+    The file type label comes from the state (the parse node's from its
+    result) and is visible to the LLM metrics of everything the node calls.
+    """
+    if not METRICS_ENABLED:
+        return node
+
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            token = _file_type.set(_state_file_type(state))
+            started = time.perf_counter()
+            result, outcome = None, "error"
+            try:
+                result = await node(state)
+                outcome = "ok"
+                return result
+            finally:
+                _observe_node(name, state, result, outcome, time.perf_counter() - started)
+                _file_type.reset(token)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        token = _file_type.set(_state_file_type(state))
+        started = time.perf_counter()
+        result, outcome = None, "error"
+        try:
+            result = node(state)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_node(name, state, result, outcome, time.perf_counter() - started)
+            _file_type.reset(token)
+    return wrapper
+
+
+def record_llm_attempt(outcome: str):
+    if METRICS_ENABLED:
+        LLM_ATTEMPTS.inc(outcome=outcome, **_llm_labels())
+
+
+def record_llm_retry(reason: str):
+    if METRICS_ENABLED:
+        LLM_RETRIES.inc(reason=reason, **_llm_labels())
+
+
+def record_llm_request(seconds: float, result: str, usage=None):
+    """One chat-completion request; `usage` is completion.usage when the service answered."""
+    if not METRICS_ENABLED:
+        return
+    labels = _llm_labels()
+    LLM_REQUEST_DURATION.observe(seconds, result=result, **labels)
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt", **labels)
+        LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion", **labels)
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+# --- HELPER FUNCTIONS ---
+
+def _state_file_type(state: Optional[Dict[str, Any]]) -> str:
+    file_type = (state or {}).get("file_type") if isinstance(state, dict) else None
+    return (file_type or "unknown").lower().lstrip(".") or "unknown"
+
+
+def _observe_node(name: str, state, result, outcome: str, seconds: float):
+    try:
+        # The parse node learns the file type: label its run with it
+        file_type = _state_file_type(result) if isinstance(result, dict) and result.get("file_type") else _state_file_type(state)
+        NODE_DURATION.observe(seconds, node=name, file_type=file_type, deployment=deployment_name(), outcome=outcome)
+    except Exception as e:
+        logger.warning(f"Could not record metrics for {name}: {e}")
+
+
+def _llm_labels() -> Dict[str, str]:
+    return {"file_type": _file_type.get(), "deployment": deployment_name()}
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
@@ -0,0 +1,78 @@
+import os
+import asyncio
+import tempfile
+import threading
+import functools
+import http.server
+from Xfrate2.utils import logger
+from Xfrate2.state import AgentState
+from Xfrate2.nodes.file_reader import aparse_document
+from Xfrate2.nodes.validate_node import validate_data, avalidate_data
+from Xfrate2.nodes.finalize_node import finalize_and_route, afinalize_and_route
+
+
+# --- HELPER: Serve a folder over HTTP so the node has a real URL to download ---
+def start_file_server(directory: str):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_async_parse_node():
+    logger.info(">>> TESTING NODE 1 (async): aparse_document <<<")
+    folder = tempfile.mkdtemp()
+    with open(os.path.join(folder, "invoice.txt"), "w") as f:
+        f.write("Order: 10 LCV Trucks\nPickup: Delhi\nDate: Tomorrow")
+
+    server, base_url = start_file_server(folder)
+    try:
+        state: AgentState = {"document_url": f"{base_url}/invoice.txt"}
+
+        # Run several downloads at once on one event loop
+        async def run_many():
+            return await asyncio.gather(*[aparse_document(state) for _ in range(5)])
+
+        results = asyncio.run(run_many())
+
+        for result in results:
+            assert "10 LCV Trucks" in result["extracted_text"]
+            assert result["file_type"] == ".txt"
+            assert result["file_path"] == state["document_url"]
+        print(f"✅ Success! {len(results)} concurrent downloads parsed.")
+    finally:
+        server.shutdown()
+
+
+def test_async_validate_and_finalize_match_sync():
+    logger.info(">>> TESTING NODES 3+4 (async) <<<")
+    state: AgentState = {
+        "document_url": "test_batch_001.pdf",
+        "raw_extraction": {"orders": [
+            {
+                "vehicle_type": {"value": "LCV", "confidence": 0.95},
+                "pickup_address": {"value": "123 Main St", "confidence": 1.0},
+                "destination_address": {"value": "456 Market Rd", "confidence": 1.0},
+                "pickup_date_and_time": {"value": "2026-01-05 14:30", "confidence": 1.0},
+                "total_weight": {"value": 2.5, "confidence": 0.9},
+            },
+            {
+                "vehicle_type": {"value": None, "confidence": 0.0},
+                "pickup_address": {"value": "Some warehouse?", "confidence": 0.4},
+            }
+        ]}
+    }
+
+    state["validation_errors"] = asyncio.run(avalidate_data(state))["validation_errors"]
+    assert state["validation_errors"] == validate_data(state)["validation_errors"]
+
+    result = asyncio.run(afinalize_and_route(state))
+    assert result == finalize_and_route(state)
+    assert result["final_orders"][0]["pickup_date_and_time"] == "05/01/2026 14:30"
+    assert len(result["needs_review"]) == 1
+    print("✅ Async nodes return the same state updates as the sync ones.")
+
+
+if __name__ == "__main__":
+    test_async_parse_node()
+    test_async_validate_and_finalize_match_sync()
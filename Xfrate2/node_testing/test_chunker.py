@@ -0,0 +1,93 @@
+from Xfrate2.utils import logger
+from Xfrate2.nodes.chunker import split_into_chunks, merge_chunk_extractions, CHUNK_OVERLAP_LINES
+
+
+def _order(pickup, destination, weight, description=None):
+    return {
+        "pickup_address": {"value": pickup, "confidence": 1.0},
+        "destination_address": {"value": destination, "confidence": 1.0},
+        "total_weight": {"value": weight, "confidence": 1.0},
+        "product_description": {"value": description, "confidence": 1.0 if description else 0.0},
+    }
+
+
+def test_split_carries_headers_forward():
+    logger.info(">>> TESTING CHUNKER: split <<<")
+    rows = [f"{i} | City{i} | Town{i} | {i}.5" for i in range(1, 301)]
+    text = "ACME Logistics rate sheet\nNo | Origin | Destination | Weight\n" + "\n".join(rows)
+
+    # Small documents are left alone
+    assert [c.text for c in split_into_chunks("one short order", budget_tokens=500)] == ["one short order"]
+
+    chunks = split_into_chunks(text, budget_tokens=500)
+    assert len(chunks) > 1 and chunks[0].overlap_lines == 0
+    for chunk in chunks[1:]:
+        assert "ACME Logistics rate sheet" in chunk.text
+        assert "No | Origin | Destination | Weight" in chunk.text
+        assert chunk.overlap_lines == CHUNK_OVERLAP_LINES
+
+    # Every row lands in at least one chunk, in order
+    positions = [next(i for i, c in enumerate(chunks) if f"\n{row}" in f"\n{c.text}") for row in rows]
+    assert positions == sorted(positions)
+    print(f"✅ Split into {len(chunks)} chunks with header context.")
+
+
+def test_split_prefers_page_boundaries():
+    pages = [f"Page {p}\n" + "\n".join(f"row {p}-{i} with some text" for i in range(20)) for p in range(6)]
+    chunks = split_into_chunks("\n".join(pages), pages=pages, budget_tokens=250)
+    # No page is cut in half when whole pages fit the budget
+    for p in range(6):
+        holders = [c for c in chunks if f"row {p}-0 " in c.text and f"row {p}-19 " in c.text]
+        assert holders, f"page {p} was split across chunks"
+
+
+def test_merge_removes_boundary_duplicates_only():
+    logger.info(">>> TESTING CHUNKER: merge <<<")
+    chunk_1 = {"orders": [_order("Delhi", "Mumbai", 10.0), _order("Pune", "Goa", 5.0)]}
+    # Pune->Goa repeated by the overlap, this time with more fields filled
+    chunk_2 = {"orders": [_order("Pune", "Goa", 5.0, "Steel"), _order("Agra", "Kanpur", 7.0),
+                          _order("Agra", "Kanpur", 7.0)]}
+
+    merged, complete = merge_chunk_extractions([chunk_1, chunk_2], [0, 1])
+    lanes = [(o["pickup_address"]["value"], o["destination_address"]["value"]) for o in merged["orders"]]
+    assert complete
+    assert lanes == [("Delhi", "Mumbai"), ("Pune", "Goa"), ("Agra", "Kanpur"), ("Agra", "Kanpur")]
+    assert merged["orders"][1]["product_description"]["value"] == "Steel"
+
+    # A failed chunk keeps the others, but marks the merge incomplete
+    merged, complete = merge_chunk_extractions([chunk_1, None], [0, 1])
+    assert len(merged["orders"]) == 2 and not complete
+    assert merge_chunk_extractions([None, None]) == (None, False)
+
+    # An order matching the previous chunk away from the overlap is a new order
+    chunk_2 = {"orders": [_order("Pune", "Goa", 5.0), _order("Delhi", "Mumbai", 10.0)]}
+    merged, _ = merge_chunk_extractions([chunk_1, chunk_2], [0, 1])
+    assert len(merged["orders"]) == 3
+    # Without overlap (e.g. Vision page batches) nothing is deduplicated
+    assert len(merge_chunk_extractions([chunk_1, chunk_2])[0]["orders"]) == 4
+    print("✅ Merge keeps order and removes boundary duplicates.")
+
+
+def test_identical_rows_across_a_boundary_are_kept():
+    # A dispatch plan sending the same LCV from Delhi to Mumbai every day
+    rows = ["Delhi | Mumbai | LCV | 10 | daily dispatch" for _ in range(300)]
+    text = "Dispatch plan\nOrigin | Destination | Vehicle | Weight | Note\n" + "\n".join(rows)
+    chunks = split_into_chunks(text, budget_tokens=500)
+    assert len(chunks) > 1
+
+    # Stand-in for the LLM: one order per row in the chunk body (carried context excluded)
+    results = []
+    for chunk in chunks:
+        body = chunk.text.split("[End of context]\n\n")[-1]
+        results.append({"orders": [_order("Delhi", "Mumbai", 10.0) for line in body.splitlines() if "| LCV |" in line]})
+
+    merged, complete = merge_chunk_extractions(results, [chunk.overlap_lines for chunk in chunks])
+    assert complete and len(merged["orders"]) == len(rows)
+    print(f"✅ {len(rows)} identical rows over {len(chunks)} chunks: only the overlap copies removed.")
+
+
+if __name__ == "__main__":
+    test_split_carries_headers_forward()
+    test_split_prefers_page_boundaries()
+    test_merge_removes_boundary_duplicates_only()
+    test_identical_rows_across_a_boundary_are_kept()
@@ -0,0 +1,85 @@
+import os
+from collections import Counter
+from Xfrate2.utils import logger
+from Xfrate2.nodes.compactor import compact_text, compact_pages
+from Xfrate2.parsers.pdf import extract_pdf_pages
+
+INPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "input")
+
+PAGE_1 = """ACME LOGISTICS PVT LTD
+Rate sheet Jan 2026
+Origin   |   Destination  | Weight
+Delhi | Mumbai | 10
+
+
+
+Page 1 of 2
+Terms and Conditions
+1. Payment within 30 days
+2. Detention charged after 24 hours"""
+
+PAGE_2 = """ACME LOGISTICS PVT LTD
+Origin   |   Destination  | Weight
+Pune | Goa | 5
+This is a computer generated document
+2"""
+
+
+def test_compact_node():
+    logger.info(">>> TESTING NODE 1.5: compact_text <<<")
+    state = {"extracted_text": PAGE_1 + "\n" + PAGE_2, "pages": [PAGE_1, PAGE_2], "file_type": ".pdf"}
+    result = compact_text(state)
+    text = result["extracted_text"]
+    print(text)
+
+    # Data rows survive, in order
+    assert text.index("Delhi | Mumbai | 10") < text.index("Pune | Goa | 5")
+    # Running header kept once, page numbers / boilerplate / T&C block dropped
+    assert text.count("ACME LOGISTICS PVT LTD") == 1
+    assert "Page 1 of 2" not in text
+    assert "Terms and Conditions" not in text and "Detention" not in text
+    assert "computer generated" not in text
+    # Whitespace normalized, but a column gap is kept
+    assert "Origin  |  Destination  | Weight" in text
+    assert "\n\n\n" not in text
+
+    stats = result["compaction_stats"]
+    assert stats["tokens_after"] < stats["tokens_before"]
+    assert len(result["pages"]) == 2
+    print(f"✅ Compaction saved {stats['tokens_before'] - stats['tokens_after']} tokens.")
+
+
+def _words(pages):
+    return Counter(line.strip().lower() for page in pages for line in page.splitlines() if line.strip())
+
+
+def test_table_cells_in_page_body_survive():
+    # pypdf emits these PDFs one table cell per line: quantities, "HCV", "AM", "Mumbai"
+    # repeat on every page and look like page numbers, but sit in the page body
+    for name in ("FileD (3).pdf", "FileB.pdf"):
+        with open(os.path.join(INPUT_DIR, name), "rb") as f:
+            pages = [page["text"] for page in extract_pdf_pages(f.read())]
+        lost = _words(pages) - _words(compact_pages(pages))
+        assert not lost, f"{name}: {dict(lost)}"
+    print("✅ Table cells in the page body are never taken for page numbers or running headers.")
+
+
+def test_page_number_must_match_the_page():
+    page_1 = "\n".join(["Invoice 77", "Dispatch plan", "2", "HCV", "Okhla", "Mumbai", "2", "Remarks", "Signed", "1"])
+    page_2 = "\n".join(["1", "LCV", "Pune", "Goa", "1", "AM", "Noted", "Invoice 77", "Stamp", "2"])
+    page_1_kept, page_2_kept = compact_pages([page_1, page_2])
+    # "1" / "2" as the last line of their own page are page numbers; the same numbers elsewhere are data
+    assert page_1_kept.splitlines() == page_1.splitlines()[:-1]
+    assert page_2_kept.splitlines() == page_2.splitlines()[:-1]
+    print("✅ Only a page's own number on its first/last line is dropped.")
+
+
+def test_compact_node_skips_images():
+    assert compact_text({"extracted_text": "aGVsbG8=", "file_type": ".png"}) == {}
+
+
+if __name__ == "__main__":
+    test_compact_node()
+    test_table_cells_in_page_body_survive()
+    test_page_number_must_match_the_page()
+    test_compact_node_skips_images()
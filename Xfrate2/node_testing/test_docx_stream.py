@@ -0,0 +1,52 @@
+import os
+from io import BytesIO
+from docx import Document
+from Xfrate2.utils import logger
+from Xfrate2.parsers.docx_stream import iter_docx_blocks
+
+SAMPLE_DOCX = os.path.join(os.path.dirname(__file__), "..", "input", "FileA.docx")
+
+
+def _build_docx() -> bytes:
+    doc = Document()
+    doc.add_paragraph("Dispatch plan")
+    table = doc.add_table(rows=2, cols=3)
+    for cell, text in zip(table.rows[0].cells, ["Origin", "Destination", "Weight"]):
+        cell.text = text
+    for cell, text in zip(table.rows[1].cells, ["Delhi", "Mumbai", "14.5 MT"]):
+        cell.text = text
+    # A table inside a cell is read as part of that cell
+    table.rows[1].cells[2].add_table(rows=1, cols=1).rows[0].cells[0].text = "(each)"
+    doc.add_paragraph("Regards")
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def test_docx_blocks_in_document_order():
+    logger.info(">>> TESTING STREAMING DOCX READER <<<")
+    blocks = list(iter_docx_blocks(BytesIO(_build_docx())))
+
+    assert blocks == [
+        "Dispatch plan",
+        "Origin | Destination | Weight",
+        "Delhi | Mumbai | 14.5 MT (each)",
+        "Regards",
+    ]
+    print("✅ Paragraphs and table rows streamed in document order.")
+
+
+def test_docx_paragraphs_match_python_docx():
+    with open(SAMPLE_DOCX, "rb") as f:
+        blocks = list(iter_docx_blocks(f))
+    paragraphs = [para.text for para in Document(SAMPLE_DOCX).paragraphs]
+
+    # Same paragraphs, plus the table rows python-docx's .paragraphs skips
+    assert [block for block in blocks if block in paragraphs] == paragraphs
+    assert any(block.startswith("S.No | Origin | Destination") for block in blocks)
+    print(f"✅ {len(paragraphs)} paragraphs match python-docx; tables included.")
+
+
+if __name__ == "__main__":
+    test_docx_blocks_in_document_order()
+    test_docx_paragraphs_match_python_docx()
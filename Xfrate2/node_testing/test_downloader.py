@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import functools
+import http.server
+from Xfrate2.utils import logger
+from Xfrate2.downloader import DocumentDownloader, DocumentTooLargeError
+
+
+# --- HELPER: Local file server (sends Last-Modified, answers If-Modified-Since with 304) ---
+def start_file_server(directory: str):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_downloader_conditional_get_and_hash():
+    logger.info(">>> TESTING DOWNLOADER <<<")
+    folder = tempfile.mkdtemp()
+    body = b"Order: 10 LCV Trucks\n" * 100
+    with open(os.path.join(folder, "invoice.txt"), "wb") as f:
+        f.write(body)
+    # Make sure the Last-Modified second is in the past
+    os.utime(os.path.join(folder, "invoice.txt"), (1_700_000_000, 1_700_000_000))
+
+    server, base_url = start_file_server(folder)
+    try:
+        downloader = DocumentDownloader(cache_dir=tempfile.mkdtemp())
+        url = f"{base_url}/invoice.txt"
+
+        # 1. First download: full body, hash computed while streaming
+        first = downloader.download(url)
+        assert first.buffer.read() == body
+        assert first.content_hash == hashlib.sha256(body).hexdigest()
+        assert not first.not_modified
+
+        # 2. Repeat: conditional GET -> 304 -> served from local cache
+        second = downloader.download(url)
+        assert second.not_modified
+        assert second.buffer.read() == body
+        assert second.content_hash == first.content_hash
+
+        # 3. Async path shares the same cache
+        third = asyncio.run(downloader.adownload(url))
+        assert third.not_modified
+        assert third.buffer.read() == body
+        assert downloader.stats["not_modified"] == 2
+        print("✅ Conditional GET served repeats from cache.")
+
+        # 4. Max-bytes limit
+        small = DocumentDownloader(cache_dir="", max_bytes=100)
+        try:
+            small.download(url)
+            assert False, "Should have raised DocumentTooLargeError"
+        except DocumentTooLargeError:
+            print("✅ Oversized download rejected.")
+    finally:
+        server.shutdown()
+
+
+def test_download_cache_evicts_least_recently_used():
+    folder = tempfile.mkdtemp()
+    for name in ("a", "b", "c"):
+        with open(os.path.join(folder, f"{name}.txt"), "wb") as f:
+            f.write(name.encode() * 1000)
+        os.utime(os.path.join(folder, f"{name}.txt"), (1_700_000_000, 1_700_000_000))
+
+    server, base_url = start_file_server(folder)
+    try:
+        cache_dir = tempfile.mkdtemp()
+        # Room for two of the three 1000-byte bodies
+        downloader = DocumentDownloader(cache_dir=cache_dir, cache_max_bytes=2500)
+        first = downloader.download(f"{base_url}/a.txt")
+        time.sleep(0.02)
+        downloader.download(f"{base_url}/b.txt")
+        time.sleep(0.02)
+        assert downloader.download(f"{base_url}/a.txt").not_modified   # a is now the most recent
+        time.sleep(0.02)
+        downloader.download(f"{base_url}/c.txt")
+
+        assert downloader.stats["evicted"] == 1
+        blobs = os.listdir(os.path.join(cache_dir, "blobs"))
+        assert len(blobs) == 2 and first.content_hash in blobs
+        assert len(os.listdir(os.path.join(cache_dir, "meta"))) == 2   # b's validators went with its body
+        assert downloader.download(f"{base_url}/a.txt").not_modified
+        again = downloader.download(f"{base_url}/b.txt")
+        assert not again.not_modified and again.buffer.read() == b"b" * 1000
+        print("✅ Download cache kept under its byte budget, evicting the least recently used body.")
+
+        # A body evicted between the conditional GET and the 304 is fetched again
+        os.remove(os.path.join(cache_dir, "blobs", first.content_hash))
+        load_meta = downloader._load_meta
+        stale = [{"last_modified": "Tue, 14 Nov 2023 22:13:20 GMT", "content_hash": first.content_hash, "size": 1000}]
+        # The first lookup still sees the blob; the retry sees it gone
+        downloader._load_meta = lambda url: stale.pop() if stale else load_meta(url)
+        try:
+            refetched = asyncio.run(downloader.adownload(f"{base_url}/a.txt"))
+        finally:
+            downloader._load_meta = load_meta
+        assert not refetched.not_modified and refetched.buffer.read() == b"a" * 1000
+        print("✅ Blob evicted during revalidation: downloaded again.")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_downloader_conditional_get_and_hash()
+    test_download_cache_evicts_least_recently_used()
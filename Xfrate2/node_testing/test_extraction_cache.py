@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import tempfile
+from Xfrate2.utils import logger
+from Xfrate2.cache import ExtractionCache, make_cache_key
+
+
+SAMPLE = {"orders": [{"vehicle_type": {"value": "LCV", "confidence": 0.9, "reasoning": None}}]}
+
+
+def test_cache_key_changes_with_inputs():
+    base = make_cache_key("abc", "prompt", "gpt-4o", {"type": "object"})
+    assert base == make_cache_key("abc", "prompt", "gpt-4o", {"type": "object"})
+    assert base != make_cache_key("abd", "prompt", "gpt-4o", {"type": "object"})
+    assert base != make_cache_key("abc", "prompt v2", "gpt-4o", {"type": "object"})
+    assert base != make_cache_key("abc", "prompt", "gpt-4o-mini", {"type": "object"})
+    assert base != make_cache_key("abc", "prompt", "gpt-4o", {"type": "array"})
+
+
+def test_cache_tiers_and_invalidation():
+    logger.info(">>> TESTING EXTRACTION CACHE <<<")
+    cache_dir = tempfile.mkdtemp()
+    cache = ExtractionCache(cache_dir, max_items=1)
+
+    assert cache.get("k1") is None
+    cache.put("k1", SAMPLE)
+    cache.put("k2", SAMPLE)        # evicts k1 from memory (max_items=1)
+
+    # Both are still served from disk once pushed out of memory
+    assert cache.get("k1") == SAMPLE
+    assert cache.get("k2") == SAMPLE
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["disk_hits"] == 2
+    assert stats["hits"] == 2
+
+    # Callers mutating the result must not corrupt the cache
+    cache.get("k1")["orders"].clear()
+    assert cache.get("k1") == SAMPLE
+
+    # A fresh process sees the disk tier ("warm after restart")
+    restarted = ExtractionCache(cache_dir)
+    assert restarted.get("k2") == SAMPLE
+
+    assert restarted.invalidate("k2") == 1
+    assert ExtractionCache(cache_dir).get("k2") is None
+    assert restarted.invalidate() == 1
+    assert ExtractionCache(cache_dir).get("k1") is None
+    print("✅ Cache LRU + disk tier + invalidation work.")
+
+
+def test_disk_tier_evicts_least_recently_used():
+    cache_dir = tempfile.mkdtemp()
+    entry_bytes = len(json.dumps(SAMPLE))
+    # Room on disk for two entries; no memory tier to hide the disk
+    cache = ExtractionCache(cache_dir, max_items=0, max_bytes=int(entry_bytes * 2.5))
+    cache.put("aa1", SAMPLE)
+    time.sleep(0.02)
+    cache.put("bb2", SAMPLE)
+    time.sleep(0.02)
+    assert cache.get("aa1") == SAMPLE   # aa1 is now the most recent
+    time.sleep(0.02)
+    cache.put("cc3", SAMPLE)
+
+    assert cache.stats()["evicted"] == 1
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") == SAMPLE and cache.get("cc3") == SAMPLE
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) == 2
+    print("✅ Disk tier kept under its byte budget, evicting the least recently used entry.")
+
+
+if __name__ == "__main__":
+    test_cache_key_changes_with_inputs()
+    test_cache_tiers_and_invalidation()
+    test_disk_tier_evicts_least_recently_used()
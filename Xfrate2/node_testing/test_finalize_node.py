@@ -1,23 +1,23 @@
 import os
 import sys
 import json
+import tempfile
 from Xfrate2.utils import logger
 from Xfrate2.state import AgentState
-from Xfrate2.nodes.finalize_node import finalize_and_route, SUCCESS_DB_PATH, ERROR_DB_PATH
+from Xfrate2.nodes import finalize_node
+from Xfrate2.nodes.finalize_node import finalize_and_route
+from Xfrate2.order_store import SQLiteOrderStore, STATUS_SUCCESS, STATUS_REVIEW
 
 
 def test_finalize_node():
     logger.info(">>> TESTING NODE 4: finalize_and_route <<<")
-    
-    # Clean up old DB files for clean test
-    if os.path.exists(SUCCESS_DB_PATH): os.remove(SUCCESS_DB_PATH)
-    if os.path.exists(ERROR_DB_PATH): os.remove(ERROR_DB_PATH)
 
     # --- MOCK STATE ---
     # Order 0: Perfect (Should go to Success DB)
     # Order 1: Has Error (Should go to Error DB)
     state: AgentState = {
         "file_path": "test_batch_001.pdf",
+        "request_id": "req_finalize",
         "raw_extraction": {
             "orders": [
                 # Order 0
@@ -40,39 +40,34 @@ def test_finalize_node():
         ]
     }
 
-    # --- RUN NODE ---
-    finalize_and_route(state)
+    # --- RUN NODE (against a fresh store) ---
+    old_store = finalize_node.order_store
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteOrderStore(os.path.join(tmp_dir, "orders.db"))
+        finalize_node.order_store = store
+        try:
+            result = finalize_and_route(state)
+        finally:
+            finalize_node.order_store = old_store
 
-    # --- VERIFY SUCCESS DB ---
-    if os.path.exists(SUCCESS_DB_PATH):
-        with open(SUCCESS_DB_PATH, 'r') as f:
-            success_data = json.load(f)
+        assert len(result["final_orders"]) == 1 and len(result["needs_review"]) == 1
+
+        # --- VERIFY SUCCESS DB ---
+        success_data = [row["record"] for row in store.find(status=STATUS_SUCCESS)]
         print(f"\n[Success DB] Contains {len(success_data)} records.")
-        
         # Check Date Formatting
-        date_val = success_data[0].get("pickup_date_and_time")
-        if date_val == "05/01/2026 14:30":
-            print("✅ Date Formatting Logic (dd/mm/yyyy) Worked!")
-        else:
-            print(f"❌ Date Formatting Failed. Got: {date_val}")
-    else:
-        print("❌ Success DB file not created.")
+        assert success_data[0].get("pickup_date_and_time") == "05/01/2026 14:30"
+        print("✅ Date Formatting Logic (dd/mm/yyyy) Worked!")
 
-    # --- VERIFY ERROR DB ---
-    if os.path.exists(ERROR_DB_PATH):
-        with open(ERROR_DB_PATH, 'r') as f:
-            error_data = json.load(f)
-        print(f"[Error DB] Contains {len(error_data)} records.")
-        
+        # --- VERIFY ERROR DB ---
+        error_rows = store.find(status=STATUS_REVIEW)
+        print(f"[Error DB] Contains {len(error_rows)} records.")
         # Check Bundling
-        if len(error_data[0]["issues"]) == 2:
-            print("✅ Error Bundling Worked (Raw Data + 2 Issues preserved).")
-        else:
-            print("❌ Error Bundling Failed.")
-    else:
-        print("❌ Error DB file not created.")
+        assert len(error_rows[0]["record"]["issues"]) == 2
+        assert error_rows[0]["source"] == "test_batch_001.pdf" and error_rows[0]["request_id"] == "req_finalize"
+        print("✅ Error Bundling Worked (Raw Data + 2 Issues preserved).")
 
     print("\n>>> NODE 4 TEST COMPLETE <<<")
 
 if __name__ == "__main__":
-    test_finalize_node()
\ No newline at end of file
+    test_finalize_node()
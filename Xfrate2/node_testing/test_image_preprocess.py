@@ -0,0 +1,58 @@
+import io
+import os
+from PIL import Image
+from Xfrate2.utils import logger
+from Xfrate2.parsers import images
+from Xfrate2.parsers.images import preprocess_image, detect_image_mime
+
+SAMPLE_PNG = os.path.join(os.path.dirname(__file__), "..", "input", "FileC.png")
+
+
+def test_detect_real_format():
+    with open(SAMPLE_PNG, "rb") as f:
+        assert detect_image_mime(f.read()) == "image/png"
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="JPEG")
+    assert detect_image_mime(buffer.getvalue()) == "image/jpeg"
+
+
+def test_preprocess_downscales_and_reencodes():
+    logger.info(">>> TESTING IMAGE PREPROCESSING <<<")
+    with open(SAMPLE_PNG, "rb") as f:
+        original = f.read()
+
+    data, mime, stats = preprocess_image(original)
+    image = Image.open(io.BytesIO(data))
+
+    assert mime == "image/jpeg" and detect_image_mime(data) == "image/jpeg"
+    assert min(image.size) <= images.IMAGE_MAX_SHORT_SIDE
+    assert max(image.size) <= images.IMAGE_MAX_LONG_SIDE
+    assert stats["final_bytes"] == len(data) < stats["original_bytes"]
+    assert stats["bytes_saved"] > 0
+    assert "estimated_latency_saved_ms" in stats
+    print(f"✅ {stats['original_bytes']}B -> {stats['final_bytes']}B")
+
+
+def test_preprocess_grayscale_and_crop():
+    # Dark content block in the middle of a wide white border
+    canvas = Image.new("RGB", (1200, 900), (255, 255, 255))
+    canvas.paste(Image.new("RGB", (400, 300), (20, 20, 20)), (400, 300))
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="PNG")
+
+    old = (images.IMAGE_GRAYSCALE, images.IMAGE_CROP_BORDERS)
+    images.IMAGE_GRAYSCALE, images.IMAGE_CROP_BORDERS = True, True
+    try:
+        data, _, stats = preprocess_image(buffer.getvalue())
+    finally:
+        images.IMAGE_GRAYSCALE, images.IMAGE_CROP_BORDERS = old
+
+    image = Image.open(io.BytesIO(data))
+    assert image.mode == "L"
+    assert image.size == (400, 300)
+
+
+if __name__ == "__main__":
+    test_detect_real_format()
+    test_preprocess_downscales_and_reencodes()
+    test_preprocess_grayscale_and_crop()
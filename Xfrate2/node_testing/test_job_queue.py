@@ -0,0 +1,101 @@
+import os
+import time
+import asyncio
+import sqlite3
+import tempfile
+from contextlib import closing
+from Xfrate2.utils import logger
+from Xfrate2.jobs import JobQueue
+from Xfrate2.worker import _process_job
+
+
+def test_job_queue_lifecycle():
+    logger.info(">>> TESTING JOB QUEUE <<<")
+    db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    queue = JobQueue(db_path)
+
+    # 1. Submit -> queued
+    job_id = queue.submit({"document_url": "http://example.com/a.pdf", "request_id": "req_1"})
+    assert queue.get(job_id)["status"] == "queued"
+
+    # 2. Claim -> running, and nobody else can claim it
+    job = queue.claim("worker-a")
+    assert job["job_id"] == job_id
+    assert job["status"] == "running"
+    assert job["payload"]["request_id"] == "req_1"
+    assert queue.claim("worker-b") is None
+
+    # 3. Complete -> result stored
+    assert queue.complete(job_id, "worker-a", {"status": "completed", "request_id": "req_1"})
+    done = queue.get(job_id)
+    assert done["status"] == "completed"
+    assert done["result"]["request_id"] == "req_1"
+    print("✅ Submit / claim / complete works.")
+
+
+def test_job_queue_survives_restart_and_crashed_worker():
+    db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    job_id = JobQueue(db_path).submit({"document_url": "http://example.com/b.pdf"})
+
+    # A new process (new JobQueue on the same file) still sees the queued job
+    queue = JobQueue(db_path, lease_seconds=0.05, max_attempts=2)
+    assert queue.claim("worker-a")["job_id"] == job_id
+
+    # worker-a "dies": once the lease expires the job is handed out again
+    time.sleep(0.1)
+    reclaimed = queue.claim("worker-b")
+    assert reclaimed["job_id"] == job_id
+    assert reclaimed["attempts"] == 2
+
+    # worker-a comes back: its lease is gone, so it can neither finish nor fail the job
+    assert not queue.heartbeat(job_id, "worker-a")
+    assert not queue.complete(job_id, "worker-a", {"status": "completed"})
+    assert not queue.fail(job_id, "worker-a", "late")
+    assert queue.get(job_id)["status"] == "running" and queue.get(job_id)["worker_id"] == "worker-b"
+
+    # A failure on the last attempt is final
+    assert queue.fail(job_id, "worker-b", "boom")
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.counts() == {"failed": 1}
+    print("✅ Queue survives restarts and reclaims expired leases.")
+
+
+class _SlowAgent:
+    """Stands in for the graph: a run that outlives its lease."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def ainvoke(self, state):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {}
+
+
+def test_worker_abandons_a_job_it_lost():
+    db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    queue = JobQueue(db_path, lease_seconds=0.3)
+    job_id = queue.submit({"document_url": "http://example.com/c.pdf"})
+    job = queue.claim("worker-a")
+
+    # The job is taken over (as after a lease expiry) while worker-a still runs it
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute("UPDATE jobs SET worker_id = 'worker-b' WHERE job_id = ?", (job_id,))
+
+    agent = _SlowAgent()
+    started = time.perf_counter()
+    asyncio.run(_process_job(queue, agent, job, "worker-a"))
+
+    # Dropped at the first failed heartbeat, not run to the end
+    assert agent.cancelled and time.perf_counter() - started < 1
+    assert queue.get(job_id)["status"] == "running" and queue.get(job_id)["worker_id"] == "worker-b"
+    print("✅ A worker that loses its lease abandons the job to its new owner.")
+
+
+if __name__ == "__main__":
+    test_job_queue_lifecycle()
+    test_job_queue_survives_restart_and_crashed_worker()
+    test_worker_abandons_a_job_it_lost()
@@ -0,0 +1,139 @@
+import os
+import json
+import asyncio
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from Xfrate2 import utils
+from Xfrate2.utils import (
+    logger, setup_logger, stop_logging, request_context, bind_request_context, carry_context, log_to_stderr_only
+)
+
+
+def _read_json_lines(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_records_carry_request_id_and_are_written_in_background():
+    logger.info(">>> TESTING STRUCTURED LOGGING <<<")
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "agent.log")
+        test_logger = setup_logger("xfrate_test_json", log_file=path, level="INFO", json_format=True)
+        writers = set()
+        listener = test_logger.handlers[0].listener
+        listener.handlers[0].emit = lambda record: writers.add(threading.current_thread().name)
+
+        @bind_request_context
+        async def node(state):
+            test_logger.info("parsing")
+            # Worker threads of a node keep the request id
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pool.submit(carry_context(lambda: test_logger.warning("row batch"))).result()
+            try:
+                raise ValueError("bad cell")
+            except ValueError:
+                test_logger.error("failed", exc_info=True)
+
+        asyncio.run(node({"request_id": "req_42"}))
+        test_logger.info("idle")
+        stop_logging(test_logger)   # flushes the queue
+
+        records = _read_json_lines(path)
+        assert [r["request_id"] for r in records] == ["req_42", "req_42", "req_42", "-"]
+        assert records[1]["message"] == "row batch" and records[1]["level"] == "WARNING"
+        assert "ValueError: bad cell" in records[2]["exception"]
+        # Formatting and I/O happened on the listener thread, not the callers'
+        assert writers and threading.current_thread().name not in writers
+    print("✅ JSON records tagged with the request id, written by the listener thread.")
+
+
+def test_debug_lines_only_for_requests_that_ask():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "agent.log")
+        test_logger = setup_logger("xfrate_test_levels", log_file=path, level="INFO", json_format=True)
+        assert not test_logger.isEnabledFor(logging.DEBUG)
+
+        test_logger.debug("dropped")
+        with request_context("req_debug", "DEBUG"):
+            assert test_logger.isEnabledFor(logging.DEBUG)
+            test_logger.debug("kept")
+        with request_context("req_quiet", "WARNING"):
+            test_logger.info("dropped too")
+        stop_logging(test_logger)
+
+        assert [(r["request_id"], r["message"]) for r in _read_json_lines(path)] == [("req_debug", "kept")]
+    print("✅ Per-request log level: debug lines only where requested.")
+
+
+def test_log_file_rotates_by_size():
+    old_max_bytes = utils.LOG_MAX_BYTES
+    utils.LOG_MAX_BYTES = 2000
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "agent.log")
+            test_logger = setup_logger("xfrate_test_rotation", log_file=path, use_queue=False)
+            for index in range(100):
+                test_logger.info(f"order {index} " + "x" * 40)
+            for handler in test_logger.handlers:
+                handler.close()
+            assert os.path.exists(path + ".1") and os.path.getsize(path) <= 2000
+            assert not os.path.exists(path + f".{utils.LOG_BACKUP_COUNT + 1}")
+    finally:
+        utils.LOG_MAX_BYTES = old_max_bytes
+    print("✅ Log file rotated at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT files.")
+
+
+def test_log_file_per_process():
+    with tempfile.TemporaryDirectory() as workdir:
+        pattern = os.path.join(workdir, "worker-{pid}.log")
+        test_logger = setup_logger("xfrate_test_pid", log_file=pattern, use_queue=False)
+        path = pattern.replace("{pid}", str(os.getpid()))
+        assert not os.path.exists(path)   # opened on the first record only
+        test_logger.info("hello")
+        for handler in test_logger.handlers:
+            handler.close()
+        with open(path, encoding="utf-8") as f:
+            assert "hello" in f.read()
+    print("✅ {pid} in the log file name gives each process its own file.")
+
+
+def _log_from_pool_worker(message: str) -> int:
+    logger.info(message)
+    for handler in logger.handlers:
+        handler.flush()
+    utils.stop_logging(logger)
+    return os.getpid()
+
+
+def test_pool_workers_do_not_write_the_log_file():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "agent.log")
+        old_log_file = os.environ.get("LOG_FILE")
+        os.environ["LOG_FILE"] = path   # what a spawned worker's own setup_logger would open
+        try:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                pool.submit(_log_from_pool_worker, "unmanaged worker").result()
+            with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=log_to_stderr_only) as pool:
+                pool.submit(_log_from_pool_worker, "pool worker").result()
+        finally:
+            if old_log_file is None:
+                os.environ.pop("LOG_FILE")
+            else:
+                os.environ["LOG_FILE"] = old_log_file
+        with open(path, encoding="utf-8") as f:
+            written = f.read()
+        # Without the initializer the worker would rotate the parent's file too
+        assert "unmanaged worker" in written and "pool worker" not in written
+    print("✅ Pool workers log to stderr and leave LOG_FILE to the parent.")
+
+
+if __name__ == "__main__":
+    test_records_carry_request_id_and_are_written_in_background()
+    test_debug_lines_only_for_requests_that_ask()
+    test_log_file_rotates_by_size()
+    test_log_file_per_process()
+    test_pool_workers_do_not_write_the_log_file()
@@ -0,0 +1,95 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from openai import AzureOpenAI
+from Xfrate2.utils import logger, deployment_name
+from Xfrate2.nodes import extractor, file_reader
+from Xfrate2.main import build_agent, build_initial_state
+from Xfrate2.metrics import (
+    MetricsRegistry, Counter, Histogram, instrument_node, registry,
+    NODE_DURATION, LLM_ATTEMPTS, LLM_REQUEST_DURATION, LLM_TOKENS
+)
+from benchmarks.mock_azure import MockAzureOpenAI
+
+# One row the tabular fast path reads, one it leaves to the LLM (two fields in a cell)
+SHEET = (
+    "Origin,Destination,Vehicle,Body,Qty,Weight (MT),Pickup Date\n"
+    "\"Okhla, Delhi\",\"Bhiwandi, Mumbai\",HCV,Open,1,12,15/01/2026\n"
+    "\"Chakan, Pune\",\"Sanand, Ahmedabad\",2x LCV (Closed Body),Closed,2,7.5,16/01/2026\n"
+)
+
+
+def test_registry_renders_prometheus_text():
+    logger.info(">>> TESTING METRICS REGISTRY <<<")
+    local = MetricsRegistry()
+    calls = local.register(Counter("demo_calls_total", "Calls.", ["kind"]))
+    latency = local.register(Histogram("demo_seconds", "Latency.", ["kind"], buckets=[0.1, 1]))
+    calls.inc(kind='say "hi"')
+    calls.inc(2, kind='say "hi"')
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, kind="a")
+
+    lines = local.render().splitlines()
+    assert "# TYPE demo_calls_total counter" in lines
+    assert 'demo_calls_total{kind="say \\"hi\\""} 3.0' in lines
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 2' in lines   # le is inclusive
+    assert 'demo_seconds_bucket{kind="a",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{kind="a"} 4' in lines and 'demo_seconds_sum{kind="a"} 3.65' in lines
+    try:
+        calls.inc(kind="a", extra="b")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown label accepted")
+    print("✅ Counters and histograms render in the Prometheus text format.")
+
+
+def test_graph_run_records_nodes_and_llm_calls():
+    registry.clear()
+    old_client, old_cache, old_root = extractor.get_client, extractor.EXTRACTION_CACHE_ENABLED, file_reader.LOCAL_FILE_ROOT
+    with tempfile.TemporaryDirectory() as workdir, MockAzureOpenAI(latency_ms=0, jitter_ms=0, ms_per_order=0) as mock:
+        sheet = Path(workdir) / "orders.csv"
+        sheet.write_text(SHEET)
+        client = AzureOpenAI(api_key="offline", api_version="2024-08-01-preview",
+                             azure_endpoint=mock.endpoint, max_retries=0, timeout=10.0)
+        extractor.get_client, extractor.EXTRACTION_CACHE_ENABLED = (lambda: client), False
+        file_reader.LOCAL_FILE_ROOT = workdir
+        try:
+            result = build_agent().invoke(build_initial_state(sheet.as_uri()))
+        finally:
+            extractor.get_client, extractor.EXTRACTION_CACHE_ENABLED = old_client, old_cache
+            file_reader.LOCAL_FILE_ROOT = old_root
+
+    assert len(result["final_orders"]) + len(result["needs_review"]) == 2
+    labels = {"file_type": "csv", "deployment": deployment_name()}
+    for node in ("parse_node", "compact_node", "tabular_node", "sheet_extract_node", "validate_node", "finalize_node"):
+        assert NODE_DURATION.count(node=node, outcome="ok", **labels) == 1, node
+    # Recorded from the sheet node's worker threads, still labelled with the file type
+    assert LLM_ATTEMPTS.value(outcome="ok", **labels) == mock.stats["requests"] == 1
+    assert LLM_REQUEST_DURATION.count(result="ok", **labels) == 1
+    assert LLM_TOKENS.value(kind="prompt", **labels) == mock.stats["prompt_tokens"]
+    assert LLM_TOKENS.value(kind="completion", **labels) == mock.stats["completion_tokens"]
+    assert 'xfrate_node_duration_seconds_count{node="sheet_extract_node",file_type="csv"' in registry.render()
+    print("✅ Every node and the LLM request of a graph run are on /metrics.")
+
+
+def test_failing_node_counts_as_error():
+    registry.clear()
+
+    async def broken(state):
+        raise RuntimeError("boom")
+
+    node = instrument_node("parse_node", broken)
+    try:
+        asyncio.run(node({"file_type": ".PDF"}))
+    except RuntimeError:
+        pass
+    assert NODE_DURATION.count(node="parse_node", file_type="pdf", deployment=deployment_name(), outcome="error") == 1
+    print("✅ Node exceptions are recorded with outcome=error and re-raised.")
+
+
+if __name__ == "__main__":
+    test_registry_renders_prometheus_text()
+    test_graph_run_records_nodes_and_llm_calls()
+    test_failing_node_counts_as_error()
@@ -0,0 +1,75 @@
+from openai import AzureOpenAI, RateLimitError
+from Xfrate2.utils import logger
+from Xfrate2.state import FTLOrder
+from Xfrate2.nodes.schema_profiles import PROFILES
+from benchmarks.mock_azure import MockAzureOpenAI
+
+TABLE = "Origin | Destination | Vehicle\nDelhi | Mumbai | HCV\nPune | Chennai | LCV\nNoida | Jaipur | Trailer"
+
+
+def _client(mock: MockAzureOpenAI) -> AzureOpenAI:
+    return AzureOpenAI(api_key="offline", api_version="2024-08-01-preview",
+                       azure_endpoint=mock.endpoint, max_retries=0, timeout=10.0)
+
+
+def test_stand_in_answers_every_profile():
+    logger.info(">>> TESTING LOCAL AZURE OPENAI STAND-IN <<<")
+    with MockAzureOpenAI(latency_ms=0, jitter_ms=0, ms_per_order=0) as mock:
+        client = _client(mock)
+        for profile in PROFILES.values():
+            completion = client.chat.completions.create(
+                model="gpt-4o", messages=[{"role": "user", "content": TABLE}],
+                response_format=profile.response_format, temperature=0.0,
+            )
+            orders = profile.parse(completion.choices[0].message.content)
+            assert len(orders) == 3, profile.name   # one order per table row
+            for order in orders:
+                FTLOrder.model_validate(order)
+        assert mock.stats["requests"] == len(PROFILES) and completion.usage.total_tokens > 0
+    print("✅ Stand-in answers full, lean and columnar requests through the real client.")
+
+
+def test_stand_in_answers_one_order_per_visible_order():
+    chunk = "\n".join([
+        "[Context carried over from earlier in the document]",
+        "Order 1: please arrange 2 HCV truck(s) from Okhla, Delhi",
+        "S.No | Origin | Destination",
+        "[End of context]",
+        "",
+        "Order 7: please arrange 1 LCV truck(s) from Chakan, Pune",
+        "to Sanand, Ahmedabad for pickup on 05/01/2026 09:00.",
+        "8 | Peenya, Bengaluru | Bhiwandi, Mumbai",
+        "9 | Okhla, Delhi | Sanand, Ahmedabad",
+    ])
+    profile = PROFILES["full"]
+    with MockAzureOpenAI(latency_ms=0, jitter_ms=0, ms_per_order=0) as mock:
+        client = _client(mock)
+        answers = [
+            profile.parse(client.chat.completions.create(
+                model="gpt-4o", messages=[{"role": "user", "content": content}],
+                response_format=profile.response_format, temperature=0.0,
+            ).choices[0].message.content)
+            for content in (chunk, "Order 9: one more")
+        ]
+    # Order 7 and rows 8, 9; the carried context is not counted
+    assert len(answers[0]) == 3
+    # The same order number comes back as the same order (overlapping chunks merge it)
+    assert answers[1][0] == answers[0][2] and answers[0][0] != answers[0][1]
+    print("✅ Stand-in answers one order per 'Order N:' paragraph and table row.")
+
+
+def test_stand_in_rate_limits():
+    with MockAzureOpenAI(latency_ms=0, jitter_ms=0, error_rate=1.0) as mock:
+        try:
+            _client(mock).chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "x"}])
+        except RateLimitError as e:
+            assert e.response.headers["retry-after-ms"] == "50"
+        else:
+            raise AssertionError("expected a 429")
+    print("✅ Stand-in injects 429s with retry-after-ms.")
+
+
+if __name__ == "__main__":
+    test_stand_in_answers_every_profile()
+    test_stand_in_answers_one_order_per_visible_order()
+    test_stand_in_rate_limits()
@@ -1,7 +1,9 @@
 import os
 import shutil
+import tempfile
 from Xfrate2.state import AgentState
-from Xfrate2.nodes.file_reader import parse_document
+from Xfrate2.nodes import file_reader
+from Xfrate2.nodes.file_reader import parse_document, LocalFileNotAllowedError
 from Xfrate2.utils import logger
 
 # --- HELPER: Create Dummy Files for Testing ---
@@ -72,9 +74,82 @@ def test_parse_node():
     cleanup_dummy_files()
     logger.info(">>> NODE 1 TEST COMPLETE <<<\n")
 
+# --- TEST 2: In-memory / local inputs (no download, no temp file) ---
+def test_parse_node_from_bytes_and_file_url():
+    logger.info(">>> TESTING NODE 1: uploaded bytes + file:// <<<")
+    setup_dummy_files()
+    old_root = file_reader.LOCAL_FILE_ROOT
+    file_reader.LOCAL_FILE_ROOT = os.getcwd()
+    try:
+        # Scenario A: Uploaded bytes
+        upload_state: AgentState = {
+            "document_url": "upload://test_invoice.txt",
+            "document_bytes": b"Order: 10 LCV Trucks\nPickup: Delhi",
+        }
+        result = parse_document(upload_state)
+        assert "10 LCV Trucks" in result["extracted_text"]
+        assert result["file_type"] == ".txt"
+        assert len(result["content_hash"]) == 64
+        print("✅ Success! Parsed uploaded bytes.")
+
+        # Scenario B: file:// URL
+        file_state: AgentState = {"document_url": "file://" + os.path.abspath("test_invoice.txt")}
+        result = parse_document(file_state)
+        assert "10 LCV Trucks" in result["extracted_text"]
+        print("✅ Success! Parsed file:// URL.")
+
+        # Scenario C: Missing local file
+        try:
+            parse_document({"document_url": "file://" + os.path.abspath("missing_file.pdf")})
+            assert False, "Should have raised FileNotFoundError"
+        except FileNotFoundError:
+            print("✅ Success! Correctly caught missing file.")
+    finally:
+        file_reader.LOCAL_FILE_ROOT = old_root
+        cleanup_dummy_files()
+
+
+def _assert_refused(doc_url: str):
+    try:
+        parse_document({"document_url": doc_url})
+    except LocalFileNotAllowedError:
+        return
+    raise AssertionError(f"{doc_url} was read")
+
+
+# --- TEST 3: file:// only below LOCAL_FILE_ROOT ---
+def test_file_url_confined_to_local_root():
+    old_root = file_reader.LOCAL_FILE_ROOT
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "docs")
+        os.makedirs(root)
+        inside = os.path.join(root, "order.txt")
+        secret = os.path.join(workdir, "secret.txt")
+        for path in (inside, secret):
+            with open(path, "w") as f:
+                f.write("Order: 2 HCV Trucks")
+        link = os.path.join(root, "link.txt")
+        os.symlink(secret, link)
+        try:
+            # Off by default
+            file_reader.LOCAL_FILE_ROOT = ""
+            _assert_refused("file://" + inside)
+
+            file_reader.LOCAL_FILE_ROOT = root
+            assert "2 HCV" in parse_document({"document_url": "file://" + inside})["extracted_text"]
+            _assert_refused("file://" + secret)
+            _assert_refused("file://" + os.path.join(root, "..", "secret.txt"))
+            _assert_refused("file://" + link)   # a symlink out of the root
+            _assert_refused("file://otherhost" + inside)
+        finally:
+            file_reader.LOCAL_FILE_ROOT = old_root
+    print("✅ file:// refused unless LOCAL_FILE_ROOT is set, and never outside it.")
+
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
     # Uncomment lines below as we add more nodes
     test_parse_node()
+    test_parse_node_from_bytes_and_file_url()
+    test_file_url_confined_to_local_root()
     # test_extraction_node()
     # test_validation_node()
\ No newline at end of file
@@ -0,0 +1,82 @@
+from datetime import datetime
+from dateutil import parser
+from Xfrate2 import normalize
+from Xfrate2.utils import logger
+from Xfrate2.normalize import normalize_date
+from Xfrate2.state import FTLOrder, ENUM_TABLES
+
+
+def test_dates_match_dateutil():
+    logger.info(">>> TESTING DATE NORMALIZATION <<<")
+    samples = [
+        "2026-01-15", "2026-01-15T09:00:00Z", "05/01/2026", "15/01/2026 14:30", "05-01-2026",
+        "15 Jan 2026", "Jan 15, 2026 10:30", "15th Jan 2026", "2026/01/15", "5/1/2026 9:05",
+    ]
+    for dayfirst in (False, True):
+        for sample in samples:
+            expected = parser.parse(sample, dayfirst=dayfirst).strftime("%Y-%m-%d %H:%M")
+            assert normalize_date(sample, dayfirst) == expected, (sample, dayfirst)
+    assert normalize_date("2026-01-05", dayfirst=True) == "2026-01-05 00:00"   # ISO is never swapped
+    assert normalize_date("not a date") is None
+
+    normalize_date.cache_clear()
+    for _ in range(50):
+        normalize_date("15 Jan 2026")
+    assert normalize_date.cache_info().hits == 49
+    print("✅ Dates normalized like dateutil, repeats served from cache.")
+
+
+class _ParserOnDay:
+    """dateutil's parser, with 'today' moved to `day` (as for a worker running for weeks)."""
+
+    def __init__(self, day: datetime):
+        self.day = day
+
+    def parse(self, text, default=None, **kwargs):
+        return parser.parse(text, default=default or self.day, **kwargs)
+
+
+def test_partial_dates_are_not_memoized():
+    normalize_date.cache_clear()
+    old_parser = normalize.parser
+    try:
+        results = []
+        for day in (datetime(2026, 10, 14), datetime(2026, 10, 21), datetime(2027, 3, 1)):
+            normalize.parser = _ParserOnDay(day)
+            results.append((normalize_date("Monday 10am"), normalize_date("15 Jan"), normalize_date("15th Jan 2026")))
+    finally:
+        normalize.parser = old_parser
+    assert [r[0] for r in results] == ["2026-10-19 10:00", "2026-10-26 10:00", "2027-03-01 10:00"]
+    assert [r[1] for r in results] == ["2026-01-15 00:00", "2026-01-15 00:00", "2027-01-15 00:00"]
+    # A complete date is the same on any day, and parsed once
+    assert {r[2] for r in results} == {"2026-01-15 00:00"}
+    assert normalize_date.cache_info().hits >= 2
+    print("✅ Dates missing parts follow the current day; complete dates stay memoized.")
+
+
+def test_enum_tables_stay_per_field():
+    assert ENUM_TABLES["vehicle_type"].lookup("LCV Truck") == "LCV"
+    assert ENUM_TABLES["vehicle_type"].lookup("trailer") == "Trailer"
+    assert ENUM_TABLES["body_type"].lookup("Open truck") == "Open"
+    assert ENUM_TABLES["body_type"].lookup("closed container") == "Closed"
+    assert ENUM_TABLES["pod_type"].lookup("hardcopy") == "Hardcopy"
+    # Body-type words no longer leak into vehicle_type (or the other way round)
+    assert ENUM_TABLES["vehicle_type"].lookup("Open trailer") == "Open trailer"
+    assert ENUM_TABLES["body_type"].lookup("HCV closed") == "Closed"
+
+    field = lambda value: {"value": value, "confidence": 1.0, "reasoning": None}
+    order = FTLOrder.model_validate({
+        "vehicle_type": field("32ft hcv"), "body_type": field("refrigerated"), "number_of_vehicle": field(1),
+        "total_weight": field(10.0), "pickup_address": field("Okhla"), "destination_address": field("Pune"),
+        "product_category": field("FMCG"), "product_description": field("Cartons"),
+        "pickup_date_and_time": field("15 Jan 2026 09:30"),
+    })
+    assert order.vehicle_type.value == "HCV" and order.body_type.value == "Refrigerated"
+    assert order.pickup_date_and_time.value == "2026-01-15 09:30"
+    print("✅ Enum lookups are per field; FTLOrder validators use them.")
+
+
+if __name__ == "__main__":
+    test_dates_match_dateutil()
+    test_partial_dates_are_not_memoized()
+    test_enum_tables_stay_per_field()
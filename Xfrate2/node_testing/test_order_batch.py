@@ -0,0 +1,80 @@
+from Xfrate2.utils import logger
+from Xfrate2.order_batch import OrderBatch
+from Xfrate2.nodes.validate_node import collect_validation_errors
+from Xfrate2.nodes.finalize_node import route_orders
+
+
+def _field(value, confidence=0.95):
+    return {"value": value, "confidence": confidence, "reasoning": None}
+
+
+ORDERS = [
+    {   # Clean
+        "vehicle_type": _field("HCV"), "pickup_address": _field("Okhla, Delhi"),
+        "destination_address": _field("Bhiwandi"), "pickup_date_and_time": _field("2026-01-15 09:00"),
+        "total_weight": _field(12.0), "number_of_vehicle": _field(2),
+    },
+    {   # Missing field, null value, low confidence, negative weight
+        "vehicle_type": _field(None, 0.0), "pickup_address": _field("Somewhere?", 0.4),
+        "pickup_date_and_time": _field("2026-01-15", 0.5),
+        "total_weight": _field("-3"), "number_of_vehicle": _field(-1),
+    },
+    {   # Own key order: its confidence errors follow it
+        "total_weight": _field(5.0), "pickup_date_and_time": _field("2026-01-16 10:30", 0.6),
+        "destination_address": _field("Pune"), "pickup_address": _field("Nashik", 0.7),
+        "vehicle_type": _field("LCV"),
+    },
+]
+
+
+def test_columns_and_dict_view():
+    logger.info(">>> TESTING ORDER BATCH <<<")
+    batch = OrderBatch(ORDERS)
+    weight = batch.column("total_weight")
+
+    assert len(batch) == 3 and batch[1] is ORDERS[1] and list(batch) == ORDERS
+    assert batch.column("destination_address").missing.tolist() == [False, True, False]
+    assert batch.column("vehicle_type").has_value.tolist() == [True, False, True]
+    assert weight.numbers()[1] == -3.0
+    assert batch.reordered == {2}
+    print("✅ Columns built; per-order dicts still available.")
+
+
+def test_validation_keeps_per_order_error_order():
+    errors = collect_validation_errors(OrderBatch(ORDERS))
+    summary = [(e["order_index"], e["field"], e["issue"]) for e in errors]
+
+    assert summary == [
+        (1, "vehicle_type", "Missing required value"),
+        (1, "destination_address", "Field is missing"),
+        (1, "pickup_address", "Low Confidence (0.40)"),
+        (1, "pickup_date_and_time", "Low Confidence (0.50)"),
+        (1, "total_weight", "Weight must be positive"),
+        (1, "number_of_vehicle", "Vehicle count must be at least 1"),
+        (2, "pickup_date_and_time", "Low Confidence (0.60)"),
+        (2, "pickup_address", "Low Confidence (0.70)"),
+    ]
+    assert errors[4]["current_value"] == -3.0
+    print("✅ Errors grouped per order, layers and fields in the usual order.")
+
+
+def test_routing_with_a_shared_batch():
+    batch = OrderBatch(ORDERS)
+    success, review = route_orders(batch, collect_validation_errors(batch, confidence_threshold=0.5))
+
+    assert success == [{
+        "vehicle_type": "HCV", "pickup_address": "Okhla, Delhi", "destination_address": "Bhiwandi",
+        "pickup_date_and_time": "15/01/2026 09:00", "total_weight": 12.0, "number_of_vehicle": 2,
+    }, {
+        "total_weight": 5.0, "pickup_date_and_time": "16/01/2026 10:30", "destination_address": "Pune",
+        "pickup_address": "Nashik", "vehicle_type": "LCV",
+    }]
+    assert [r["order_metadata"]["index"] for r in review] == [1]
+    assert review[0]["raw_data"] is ORDERS[1]
+    print("✅ One batch serves validation and routing at any threshold.")
+
+
+if __name__ == "__main__":
+    test_columns_and_dict_view()
+    test_validation_keeps_per_order_error_order()
+    test_routing_with_a_shared_batch()
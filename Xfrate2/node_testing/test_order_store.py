@@ -0,0 +1,130 @@
+import os
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from Xfrate2.utils import logger
+from Xfrate2.order_store import (
+    OrderStore, SQLiteOrderStore, STATUS_SUCCESS, STATUS_REVIEW, create_order_store, main
+)
+
+
+def _success(number: int, day: int, pickup: str = "Okhla, Delhi") -> dict:
+    return {
+        "vehicle_type": "HCV",
+        "pickup_address": pickup,
+        "destination_address": "Bhiwandi, Mumbai",
+        "pickup_date_and_time": f"{day:02d}/01/2026 09:00",
+        "total_weight": 12.0 + number,
+    }
+
+
+def _review(index: int) -> dict:
+    return {
+        "order_metadata": {"index": index, "source": "b.docx"},
+        "raw_data": {
+            "pickup_address": {"value": "Chakan, Pune", "confidence": 0.9},
+            "destination_address": {"value": "Sanand, Ahmedabad", "confidence": 0.9},
+            "pickup_date_and_time": {"value": "2026-02-03 10:30", "confidence": 0.9},
+        },
+        "issues": [{"order_index": index, "field": "vehicle_type", "issue": "Missing Value"}],
+    }
+
+
+def test_store_indexes_source_date_and_lane():
+    logger.info(">>> TESTING ORDER STORE <<<")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteOrderStore(os.path.join(tmp_dir, "orders.db"))
+        assert store.save([_success(0, 5), _success(1, 20, "Peenya, Bengaluru")], [], source="a.pdf") == 2
+        assert store.save([], [_review(0)], source="b.docx", request_id="req_b") == 1
+
+        assert store.counts() == {STATUS_SUCCESS: 2, STATUS_REVIEW: 1}
+        assert [r["source"] for r in store.find(source="a.pdf")] == ["a.pdf", "a.pdf"]
+        assert [r["pickup_date"] for r in store.find(pickup_from="2026-01-01", pickup_to="2026-01-20")] == \
+            ["2026-01-20", "2026-01-05"]
+        lane = store.find(lane=("Chakan, Pune", "Sanand, Ahmedabad"))
+        assert len(lane) == 1 and lane[0]["status"] == STATUS_REVIEW and lane[0]["request_id"] == "req_b"
+
+        # Each lookup is served by its index, not a table scan
+        with closing(store._connect()) as conn:
+            for where, index in (("source = 'a.pdf'", "idx_orders_source"),
+                                 ("pickup_date >= '2026-01-01'", "idx_orders_pickup_date"),
+                                 ("pickup_address = 'x' AND destination_address = 'y'", "idx_orders_lane")):
+                plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM orders WHERE {where}"))
+                assert index in plan, plan
+    print("✅ Orders stored in bulk; source, pickup date and lane lookups use their indexes.")
+
+
+def test_concurrent_writers_lose_nothing():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "orders.db")
+        # One store per writer: separate connections, as separate workers would have
+        def write(worker: int):
+            store = SQLiteOrderStore(path)
+            for batch in range(10):
+                store.save([_success(n, 1 + n % 28) for n in range(20)], [_review(0)], source=f"w{worker}-{batch}.pdf")
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(write, range(4)))
+        assert SQLiteOrderStore(path).counts() == {STATUS_SUCCESS: 4 * 10 * 20, STATUS_REVIEW: 4 * 10}
+    print("✅ Concurrent writers: every batch committed.")
+
+
+def test_json_files_are_migrated_once():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        success_path = os.path.join(tmp_dir, "success_orders.json")
+        review_path = os.path.join(tmp_dir, "needs_review_orders.json")
+        with open(success_path, "w") as f:
+            json.dump([_success(n, 10) for n in range(3)], f)
+        # The old node's review records used index_in_file / source_file
+        with open(review_path, "w") as f:
+            json.dump([{"order_metadata": {"index_in_file": 4, "source_file": "old.pdf"},
+                        "raw_data": _review(4)["raw_data"], "issues": []}], f)
+
+        db_path = os.path.join(tmp_dir, "orders.db")
+        args = ["--db", db_path, "--migrate", "--success-json", success_path, "--review-json", review_path]
+        assert main(args) == 0
+        store = SQLiteOrderStore(db_path)
+        assert store.migrate_json_files(success_path, review_path) == {}   # already imported
+        assert store.counts() == {STATUS_SUCCESS: 3, STATUS_REVIEW: 1}
+        assert store.find(source="old.pdf")[0]["pickup_date"] == "2026-02-03"
+
+        # An empty file (as the repo ships needs_review_orders.json) imports nothing and stays importable
+        empty_path = os.path.join(tmp_dir, "empty.json")
+        open(empty_path, "w").close()
+        other = SQLiteOrderStore(os.path.join(tmp_dir, "other.db"))
+        assert other.migrate_json_files(empty_path, review_path) == {review_path: 1}
+        # ...as does a corrupt one, until it is repaired
+        with open(empty_path, "w") as f:
+            f.write('[{"vehicle_type": "HCV",')
+        assert other.migrate_json_files(empty_path, review_path) == {}
+        with open(empty_path, "w") as f:
+            json.dump([_success(7, 12)], f)
+        assert other.migrate_json_files(empty_path, review_path) == {empty_path: 1}
+        assert other.counts() == {STATUS_SUCCESS: 1, STATUS_REVIEW: 1}
+    print("✅ JSON files imported once; reruns skip them; empty or corrupt files stay importable.")
+
+
+class _IncompleteStore(OrderStore):
+    """A plugin backend that forgot find() and counts()."""
+
+    def save(self, success, review, source, request_id=None, content_hash=None) -> int:
+        return 0
+
+
+def test_incomplete_backend_fails_when_built():
+    try:
+        create_order_store(f"{__name__}:_IncompleteStore")
+    except TypeError as e:
+        assert "find" in str(e) and "counts" in str(e)
+    else:
+        raise AssertionError("a backend without find/counts was accepted")
+    assert isinstance(create_order_store("sqlite"), SQLiteOrderStore)
+    print("✅ A backend missing part of the OrderStore interface fails at startup.")
+
+
+if __name__ == "__main__":
+    test_store_indexes_source_date_and_lane()
+    test_concurrent_writers_lose_nothing()
+    test_json_files_are_migrated_once()
+    test_incomplete_backend_fails_when_built()
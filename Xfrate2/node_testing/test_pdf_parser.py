@@ -0,0 +1,70 @@
+import os
+from io import BytesIO
+from pypdf import PdfReader, PdfWriter
+from Xfrate2.utils import logger
+from Xfrate2.parsers import pdf
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "input", "FileD (3).pdf")
+
+
+def _multi_page_pdf(copies: int) -> bytes:
+    writer = PdfWriter()
+    source = PdfReader(SAMPLE_PDF)
+    for _ in range(copies):
+        for page in source.pages:
+            writer.add_page(page)
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _scanned_page_pdf() -> bytes:
+    """One image-only page, as a scanner would produce it."""
+    from PIL import Image
+    image = Image.effect_noise((600, 800), 60).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="PDF")
+    return buffer.getvalue()
+
+
+def test_parallel_pdf_matches_serial():
+    logger.info(">>> TESTING PDF PAGE-PARALLEL EXTRACTION <<<")
+    data = _multi_page_pdf(6)
+    page_count = len(PdfReader(BytesIO(data)).pages)
+
+    serial = pdf._extract_page_range(data, 0, page_count)
+
+    # Force the pool path even on a small file / single CPU box
+    old = (pdf.PDF_PARALLEL_MIN_PAGES, pdf.PDF_PARALLEL_WORKERS)
+    pdf.PDF_PARALLEL_MIN_PAGES, pdf.PDF_PARALLEL_WORKERS = 2, 2
+    try:
+        parallel = pdf.extract_pdf_pages(data)
+    finally:
+        pdf.PDF_PARALLEL_MIN_PAGES, pdf.PDF_PARALLEL_WORKERS = old
+
+    assert [p["page"] for p in parallel] == list(range(1, page_count + 1))
+    assert [p["text"] for p in parallel] == [p["text"] for p in serial]
+    assert all(p["seconds"] >= 0 for p in parallel)
+    print(f"✅ {page_count} pages extracted in parallel, order preserved.")
+
+
+def test_scanned_pages_are_detected():
+    logger.info(">>> TESTING SCANNED PAGE DETECTION <<<")
+    writer = PdfWriter()
+    writer.add_page(PdfReader(SAMPLE_PDF).pages[0])
+    writer.add_page(PdfReader(BytesIO(_scanned_page_pdf())).pages[0])
+    buffer = BytesIO()
+    writer.write(buffer)
+
+    text_page, scanned_page = pdf.extract_pdf_pages(buffer.getvalue())
+
+    assert text_page["has_text"] and text_page["images"] == []
+    assert not scanned_page["has_text"]
+    assert len(scanned_page["images"]) == 1
+    assert scanned_page["images"][0]["mime"] == "image/jpeg"
+    print("✅ Image-only page detected and its image extracted for Vision.")
+
+
+if __name__ == "__main__":
+    test_parallel_pdf_matches_serial()
+    test_scanned_pages_are_detected()
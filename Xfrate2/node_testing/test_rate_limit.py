@@ -0,0 +1,115 @@
+import time
+import asyncio
+import httpx
+from openai import AzureOpenAI, RateLimitError, InternalServerError, APIConnectionError
+from Xfrate2.utils import logger
+from Xfrate2 import rate_limit
+from Xfrate2.nodes import extractor
+from Xfrate2.rate_limit import TokenBucketLimiter, estimate_request_tokens
+from benchmarks.mock_azure import MockAzureOpenAI
+
+AZURE_REQUEST = httpx.Request("POST", "https://example.openai.azure.com")
+TABLE = "Origin | Destination | Vehicle\nDelhi | Mumbai | HCV\nPune | Goa | LCV"
+
+
+def _rate_limit_error(retry_after_ms: str) -> RateLimitError:
+    response = httpx.Response(
+        429,
+        headers={"retry-after-ms": retry_after_ms},
+        request=httpx.Request("POST", "https://example.openai.azure.com"),
+    )
+    return RateLimitError("Too Many Requests", response=response, body=None)
+
+
+def test_bucket_queues_callers_fifo():
+    logger.info(">>> TESTING TOKEN BUCKET LIMITER <<<")
+    # 6000 TPM -> 100 tokens/s refill
+    limiter = TokenBucketLimiter(rpm=6000, tpm=6000, headroom=1.0)
+
+    async def burst():
+        return await asyncio.gather(*[limiter.aacquire(3000) for _ in range(2)], limiter.aacquire(20))
+
+    started = time.perf_counter()
+    waits = asyncio.run(burst())
+    elapsed = time.perf_counter() - started
+
+    # The bucket covers the first two requests; the third queues behind them
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.15 < waits[2] < 0.3
+    assert elapsed >= 0.15
+    stats = limiter.stats()
+    assert stats["queued"] == 1 and stats["queue_wait_seconds_max"] == waits[2]
+    print(f"✅ Burst admitted up to quota, then queued {waits[2]:.2f}s.")
+
+
+def test_retry_after_pauses_everyone():
+    limiter = TokenBucketLimiter(rpm=6000, tpm=10**6, headroom=1.0)
+    old_base = rate_limit.BACKOFF_BASE_SECONDS
+    rate_limit.BACKOFF_BASE_SECONDS = 0.01
+    try:
+        delay = limiter.on_rate_limited(_rate_limit_error("200"), retry=0)
+    finally:
+        rate_limit.BACKOFF_BASE_SECONDS = old_base
+
+    assert delay >= 0.2   # backoff never undercuts Retry-After
+    assert limiter.acquire(10) > 0.1   # other callers wait for the pause too
+    assert limiter.stats()["rate_limited"] == 1
+    print("✅ Retry-After honoured by every caller.")
+
+
+class _FlakyCompletions:
+    """Fails the first requests with the given errors, then forwards to the stand-in."""
+
+    def __init__(self, client: AzureOpenAI, errors: list):
+        self._client = client
+        self._errors = errors
+
+    def create(self, **kwargs):
+        if self._errors:
+            raise self._errors.pop(0)
+        return self._client.chat.completions.create(**kwargs)
+
+
+def test_server_errors_and_dropped_connections_are_resent():
+    errors = [
+        InternalServerError("Service Unavailable", response=httpx.Response(503, request=AZURE_REQUEST), body=None),
+        APIConnectionError(request=AZURE_REQUEST),
+    ]
+    old = (extractor.get_client, rate_limit.BACKOFF_BASE_SECONDS)
+    with MockAzureOpenAI(latency_ms=0, jitter_ms=0, ms_per_order=0) as mock:
+        client = AzureOpenAI(api_key="offline", api_version="2024-08-01-preview",
+                             azure_endpoint=mock.endpoint, max_retries=0, timeout=10.0)
+        flaky = type("FlakyClient", (), {})()
+        flaky.chat = type("Chat", (), {})()
+        flaky.chat.completions = _FlakyCompletions(client, errors)
+        extractor.get_client, rate_limit.BACKOFF_BASE_SECONDS = (lambda: flaky), 0.01
+        try:
+            transient_before = rate_limit.rate_limiter.stats()["transient_errors"]
+            result = extractor._call_with_retries([{"role": "user", "content": TABLE}])
+        finally:
+            extractor.get_client, rate_limit.BACKOFF_BASE_SECONDS = old
+
+    # Both failures were waited out inside one attempt; the document still extracted
+    assert result is not None and len(result["orders"]) == 2
+    assert not errors and mock.stats["requests"] == 1
+    assert rate_limit.rate_limiter.stats()["transient_errors"] == transient_before + 2
+    print("✅ 5xx answers and dropped connections re-sent after a backoff.")
+
+
+def test_request_estimate_counts_images_and_completion():
+    text_only = estimate_request_tokens([{"role": "user", "content": "hello"}])
+    with_image = estimate_request_tokens([{"role": "user", "content": [
+        {"type": "text", "text": "hello"},
+        {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}},
+    ]}])
+
+    assert text_only > rate_limit.RATE_LIMIT_COMPLETION_TOKENS
+    assert with_image > text_only + 500
+    print("✅ Request token estimate includes images and completion budget.")
+
+
+if __name__ == "__main__":
+    test_bucket_queues_callers_fifo()
+    test_retry_after_pauses_everyone()
+    test_server_errors_and_dropped_connections_are_resent()
+    test_request_estimate_counts_images_and_completion()
@@ -0,0 +1,76 @@
+import copy
+import json
+from Xfrate2.utils import logger
+from Xfrate2.nodes.repair import (
+    parse_orders, validate_orders, build_repair_messages, apply_repairs, drop_invalid_fields,
+    UnusableResponseError,
+)
+
+
+def _order(pickup: str, vehicle: str = "HCV") -> dict:
+    field = lambda value: {"value": value, "confidence": 1.0, "reasoning": None}
+    return {
+        "vehicle_type": field(vehicle),
+        "body_type": field("Closed"),
+        "number_of_vehicle": field(1),
+        "total_weight": field(12.0),
+        "pickup_address": field(pickup),
+        "destination_address": field("Bhiwandi, Mumbai"),
+        "product_category": field("FMCG"),
+        "product_description": field("Cartons"),
+        "pickup_date_and_time": field("2026-01-15 09:00"),
+    }
+
+
+SOURCE = "\n".join(["Dispatch list"] + [f"filler {i}" for i in range(200)] + ["Okhla, Delhi | 2x Trailer | 12 MT"])
+
+
+def test_only_failing_orders_are_sent_for_repair():
+    logger.info(">>> TESTING TARGETED REPAIR <<<")
+    orders = parse_orders(json.dumps({"orders": [
+        _order("Noida, UP"), _order("Okhla, Delhi", vehicle="2x Trailer"), _order("Pune"),
+    ]}))
+    validated, failures = validate_orders(orders)
+
+    assert list(failures) == [1]
+    assert failures[1][0]["field"] == "vehicle_type" and failures[1][0]["value"] == "2x Trailer"
+
+    messages = build_repair_messages("SYSTEM", orders, failures, SOURCE)
+    prompt = messages[1]["content"]
+    assert "Okhla, Delhi | 2x Trailer | 12 MT" in prompt   # its own source line is quoted
+    assert "filler" not in prompt and "Noida" not in prompt   # the rest of the document is not
+    print("✅ Repair prompt carries only the failing order and its source line.")
+
+
+def test_repairs_merge_back_by_position():
+    orders = [_order("Noida, UP"), _order("Okhla, Delhi", vehicle="2x Trailer"), _order("Pune", vehicle="Open")]
+    validated, failures = validate_orders(orders)
+
+    fixed = copy.deepcopy([orders[1], orders[2]])
+    fixed[0]["vehicle_type"]["value"] = "Trailer"   # fixed
+    remaining = apply_repairs(orders, validated, failures, fixed)
+
+    assert list(remaining) == [2]
+    assert [o and o["vehicle_type"]["value"] for o in validated] == ["HCV", "Trailer", None]
+
+    # Repair gave up on the last one: it is kept for review with the bad field emptied
+    drop_invalid_fields(orders, validated, remaining)
+    assert validated[2]["vehicle_type"]["value"] is None
+    assert validated[2]["pickup_address"]["value"] == "Pune"
+    print("✅ Repaired orders merged in place; unfixable field emptied for review.")
+
+
+def test_unusable_response_is_rejected():
+    for content in ["", "{not json", json.dumps({"items": []})]:
+        try:
+            parse_orders(content)
+        except UnusableResponseError:
+            continue
+        raise AssertionError(f"accepted {content!r}")
+    print("✅ Unusable responses rejected as a whole.")
+
+
+if __name__ == "__main__":
+    test_only_failing_orders_are_sent_for_repair()
+    test_repairs_merge_back_by_position()
+    test_unusable_response_is_rejected()
@@ -0,0 +1,95 @@
+import os
+import json
+import sqlite3
+import tempfile
+from contextlib import closing
+from Xfrate2.utils import logger, deployment_name
+from Xfrate2.replay import ReplayStore, replay_runs, PROMPT_VERSION
+
+
+def _order(vehicle_confidence: float, with_weight: bool = True) -> dict:
+    field = lambda value, confidence=0.95: {"value": value, "confidence": confidence, "reasoning": None}
+    return {
+        "vehicle_type": field("HCV", vehicle_confidence),
+        "pickup_address": field("Okhla, Delhi"),
+        "destination_address": field("Bhiwandi, Mumbai"),
+        "pickup_date_and_time": field("2026-01-15 09:00"),
+        "total_weight": field(12.0 if with_weight else None),
+        "number_of_vehicle": field(1),
+    }
+
+
+def _store_with_runs(tmp_dir: str) -> ReplayStore:
+    store = ReplayStore(os.path.join(tmp_dir, "replay.db"))
+    store.record({"orders": [_order(0.95), _order(0.75)]}, source="a.pdf", content_hash="a" * 64)
+    store.record({"orders": [_order(0.95, with_weight=False)]}, source="b.docx", content_hash="b" * 64)
+    store.record({"orders": []}, source="empty.png", content_hash="c" * 64)
+    return store
+
+
+def test_replay_diffs_candidate_settings():
+    logger.info(">>> TESTING OFFLINE REPLAY <<<")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = _store_with_runs(tmp_dir)
+        assert store.count() == 3
+
+        # Baseline (0.8 threshold): a.pdf order 1 is low confidence, b.docx misses its weight
+        report = replay_runs(store, confidence_threshold=0.7)
+        assert report["runs"] == 3 and report["orders"] == 3
+        assert report["baseline"] == {"success": 1, "needs_review": 2}
+        assert report["candidate"] == {"success": 2, "needs_review": 1}
+        assert report["diff"] == {"success": 1, "needs_review": -1}
+        assert [run["source"] for run in report["changed_runs"]] == ["a.pdf"]
+
+        # Dropping total_weight from the required fields clears b.docx
+        report = replay_runs(store, required_fields=["vehicle_type", "pickup_address"])
+        assert report["candidate"]["success"] == 2
+        assert report["issues_by_field"]["total_weight"] == {"baseline": 1, "candidate": 0}
+    print("✅ Replay reports success/review diffs for candidate settings.")
+
+
+def test_parallel_replay_matches_inline():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = _store_with_runs(tmp_dir)
+        inline = replay_runs(store, confidence_threshold=0.7)
+        parallel = replay_runs(store, confidence_threshold=0.7, workers=2)
+        for report in (inline, parallel):
+            report.pop("seconds")
+        assert parallel == inline
+    print("✅ Parallel replay matches the inline one.")
+
+
+def test_repeated_documents_are_stored_once():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = _store_with_runs(tmp_dir)
+        # Sent again (or served from the extraction cache): replaces the earlier run
+        run_id = store.record({"orders": [_order(0.95)]}, source="a-again.pdf", content_hash="a" * 64)
+        assert store.count() == 3
+        assert replay_runs(store)["orders"] == 2
+        with closing(store._connect()) as conn:
+            row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        assert row["source"] == "a-again.pdf" and row["order_count"] == 1
+        assert row["deployment"] == deployment_name()
+        # Another prompt version is a separate run
+        store.record({"orders": []}, source="a.pdf", content_hash="a" * 64, prompt_version="older")
+        assert store.count() == 4
+
+        # A store written before the unique index keeps the latest run of each document
+        path = os.path.join(tmp_dir, "legacy.db")
+        with closing(sqlite3.connect(path)) as conn, conn:
+            conn.execute("CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash TEXT NOT NULL, "
+                         "source TEXT, file_type TEXT, prompt_version TEXT NOT NULL, deployment TEXT, "
+                         "order_count INTEGER NOT NULL, raw_extraction TEXT NOT NULL, created_at REAL NOT NULL)")
+            for source in ("first.pdf", "second.pdf"):
+                conn.execute("INSERT INTO runs (content_hash, source, prompt_version, order_count, raw_extraction, "
+                             "created_at) VALUES (?, ?, ?, 0, ?, 0)",
+                             ("d" * 64, source, PROMPT_VERSION, json.dumps({"orders": []})))
+        legacy = ReplayStore(path)
+        assert legacy.count() == 1 and [run[1] for run in legacy.iter_runs()] == ["second.pdf"]
+    print("✅ One replay run per document and prompt version; older stores deduplicated.")
+
+
+if __name__ == "__main__":
+    test_replay_diffs_candidate_settings()
+    test_parallel_replay_matches_inline()
+    test_repeated_documents_are_stored_once()
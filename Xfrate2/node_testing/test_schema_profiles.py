@@ -0,0 +1,69 @@
+import json
+from Xfrate2.utils import logger
+from Xfrate2.nodes.repair import validate_orders
+from Xfrate2.nodes.schema_profiles import PROFILES, looks_tabular, ORDER_FIELDS
+
+
+def _lean_order(pickup: str) -> dict:
+    values = {
+        "vehicle_type": "HCV", "body_type": "Closed", "pod_type": None, "number_of_vehicle": 2,
+        "total_weight": 12.5, "pickup_address": pickup, "destination_address": "Bhiwandi, Mumbai",
+        "product_category": "FMCG", "product_description": "Cartons", "pickup_date_and_time": "2026-01-15 09:00",
+        "expected_delivery_date_and_time": None, "vehicle_size": None, "shippers_note": None,
+    }
+    return {field: {"value": value, "confidence": 0.9} for field, value in values.items()}
+
+
+def test_compact_schemas_drop_reasoning():
+    logger.info(">>> TESTING SCHEMA PROFILES <<<")
+    sizes = {}
+    for name, profile in PROFILES.items():
+        schema = json.dumps(profile.response_format)
+        assert profile.response_format["json_schema"]["strict"] is True
+        assert ("reasoning" in schema) == (name == "full")
+        sizes[name] = len(schema)
+    assert sizes["columnar"] < sizes["lean"] < sizes["full"]
+    print(f"✅ Response formats per profile: {sizes}")
+
+
+def test_lean_answer_expands_to_ftl_orders():
+    content = json.dumps({"orders": [_lean_order("Okhla, Delhi")]})
+    orders = PROFILES["lean"].parse(content)
+
+    assert orders[0]["pickup_address"] == {"value": "Okhla, Delhi", "confidence": 0.9, "reasoning": None}
+    validated, failures = validate_orders(orders)
+    assert not failures and validated[0]["number_of_vehicle"]["value"] == 2
+    print("✅ Lean answer expanded into FTLOrder dicts.")
+
+
+def test_columnar_answer_expands_to_ftl_orders():
+    columns = ["pickup_address", "destination_address", "vehicle_type", "total_weight", "number_of_vehicle",
+               "product_description"]
+    content = json.dumps({"columns": columns, "rows": [
+        {"values": ["Okhla, Delhi", "Pune", "LCV", 1.5, 1, 240], "confidence": [1, 1, 0.9, 0.9, 1, 0.8]},
+        {"values": ["Noida", "Jaipur"], "confidence": [1, 1]},   # short row
+    ]})
+    orders = PROFILES["columnar"].parse(content)
+
+    assert len(orders) == 2
+    assert orders[0]["total_weight"] == {"value": 1.5, "confidence": 0.9, "reasoning": None}
+    assert orders[0]["product_description"]["value"] == "240"   # numeric cell in a text field
+    assert orders[0]["body_type"] == {"value": None, "confidence": 0.0, "reasoning": None}   # left out
+    assert orders[1]["vehicle_type"]["value"] is None   # padded, goes to review
+    validated, failures = validate_orders(orders)
+    assert not failures and set(validated[0]) == set(ORDER_FIELDS)
+    print("✅ Columnar answer expanded into FTLOrder dicts.")
+
+
+def test_tabular_text_detection():
+    table = "Origin | Destination | Vehicle\n" + "\n".join(f"Plant {i} | Pune | LCV" for i in range(5))
+    email = "Hi team,\nPlease send 2 trucks from Pune to Mumbai tomorrow.\nThanks"
+    assert looks_tabular(table) and not looks_tabular(email)
+    print("✅ Tabular text detected.")
+
+
+if __name__ == "__main__":
+    test_compact_schemas_drop_reasoning()
+    test_lean_answer_expands_to_ftl_orders()
+    test_columnar_answer_expands_to_ftl_orders()
+    test_tabular_text_detection()
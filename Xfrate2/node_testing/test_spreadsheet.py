@@ -0,0 +1,67 @@
+import io
+import pickle
+import datetime
+import openpyxl
+from Xfrate2.utils import logger
+from Xfrate2.parsers.spreadsheet import iter_row_batches
+from Xfrate2.nodes.extractor import extract_sheet
+from Xfrate2.nodes.file_reader import parse_document
+
+HEADER = ["Origin", "Destination", "Vehicle", "Weight (MT)", "Pickup Date"]
+
+
+def _csv(rows: int) -> io.BytesIO:
+    lines = [";".join(HEADER)]
+    lines += [f"Origin {i};Dest {i};HCV;{10 + i % 3};05/01/2026 09:00" for i in range(rows)]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def _xlsx(rows: int) -> io.BytesIO:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for i in range(rows):
+        sheet.append([f"Origin {i}", f"Dest {i}", "LCV", 3.5, datetime.datetime(2026, 1, 5, 9, 0)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_row_batches_carry_the_header():
+    logger.info(">>> TESTING SPREADSHEET ROW BATCHES <<<")
+    batches = list(iter_row_batches(_csv(25), ".csv", batch_rows=10))
+
+    assert [len(rows) for _, _, rows in batches] == [10, 10, 5]
+    assert [start for start, _, _ in batches] == [2, 12, 22]
+    assert all(header == HEADER for _, header, _ in batches)   # ';' delimiter sniffed
+    assert batches[-1][2][-1][0] == "Origin 24"
+
+    first_row = next(iter_row_batches(_xlsx(3), ".xlsx"))[2][0]
+    assert first_row == ["Origin 0", "Dest 0", "LCV", "3.5", "2026-01-05 09:00"]
+    print("✅ CSV/XLSX streamed in header-carrying row batches.")
+
+
+def test_sheet_node_merges_in_row_order():
+    result = extract_sheet({"sheet_bytes": _xlsx(120).getvalue(), "file_type": ".xlsx"})
+    orders = result["raw_extraction"]["orders"]
+
+    # Every row is read by the fast path, so no LLM call is made
+    assert [o["pickup_address"]["value"] for o in orders] == [f"Origin {i}" for i in range(120)]
+    assert orders[0]["pickup_date_and_time"]["value"] == "2026-01-05 09:00"
+    print("✅ 120 sheet rows extracted in row order.")
+
+
+def test_parsed_sheet_state_holds_no_open_file():
+    data = _csv(5).getvalue()
+    state = parse_document({"document_url": "upload://orders.csv", "document_bytes": data})
+    # Bytes, not a file object: the state can be copied or checkpointed, and nothing leaks if a node fails
+    assert state["sheet_bytes"] == data
+    pickle.dumps(state)
+    print("✅ Parsed CSV kept as bytes in the graph state.")
+
+
+if __name__ == "__main__":
+    test_row_batches_carry_the_header()
+    test_sheet_node_merges_in_row_order()
+    test_parsed_sheet_state_holds_no_open_file()
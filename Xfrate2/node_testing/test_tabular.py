@@ -0,0 +1,120 @@
+import os
+from Xfrate2.utils import logger
+from Xfrate2.state import merge_extractions
+from Xfrate2.nodes.tabular import extract_tables, split_document_context
+from Xfrate2.parsers.docx_stream import read_docx_text
+
+# A table, then "Additional Notes" that apply to its orders (refrigerated body, softcopy POD...)
+SAMPLE_DOCX = os.path.join(os.path.dirname(__file__), "..", "input", "FileD (1).docx")
+
+TABLE = "\n".join([
+    "Dispatch plan for week 3",
+    "S.No | Origin | Destination | Vehicle | Weight (MT) | Pickup Date | Pickup Time",
+    "1 | Okhla, New Delhi | Bhiwandi, Mumbai | HCV | 14.5 | 05/01/2026 | 09:00 AM",
+    "2 | Noida, UP | Whitefield, Bengaluru | 2x Trailer (Open Body) | 28 | 06/01/2026 | 10:00 AM",
+    "3 | Pune | Sanand, Ahmedabad | LCV | 3.2 | 07/01/2026 | 02:00 PM",
+])
+
+
+def test_complete_rows_skip_the_llm():
+    logger.info(">>> TESTING TABULAR FAST PATH <<<")
+    state = {"file_type": ".txt", "extracted_text": TABLE}
+
+    result = extract_tables(state)
+    orders = result["raw_extraction"]["orders"]
+
+    assert result["tabular_stats"] == {"tables": 1, "rows_extracted": 2, "rows_left": 1}
+    assert [o["pickup_address"]["value"] for o in orders] == ["Okhla, New Delhi", "Pune"]
+    # Date + time columns are joined and read day-first
+    assert orders[0]["pickup_date_and_time"]["value"] == "2026-01-05 09:00"
+    assert orders[0]["total_weight"]["value"] == 14.5
+    assert orders[0]["vehicle_type"] == {"value": "HCV", "confidence": 1.0, "reasoning": "Table column: Vehicle"}
+    assert orders[0]["body_type"]["value"] is None
+
+    # Only the row the rules could not read goes to the LLM, with its header
+    residual = result["extracted_text"]
+    assert "2x Trailer (Open Body)" in residual
+    assert "S.No | Origin" in residual and "Dispatch plan" in residual
+    assert "Okhla" not in residual and "Sanand" not in residual
+    print("✅ Complete rows extracted by rules; the odd row is left for the LLM.")
+
+
+def test_unmapped_column_or_unit_falls_back():
+    text = "\n".join([
+        "Origin | Destination | Vehicle | Weight (kg) | Pickup Date | Rate",
+        "Delhi | Mumbai | HCV | 14500 | 05/01/2026 |",
+        "Pune | Goa | LCV | 900 | 06/01/2026 | 45000",
+    ])
+    result = extract_tables({"file_type": ".txt", "extracted_text": text})
+
+    # kg weights are not guessed into tonnes; nothing is extracted
+    assert "raw_extraction" not in result
+    assert result["tabular_stats"]["rows_left"] == 2
+    print("✅ Unknown units and unmapped data columns fall back to the LLM.")
+
+
+def test_table_only_document_fully_extracted():
+    text = "\n".join([
+        "LOGISTICS ORDER REQUEST FORM",
+        "Date: 10/01/2026",
+        "Vehicle Type | Quantity | Weight (Tons) | Pickup Location | Drop Location | Pickup Time",
+        "HCV | 2 | 14.5 | Plot 44, Okhla Ind. Estate, New Delhi | Bhiwandi Warehouse, Mumbai | 15/01/2026 09:00 AM",
+        "LCV | 1 | 3.2 | Sector 18, Noida, UP | Connaught Place, New Delhi | 15/01/2026 10:30 AM",
+    ])
+    result = extract_tables({"file_type": ".docx", "extracted_text": text})
+
+    assert result["tabular_stats"] == {"tables": 1, "rows_extracted": 2, "rows_left": 0}
+    assert len(result["raw_extraction"]["orders"]) == 2
+    assert result["extracted_text"] == ""
+    print("✅ A document that is only a table is extracted without an LLM call.")
+
+
+def test_text_outside_the_table_goes_to_the_llm():
+    # A free-text order before a clean table: the rows are read, the order is left for the LLM
+    text = "\n".join([
+        "Hi team, please also arrange one 32 ft container from Peenya, Bengaluru to Guindy, Chennai,",
+        "12 MT of auto parts, pickup 09/01/2026 at 6 PM.",
+        "S.No | Origin | Destination | Vehicle | Weight (MT) | Pickup Date | Pickup Time",
+        "1 | Okhla, New Delhi | Bhiwandi, Mumbai | HCV | 14.5 | 05/01/2026 | 09:00 AM",
+        "2 | Pune | Sanand, Ahmedabad | LCV | 3.2 | 07/01/2026 | 02:00 PM",
+    ])
+    result = extract_tables({"file_type": ".txt", "extracted_text": text})
+    assert result["tabular_stats"] == {"tables": 1, "rows_extracted": 2, "rows_left": 0}
+    assert len(result["raw_extraction"]["orders"]) == 2
+    assert "Peenya, Bengaluru" in result["extracted_text"] and "Okhla" not in result["extracted_text"]
+
+    # Notes after the table belong to its orders: only the notes go to the LLM
+    with open(SAMPLE_DOCX, "rb") as f:
+        notes = read_docx_text(f)
+    result = extract_tables({"file_type": ".docx", "extracted_text": notes})
+    assert result["tabular_stats"] == {"tables": 1, "rows_extracted": 5, "rows_left": 0}
+    assert "Refrigerated body" in result["extracted_text"] and "Okhla" not in result["extracted_text"]
+    print("✅ Text outside the table goes to the LLM without the rows already read.")
+
+
+def test_notes_apply_to_the_fast_path_orders():
+    table_orders = extract_tables({"file_type": ".txt", "extracted_text": TABLE})["raw_extraction"]
+    note = {field: {"value": None, "confidence": 0.0, "reasoning": None} for field in table_orders["orders"][0]}
+    note["body_type"] = {"value": "Closed", "confidence": 0.9, "reasoning": "Closed body for all orders"}
+    note["vehicle_type"] = {"value": "HCV", "confidence": 0.9, "reasoning": None}   # not a document-wide field
+    free_text_order = {**note, "pickup_address": {"value": "Peenya", "confidence": 0.9, "reasoning": None},
+                       "body_type": {"value": "Open", "confidence": 0.9, "reasoning": None}}
+
+    residual = split_document_context({"orders": [free_text_order, note]})
+    assert residual["orders"] == [free_text_order]
+    assert residual["document_context"] == {"body_type": note["body_type"]}
+
+    merged = merge_extractions(table_orders, residual)
+    assert [o["body_type"]["value"] for o in merged["orders"]] == ["Closed", "Closed", "Open"]
+    # A field the table filled is not overwritten
+    table_orders["orders"][0]["body_type"] = {"value": "Open", "confidence": 1.0, "reasoning": "Table column: Body"}
+    assert merge_extractions(table_orders, residual)["orders"][0]["body_type"]["value"] == "Open"
+    print("✅ Notes read around the table fill the empty fields of its orders.")
+
+
+if __name__ == "__main__":
+    test_complete_rows_skip_the_llm()
+    test_unmapped_column_or_unit_falls_back()
+    test_table_only_document_fully_extracted()
+    test_text_outside_the_table_goes_to_the_llm()
+    test_notes_apply_to_the_fast_path_orders()
@@ -0,0 +1,48 @@
+import os
+import sys
+import subprocess
+from Xfrate2.utils import logger
+from Xfrate2.warmup import warmup, parse_importtime
+
+HEAVY_MODULES = ("openai", "langgraph", "pypdf", "openpyxl", "lxml")
+# Log lines written in the calling thread, so none can land after the probe's own output
+PROBE_ENV = {**os.environ, "LOG_QUEUE_ENABLED": "false"}
+
+
+def test_server_import_is_lazy():
+    logger.info(">>> TESTING LAZY IMPORTS <<<")
+    # A fresh interpreter: this test process has most of them loaded already
+    probe = f"import sys, server; print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=PROBE_ENV)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    print("✅ Importing the server loads no LLM client, graph or format parser.")
+
+
+def test_warmup_loads_requested_components_only():
+    probe = (
+        "import sys; from Xfrate2.warmup import warmup; seconds = warmup(['pdf', 'nope']); "
+        f"print(sorted(seconds), sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, env=PROBE_ENV)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "['pdf'] ['pypdf']"
+    print("✅ Warmup preloads only the configured components.")
+
+
+def test_importtime_output_is_parsed():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     _json",
+        "import time:       800 |        920 |   json",
+        "import time:      1500 |       2420 | server",
+    ])
+    assert parse_importtime(output) == {"_json": (120, 120), "json": (800, 920), "server": (1500, 2420)}
+    assert warmup([]) == {}
+    print("✅ -X importtime output parsed per module.")
+
+
+if __name__ == "__main__":
+    test_server_import_is_lazy()
+    test_warmup_loads_requested_components_only()
+    test_importtime_output_is_parsed()
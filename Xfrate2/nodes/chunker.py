@@ -0,0 +1,224 @@
+# file: nodes/chunker.py
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from Xfrate2.utils import logger, estimate_tokens
+
+# --- CONFIGURATION ---
+CHUNKING_ENABLED = os.getenv("CHUNKING_ENABLED", "true").lower() == "true"
+# Documents above this many (estimated) tokens are split into chunks of at most this size
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000"))
+# Lines repeated at the start of the next chunk, so a record cut at a boundary is seen whole once
+CHUNK_OVERLAP_LINES = int(os.getenv("CHUNK_OVERLAP_LINES", "2"))
+# Budget for the document header carried into every later chunk
+HEADER_CONTEXT_TOKENS = int(os.getenv("HEADER_CONTEXT_TOKENS", "300"))
+HEADER_CONTEXT_LINES = int(os.getenv("HEADER_CONTEXT_LINES", "8"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+
+# Fields that identify an order; used to spot an overlap row extracted by two adjacent chunks
+IDENTITY_FIELDS = [
+    "pickup_address",
+    "destination_address",
+    "pickup_date_and_time",
+    "vehicle_type",
+    "total_weight",
+    "number_of_vehicle",
+]
+
+_CELL_SPLIT = re.compile(r"\s*\|\s*|\t|\s{2,}")
+
+
+@dataclass
+class TextChunk:
+    """One chunk of a long document, ready to send to the LLM."""
+    text: str
+    overlap_lines: int = 0   # non-blank leading lines repeated from the end of the previous chunk
+
+
+def split_into_chunks(text: str, pages: Optional[List[str]] = None,
+                      budget_tokens: int = CHUNK_TOKEN_BUDGET) -> List[TextChunk]:
+    """
+    Splits a document into token-budgeted chunks on page / row boundaries.
+    - Whole pages are packed together while they fit; an oversized page is
+      split further on line (table row) boundaries.
+    - Every chunk after the first starts with the document header and the
+      last seen table header row, so the LLM can 'inherit headers' as the
+      system prompt asks.
+    - The last CHUNK_OVERLAP_LINES lines of a chunk are repeated at the start
+      of the next one; TextChunk.overlap_lines says how many.
+    Returns [TextChunk(text)] when it already fits the budget.
+    """
+    if estimate_tokens(text) <= budget_tokens:
+        return [TextChunk(text)]
+
+    units = pages if pages else [text]
+    lines_per_unit = [unit.splitlines() for unit in units]
+
+    # The carried header may use at most an eighth of each chunk
+    header_budget = min(HEADER_CONTEXT_TOKENS, budget_tokens // 8)
+    doc_header = _document_header([line for lines in lines_per_unit for line in lines], header_budget)
+    # Leave room for the carried context (header, table header row, markers) in every chunk
+    body_budget = max(budget_tokens - estimate_tokens(doc_header) - 50, budget_tokens // 2)
+
+    chunks: List[List[str]] = []
+    overlaps: List[int] = []   # non-blank overlap lines at the start of each chunk
+    current: List[str] = []
+    current_costs: List[int] = []   # token cost per line in `current` (+1 for the newline)
+    current_total = 0
+    fresh = 0   # lines in `current` that are not overlap from the previous chunk
+
+    def flush():
+        nonlocal current, current_costs, current_total, fresh
+        if fresh:
+            chunks.append(current)
+            overlaps.append(_count_filled(current[:len(current) - fresh]))
+            keep = min(CHUNK_OVERLAP_LINES, len(current))
+            current, current_costs = current[len(current) - keep:], current_costs[len(current_costs) - keep:]
+            current_total = sum(current_costs)
+            fresh = 0
+
+    for lines in lines_per_unit:
+        costs = [estimate_tokens(line) + 1 for line in lines]
+
+        # Prefer page boundaries: start a new chunk if the whole page does not fit
+        if current_total + sum(costs) > body_budget:
+            flush()
+
+        for line, cost in zip(lines, costs):
+            if fresh and current_total + cost > body_budget:
+                flush()
+            current.append(line)
+            current_costs.append(cost)
+            current_total += cost
+            fresh += 1
+
+    if fresh:
+        chunks.append(current)
+        overlaps.append(_count_filled(current[:len(current) - fresh]))
+
+    # Carry header context forward
+    rendered = []
+    table_header = None
+    for index, (chunk_lines, overlap) in enumerate(zip(chunks, overlaps)):
+        body = "\n".join(chunk_lines)
+        if index > 0:
+            context = [doc_header] if doc_header else []
+            if table_header and table_header not in chunk_lines:
+                context.append(table_header)
+            if context:
+                body = (
+                    "[Context carried over from earlier in the document]\n"
+                    + "\n".join(context)
+                    + "\n[End of context]\n\n"
+                    + body
+                )
+        rendered.append(TextChunk(body, overlap))
+        table_header = _last_table_header(chunk_lines) or table_header
+
+    logger.info(f"Document split into {len(rendered)} chunks (budget {budget_tokens} tokens each).")
+    return rendered
+
+
+def merge_chunk_extractions(results: List[Optional[Dict[str, Any]]],
+                            overlaps: Optional[List[int]] = None) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Reduce step: concatenates orders from every chunk, in chunk order.
+    `overlaps[i]` is the number of lines chunk i repeats from chunk i-1
+    (TextChunk.overlap_lines); without it nothing is treated as repeated.
+    Only those lines can yield an order twice, so only the first k orders of
+    a chunk are matched, one to one, against the last k orders of the
+    previous chunk (k = its overlap lines); a match is kept once, the more
+    complete copy winning. Identical orders anywhere else are separate
+    rows (recurring dispatches on one lane) and are all kept.
+    Returns (raw_extraction or None if every chunk failed, all_chunks_ok).
+    """
+    if all(result is None for result in results):
+        return None, False
+
+    merged: List[Dict[str, Any]] = []
+    previous_chunk: List[int] = []   # positions in `merged` of the previous chunk's orders
+    duplicates = 0
+
+    for index, result in enumerate(results):
+        overlap = overlaps[index] if overlaps and result is not None else 0
+        tail = previous_chunk[len(previous_chunk) - overlap:] if overlap else []
+        current_chunk = []
+        for position, order in enumerate((result or {}).get("orders", [])):
+            match = None
+            if position < overlap:
+                match = next((pos for pos in tail if _same_order(merged[pos], order)), None)
+            if match is not None:
+                duplicates += 1
+                tail.remove(match)
+                if _filled_fields(order) > _filled_fields(merged[match]):
+                    merged[match] = order
+                current_chunk.append(match)
+                continue
+            merged.append(order)
+            current_chunk.append(len(merged) - 1)
+        previous_chunk = current_chunk
+
+    if duplicates:
+        logger.info(f"Removed {duplicates} orders duplicated across chunk boundaries.")
+    return {"orders": merged}, all(result is not None for result in results)
+
+
+# --- HELPER FUNCTIONS ---
+
+def _document_header(lines: List[str], budget_tokens: int) -> str:
+    """Leading lines of the document (title, shipper, dates), up to budget_tokens."""
+    header = []
+    tokens = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        if _split_cells(line) and header:
+            break   # the first table starts; its header row is carried separately
+        tokens += estimate_tokens(line)
+        if tokens > budget_tokens or len(header) >= HEADER_CONTEXT_LINES:
+            break
+        header.append(line)
+    return "\n".join(header)
+
+
+def _split_cells(line: str) -> List[str]:
+    """Cells of a table-looking line (pipe / tab / wide-space separated), else []."""
+    cells = [cell for cell in _CELL_SPLIT.split(line.strip()) if cell]
+    return cells if len(cells) >= 3 else []
+
+
+def _last_table_header(lines: List[str]) -> Optional[str]:
+    """A table row made of labels (letters, no numbers) is taken as a header row."""
+    for line in reversed(lines):
+        cells = _split_cells(line)
+        if cells and all(not re.search(r"\d", cell) for cell in cells):
+            return line
+    return None
+
+
+def _field_value(order: Dict[str, Any], field: str):
+    data = order.get(field)
+    value = data.get("value") if isinstance(data, dict) else None
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def _same_order(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Same order if every identity field present in both agrees (and at least 2 do)."""
+    shared = 0
+    for field in IDENTITY_FIELDS:
+        va, vb = _field_value(a, field), _field_value(b, field)
+        if va is None or vb is None:
+            continue
+        if va != vb:
+            return False
+        shared += 1
+    return shared >= 2
+
+
+def _count_filled(lines: List[str]) -> int:
+    return sum(1 for line in lines if line.strip())
+
+
+def _filled_fields(order: Dict[str, Any]) -> int:
+    return sum(1 for data in order.values() if isinstance(data, dict) and data.get("value") is not None)
@@ -0,0 +1,183 @@
+# file: nodes/compactor.py
+import os
+import re
+import asyncio
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+from Xfrate2.utils import logger, estimate_tokens
+from Xfrate2.state import AgentState
+
+# --- CONFIGURATION ---
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+# A line found on at least this share of pages (and on 2+ pages) is a running header/footer
+REPEATED_LINE_PAGE_RATIO = float(os.getenv("REPEATED_LINE_PAGE_RATIO", "0.5"))
+# Footer blocks are only dropped when they start in the bottom part of a page
+FOOTER_BLOCK_MIN_POSITION = float(os.getenv("FOOTER_BLOCK_MIN_POSITION", "0.5"))
+# Running headers/footers are only looked for in the first/last N non-blank lines of a page.
+# pypdf emits table cells one per line, so "2", "HCV" or "Mumbai" repeat in the page body.
+HEADER_FOOTER_LINES = int(os.getenv("HEADER_FOOTER_LINES", "3"))
+
+IMAGE_TYPES = [".png", ".jpg", ".jpeg", ".bmp"]
+
+# "3", "Page 3", "Page 3 of 10", "3/10", "- 3 -" (only as the page's first/last line, numbered as the page)
+PAGE_NUMBER_LINE = re.compile(r"^\s*(?:-\s*)?(?:page\s*)?(\d{1,4})(?:\s*(?:of|/)\s*\d{1,4})?(?:\s*-)?\s*$", re.IGNORECASE)
+
+# Headings that open a boilerplate block running to the end of the page
+FOOTER_BLOCK_START = re.compile(
+    r"^\s*(?:terms\s*(?:&|and)\s*conditions|t\s*&\s*c\b|general terms|standard terms)",
+    re.IGNORECASE,
+)
+
+# Single boilerplate lines
+BOILERPLATE_LINE = re.compile(
+    r"^\s*(?:this is a (?:system|computer)[ -]generated|confidential|all rights reserved|"
+    r"printed on|e\.\s*&\s*o\.\s*e|subject to .{0,30}jurisdiction)",
+    re.IGNORECASE,
+)
+
+
+def compact_text(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 1.5: Input Token Compaction.
+    Shrinks the parsed text before it is sent to the LLM:
+    1. Normalizes whitespace (keeps 2-space column gaps so tables stay readable).
+    2. Drops running headers/footers repeated across pages (first copy is kept).
+    3. Drops page-number lines and recognizable boilerplate/T&C footer blocks.
+    Headers, footers and page numbers are only looked for at the top and
+    bottom of a page, never in its body, where table cells repeat.
+    """
+    file_type = state.get("file_type", "").lower()
+    if not COMPACTION_ENABLED or file_type in IMAGE_TYPES:
+        return {}
+
+    logger.info(">>> NODE 1.5: compact_text STARTED <<<")
+
+    text = state.get("extracted_text", "")
+    pages = state.get("pages") or [text]
+
+    tokens_before = estimate_tokens(text)
+    compacted_pages = compact_pages(pages)
+    compacted_text = "\n".join(compacted_pages)
+    tokens_after = estimate_tokens(compacted_text)
+
+    saved = tokens_before - tokens_after
+    percent = (100.0 * saved / tokens_before) if tokens_before else 0.0
+    logger.info(f"Compaction: {tokens_before} -> {tokens_after} tokens (saved {saved}, {percent:.1f}%).")
+
+    updates = {
+        "extracted_text": compacted_text,
+        "compaction_stats": {"tokens_before": tokens_before, "tokens_after": tokens_after},
+    }
+    if state.get("pages"):
+        updates["pages"] = compacted_pages
+    return updates
+
+
+async def acompact_text(state: AgentState) -> Dict[str, Any]:
+    """Node 1.5 (Async Version): runs the regex work off the event loop."""
+    return await asyncio.to_thread(compact_text, state)
+
+
+def compact_pages(pages: List[str]) -> List[str]:
+    """Compacts a list of page texts (a single-element list for non-paged formats)."""
+    page_lines = [_cut_footer_block(_normalize_lines(page)) for page in pages]
+    repeated = _repeated_lines(page_lines)
+
+    seen_repeated = set()
+    compacted = []
+    for page_number, lines in enumerate(page_lines, start=1):
+        header, footer = _header_footer(lines)
+        edges = _edges(lines)
+        kept = []
+        for position, line in enumerate(lines):
+            sides = {side for side, band in (("header", header), ("footer", footer)) if position in band}
+            keys = {(side, _line_key(line)) for side in sides} & repeated
+            if keys:
+                if keys & seen_repeated:
+                    continue
+                seen_repeated.update(keys)
+
+            if position in edges and _is_page_number(line, page_number):
+                continue
+
+            if BOILERPLATE_LINE.match(line):
+                continue
+
+            kept.append(line)
+        compacted.append(_squeeze_blank_lines(kept))
+    return compacted
+
+
+# --- HELPER FUNCTIONS ---
+
+def _normalize_lines(text: str) -> List[str]:
+    lines = []
+    for line in text.splitlines():
+        line = line.replace("\t", "  ").replace("\u00a0", " ").rstrip()
+        # Collapse long runs of spaces but keep a 2-space gap as a column separator
+        line = re.sub(r" {3,}", "  ", line)
+        lines.append(line)
+    return lines
+
+
+def _line_key(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def _cut_footer_block(lines: List[str]) -> List[str]:
+    """Drops a T&C block starting in the bottom part of the page, to the end of the page."""
+    for position, line in enumerate(lines):
+        if FOOTER_BLOCK_START.match(line) and position >= FOOTER_BLOCK_MIN_POSITION * len(lines):
+            return lines[:position]
+    return lines
+
+
+def _content_positions(lines: List[str]) -> List[int]:
+    """Positions of the non-blank lines that are not boilerplate."""
+    return [position for position, line in enumerate(lines) if line.strip() and not BOILERPLATE_LINE.match(line)]
+
+
+def _header_footer(lines: List[str]) -> Tuple[List[int], List[int]]:
+    """Positions of the first and of the last HEADER_FOOTER_LINES content lines."""
+    positions = _content_positions(lines)
+    return positions[:HEADER_FOOTER_LINES], positions[-HEADER_FOOTER_LINES:]
+
+
+def _edges(lines: List[str]) -> set:
+    """Positions of the first and last content lines, where page numbers sit."""
+    positions = _content_positions(lines)
+    return {positions[0], positions[-1]} if positions else set()
+
+
+def _is_page_number(line: str, page_number: int) -> bool:
+    match = PAGE_NUMBER_LINE.match(line)
+    return bool(match) and int(match.group(1)) == page_number
+
+
+def _repeated_lines(page_lines: List[List[str]]) -> set:
+    """
+    ("header"|"footer", line) pairs found in that band of enough pages to be
+    running headers/footers. Keyed by band, so a word ending one page and
+    starting the next is not taken for one.
+    """
+    if len(page_lines) < 2:
+        return set()
+    counts = Counter()
+    for lines in page_lines:
+        header, footer = _header_footer(lines)
+        counts.update({("header", _line_key(lines[position])) for position in header})
+        counts.update({("footer", _line_key(lines[position])) for position in footer})
+    threshold = max(2, REPEATED_LINE_PAGE_RATIO * len(page_lines))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def _squeeze_blank_lines(lines: List[str]) -> str:
+    """Joins lines, allowing at most one blank line in a row and none at the edges."""
+    out = []
+    for line in lines:
+        if not line.strip() and (not out or not out[-1].strip()):
+            continue
+        out.append(line)
+    while out and not out[-1].strip():
+        out.pop()
+    return "\n".join(out)
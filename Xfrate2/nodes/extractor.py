@@ -1,20 +1,37 @@
 # file: extract_node.py
 import os
 import json
-from openai import AzureOpenAI
-from openai import APITimeoutError, APIError, RateLimitError, AuthenticationError
-from pydantic import ValidationError
-from typing import Dict, Any
+import time
+import asyncio
+import functools
+from io import BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
 # Internal imports
-from Xfrate2.utils import logger
-from Xfrate2.state import AgentState, FTLOrderResponse
+from Xfrate2.utils import logger, load_env, deployment_name, carry_context
+from Xfrate2.state import AgentState, order_response_schema
 from Xfrate2.nodes.prompt import EXTRACT_ORDER_SYSTEM_PROMPT
+from Xfrate2.cache import extraction_cache, make_cache_key, EXTRACTION_CACHE_ENABLED
+from Xfrate2.nodes.chunker import (
+    TextChunk, split_into_chunks, merge_chunk_extractions, CHUNKING_ENABLED, CHUNK_CONCURRENCY
+)
+from Xfrate2.nodes.tabular import rows_to_orders, split_document_context
+from Xfrate2.parsers.spreadsheet import iter_row_batches, format_rows
+from Xfrate2.nodes.repair import (
+    validate_orders, build_repair_messages, apply_repairs, drop_invalid_fields,
+    UnusableResponseError, REPAIR_MAX_ROUNDS
+)
+from Xfrate2.nodes.schema_profiles import SchemaProfile, select_profile, SCHEMA_PROFILE
+from Xfrate2.rate_limit import (
+    rate_limiter, estimate_request_tokens, RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_RETRIES, TRANSIENT_MAX_RETRIES
+)
+from Xfrate2.metrics import record_llm_attempt, record_llm_retry, record_llm_request
 
-from dotenv import load_dotenv
 # env_path=Xfrate2.env
-load_dotenv()
+# The .env file is loaded by the entry points and, at the latest, by get_client()
 
 # --- PATH CONFIGURATION ---
 # 1. Get the directory of THIS file (Xfrate2/nodes)
@@ -29,112 +46,678 @@ env_path = current_file_dir.parent / '.env'
 
 
 # --- CONFIGURATION ---
-# Ensure you have these set in your environment variables or .env file
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_KEY"),
-    api_version="2024-08-01-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    max_retries=2,
-    timeout=60.0
+MAX_RETRIES = 3
+IMAGE_TYPES = [".png", ".jpg", ".jpeg", ".bmp"]
+# Scanned PDF pages: images sent together in one Vision request
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "4"))
+# CSV/XLSX: row batches extracted at once; also bounds how much of the sheet is held in memory
+SHEET_MAX_IN_FLIGHT = int(os.getenv("SHEET_MAX_IN_FLIGHT", "4"))
+
+# Cache keys of one document: full text, scanned pages, text left by the tabular fast path
+CACHE_BRANCHES = ("", "scanned", "residual")
+# User message for the text left by the tabular fast path (part of the residual cache key)
+RESIDUAL_INSTRUCTION = (
+    "The complete table rows of this document were already extracted and removed from the text below. "
+    "Extract the Logistics Order details still written in it (free text, or table rows left under their header). "
+    "If it gives details that apply to every order of the document (body type, POD type, product, vehicle size, "
+    "notes), also return them as one order holding only those details, with addresses, dates, weight and "
+    "number of vehicles left empty:"
 )
-DEPLOYMENT_NAME = os.getenv("CHAT_COMPLETION_NAME", "gpt-4o") 
+
+
+# --- LLM CLIENTS (built on first use: openai is slow to import) ---
+
+def _client_settings() -> Dict[str, Any]:
+    # Ensure you have these set in your environment variables or .env file
+    load_env()
+    return dict(
+        api_key=os.getenv("AZURE_OPENAI_KEY"),
+        api_version="2024-08-01-preview",
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        max_retries=0,   # retries/backoff (429, 5xx, dropped connections) are ours: see _complete
+        timeout=60.0
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """The Azure OpenAI client, created on the first call."""
+    from openai import AzureOpenAI
+    return AzureOpenAI(**_client_settings())
+
+
+@functools.lru_cache(maxsize=1)
+def get_async_client():
+    """Async twin of get_client(), used by the async graph (server.py)."""
+    from openai import AsyncAzureOpenAI
+    return AsyncAzureOpenAI(**_client_settings())
+
 
 def extract_order(state: AgentState) -> Dict[str, Any]:
     """
     Node 2: The Intelligence Layer.
     Extracts structured order data using Azure OpenAI.
     Handles Text and Images (Vision) with a self-correction loop.
+    Long text documents are split into chunks that are extracted
+    concurrently and merged back into one FTLOrderResponse.
     """
     logger.info(">>> NODE 2: extract_order STARTED <<<")
+
+    residual = _text_branch(state) == "residual"
+    cache_key, cached = _lookup_cache(state, branch=_text_branch(state))
+    if cached is not None:
+        return {"raw_extraction": cached}
+
+    chunks = _plan_chunks(state)
+    if chunks is None:
+        raw_dict = _call_with_retries(_build_messages(state))
+        return _finish(raw_dict, cache_key, complete=raw_dict is not None, residual=residual)
+
+    # Map: one LLM conversation per chunk
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        results = list(pool.map(
+            carry_context(lambda chunk: _call_with_retries(_build_text_messages(chunk.text, residual))), chunks
+        ))
+
+    # Reduce
+    raw_dict, complete = merge_chunk_extractions(results, [chunk.overlap_lines for chunk in chunks])
+    return _finish(raw_dict, cache_key, complete, residual=residual)
+
+
+async def aextract_order(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 2 (Async Version): same retry loop as extract_order, but awaits
+    AsyncAzureOpenAI so the event loop can serve other requests meanwhile.
+    """
+    logger.info(">>> NODE 2: extract_order STARTED (async) <<<")
+
+    residual = _text_branch(state) == "residual"
+    cache_key, cached = _lookup_cache(state, branch=_text_branch(state))
+    if cached is not None:
+        return {"raw_extraction": cached}
+
+    chunks = _plan_chunks(state)
+    if chunks is None:
+        raw_dict = await _acall_with_retries(_build_messages(state))
+        return _finish(raw_dict, cache_key, complete=raw_dict is not None, residual=residual)
+
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def extract_chunk(chunk: TextChunk):
+        async with semaphore:
+            return await _acall_with_retries(_build_text_messages(chunk.text, residual))
+
+    results = await asyncio.gather(*[extract_chunk(chunk) for chunk in chunks])
+    raw_dict, complete = merge_chunk_extractions(results, [chunk.overlap_lines for chunk in chunks])
+    return _finish(raw_dict, cache_key, complete, residual=residual)
+
+
+def extract_scanned_pages(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 2b: Vision extraction for scanned PDF pages.
+    Runs in parallel with extract_order (which only sees the text pages).
+    Page images are sent in batches of VISION_BATCH_SIZE per request; the
+    batch results are merged like text chunks.
+    """
+    logger.info(">>> NODE 2b: extract_scanned_pages STARTED <<<")
+
+    cache_key, cached = _lookup_cache(state, branch="scanned")
+    if cached is not None:
+        return {"raw_extraction": cached}
+
+    batches = _plan_image_batches(state)
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        results = list(pool.map(carry_context(lambda batch: _call_with_retries(_build_vision_batch_messages(batch))), batches))
+
+    raw_dict, complete = merge_chunk_extractions(results)
+    return _finish(raw_dict, cache_key, complete)
+
+
+async def aextract_scanned_pages(state: AgentState) -> Dict[str, Any]:
+    """Node 2b (Async Version)."""
+    logger.info(">>> NODE 2b: extract_scanned_pages STARTED (async) <<<")
+
+    cache_key, cached = _lookup_cache(state, branch="scanned")
+    if cached is not None:
+        return {"raw_extraction": cached}
+
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def extract_batch(batch: List[Dict[str, Any]]):
+        async with semaphore:
+            return await _acall_with_retries(_build_vision_batch_messages(batch))
+
+    results = await asyncio.gather(*[extract_batch(batch) for batch in _plan_image_batches(state)])
+    raw_dict, complete = merge_chunk_extractions(results)
+    return _finish(raw_dict, cache_key, complete)
+
+
+def extract_sheet(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 2c: Row-batched extraction for CSV/XLSX.
+    The sheet is streamed in batches of SHEET_BATCH_ROWS rows. Rows the
+    tabular fast path can read never reach the LLM; the rest of a batch is
+    sent with the header row. At most SHEET_MAX_IN_FLIGHT batches are in
+    flight, and orders are merged back in row order.
+    """
+    logger.info(">>> NODE 2c: extract_sheet STARTED <<<")
+    stream = BytesIO(state["sheet_bytes"])
+    try:
+        cache_key, cached = _lookup_cache(state)
+        if cached is not None:
+            return {"raw_extraction": cached}
+
+        results = []
+        pending = deque()
+        extract_row_batch = carry_context(_extract_row_batch)
+        with ThreadPoolExecutor(max_workers=SHEET_MAX_IN_FLIGHT) as pool:
+            for batch in iter_row_batches(stream, state.get("file_type", "").lower()):
+                if len(pending) >= SHEET_MAX_IN_FLIGHT:
+                    # Wait for the oldest batch: keeps row order and the window size
+                    results.append(pending.popleft().result())
+                pending.append(pool.submit(extract_row_batch, *batch))
+            results.extend(future.result() for future in pending)
+    finally:
+        stream.close()
+
+    raw_dict, complete = _merge_row_batches(results)
+    return _finish(raw_dict, cache_key, complete)
+
+
+async def aextract_sheet(state: AgentState) -> Dict[str, Any]:
+    """Node 2c (Async Version): the sheet is read off the event loop, one batch at a time."""
+    logger.info(">>> NODE 2c: extract_sheet STARTED (async) <<<")
+    stream = BytesIO(state["sheet_bytes"])
+    pending = deque()
+    try:
+        cache_key, cached = _lookup_cache(state)
+        if cached is not None:
+            return {"raw_extraction": cached}
+
+        results = []
+        batches = iter_row_batches(stream, state.get("file_type", "").lower())
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            if len(pending) >= SHEET_MAX_IN_FLIGHT:
+                results.append(await pending.popleft())
+            pending.append(asyncio.create_task(_aextract_row_batch(*batch)))
+        while pending:
+            results.append(await pending.popleft())
+    finally:
+        for task in pending:
+            task.cancel()
+        stream.close()
+
+    raw_dict, complete = _merge_row_batches(results)
+    return _finish(raw_dict, cache_key, complete)
+
+
+# --- THE AGENTIC RETRY LOOP (Layer 2 Defense) ---
+
+def _call_with_retries(messages: List[Dict[str, Any]], profile: Optional[SchemaProfile] = None) -> Optional[Dict[str, Any]]:
+    """
+    Runs one conversation to a validated result; None if every attempt failed.
+    The whole request is only repeated when the response is unusable as a
+    whole; orders that fail validation are repaired on their own.
+    The model answers in `profile`'s shape (picked from the request when
+    not given) and the answer is expanded back into FTLOrder dicts.
+    """
+    from openai import APITimeoutError
+    profile = profile or _profile_for(messages)
+    current_try = 0
     
+    while current_try < MAX_RETRIES:
+        try:
+            current_try += 1
+            logger.info(f"LLM Call Attempt {current_try}/{MAX_RETRIES}...")
+
+            orders = profile.parse(_complete(messages, profile))
+            validated, failures = validate_orders(orders)
+
+            # Self-Correction: re-ask only about the failing orders
+            for repair_round in range(1, REPAIR_MAX_ROUNDS + 1):
+                if not failures:
+                    break
+                _log_repair(failures, len(orders), repair_round)
+                record_llm_retry("repair")
+                try:
+                    repair = profile.repair_profile
+                    repaired = repair.parse(_complete(_repair_messages(orders, failures, messages), repair))
+                except Exception as e:
+                    logger.warning(f"Repair round {repair_round} failed: {e}")
+                    break
+                failures = apply_repairs(orders, validated, failures, repaired)
+
+            record_llm_attempt("ok")
+            return _on_success(orders, validated, failures, current_try)
+
+        except UnusableResponseError as e:
+            logger.warning(f"⚠️ Unusable response on Attempt {current_try}: {e}")
+            _record_failed_attempt("unusable_response", current_try)
+
+        except APITimeoutError as e:
+            logger.error("API Timeout: Azure OpenAI did not respond in time.")
+            _record_failed_attempt("timeout", current_try)
+            continue
+
+        except Exception as e:
+            _log_fatal_error(e)
+            record_llm_attempt("error")
+            break
+
+    return None
+
+
+async def _acall_with_retries(messages: List[Dict[str, Any]], profile: Optional[SchemaProfile] = None) -> Optional[Dict[str, Any]]:
+    """Async twin of _call_with_retries."""
+    from openai import APITimeoutError
+    profile = profile or _profile_for(messages)
+    current_try = 0
+
+    while current_try < MAX_RETRIES:
+        try:
+            current_try += 1
+            logger.info(f"LLM Call Attempt {current_try}/{MAX_RETRIES}...")
+
+            orders = profile.parse(await _acomplete(messages, profile))
+            validated, failures = validate_orders(orders)
+
+            for repair_round in range(1, REPAIR_MAX_ROUNDS + 1):
+                if not failures:
+                    break
+                _log_repair(failures, len(orders), repair_round)
+                record_llm_retry("repair")
+                try:
+                    repair = profile.repair_profile
+                    repaired = repair.parse(await _acomplete(_repair_messages(orders, failures, messages), repair))
+                except Exception as e:
+                    logger.warning(f"Repair round {repair_round} failed: {e}")
+                    break
+                failures = apply_repairs(orders, validated, failures, repaired)
+
+            record_llm_attempt("ok")
+            return _on_success(orders, validated, failures, current_try)
+
+        except UnusableResponseError as e:
+            logger.warning(f"⚠️ Unusable response on Attempt {current_try}: {e}")
+            _record_failed_attempt("unusable_response", current_try)
+
+        except APITimeoutError as e:
+            logger.error("API Timeout: Azure OpenAI did not respond in time.")
+            _record_failed_attempt("timeout", current_try)
+            continue
+
+        except Exception as e:
+            _log_fatal_error(e)
+            record_llm_attempt("error")
+            break
+
+    return None
+
+
+def _complete(messages: List[Dict[str, Any]], profile: SchemaProfile) -> str:
+    """
+    One Structured Outputs call (in the profile's response shape), queued
+    behind the shared rate limiter.
+    A 429 is not a failed attempt: it is waited out (bounded) and re-sent.
+    Neither is a 5xx or a dropped connection: re-sent after a backoff (bounded).
+    Returns the raw JSON text; validation is ours (see repair.py).
+    """
+    from openai import RateLimitError
+    messages = profile.with_instructions(messages)
+    rate_limited = transient = 0
+    while True:
+        # Wait for our share of the deployment quota
+        estimated = _throttle(messages)
+        started = time.perf_counter()
+        try:
+            completion = get_client().chat.completions.create(
+                model=deployment_name(),
+                messages=messages,
+                response_format=profile.response_format,
+                temperature=0.0, # Deterministic for extraction
+            )
+        except Exception as e:
+            _record_failed_request(e, started)
+            if _is_transient(e):
+                transient += 1
+                if transient > TRANSIENT_MAX_RETRIES:
+                    raise
+                record_llm_retry("transient")
+                time.sleep(rate_limiter.on_transient_error(e, transient - 1))
+                continue
+            if not isinstance(e, RateLimitError):
+                raise
+            rate_limited += 1
+            if rate_limited > RATE_LIMIT_MAX_RETRIES:
+                raise
+            record_llm_retry("rate_limited")
+            time.sleep(rate_limiter.on_rate_limited(e, rate_limited - 1))
+            continue
+        _record_usage(completion, estimated, started)
+        return _response_content(completion)
+
+
+async def _acomplete(messages: List[Dict[str, Any]], profile: SchemaProfile) -> str:
+    """Async twin of _complete."""
+    from openai import RateLimitError
+    messages = profile.with_instructions(messages)
+    rate_limited = transient = 0
+    while True:
+        estimated = await _athrottle(messages)
+        started = time.perf_counter()
+        try:
+            completion = await get_async_client().chat.completions.create(
+                model=deployment_name(),
+                messages=messages,
+                response_format=profile.response_format,
+                temperature=0.0,
+            )
+        except Exception as e:
+            _record_failed_request(e, started)
+            if _is_transient(e):
+                transient += 1
+                if transient > TRANSIENT_MAX_RETRIES:
+                    raise
+                record_llm_retry("transient")
+                await asyncio.sleep(rate_limiter.on_transient_error(e, transient - 1))
+                continue
+            if not isinstance(e, RateLimitError):
+                raise
+            rate_limited += 1
+            if rate_limited > RATE_LIMIT_MAX_RETRIES:
+                raise
+            record_llm_retry("rate_limited")
+            await asyncio.sleep(rate_limiter.on_rate_limited(e, rate_limited - 1))
+            continue
+        _record_usage(completion, estimated, started)
+        return _response_content(completion)
+
+
+# --- HELPER FUNCTIONS (shared by the sync and async nodes) ---
+
+def _plan_chunks(state: AgentState) -> Optional[List[TextChunk]]:
+    """Chunks for a long text document, or None to extract it in one call."""
+    file_type = state.get("file_type", "").lower()
+    if not CHUNKING_ENABLED or file_type in IMAGE_TYPES:
+        return None
+    chunks = split_into_chunks(state.get("extracted_text", ""), state.get("pages"))
+    return chunks if len(chunks) > 1 else None
+
+
+def _text_branch(state: AgentState) -> str:
+    """Only part of the text is left when the tabular fast path read some rows."""
+    return "residual" if state.get("tabular_stats", {}).get("rows_extracted") else ""
+
+
+def _build_messages(state: AgentState) -> List[Dict[str, Any]]:
+    """Builds the system + user messages for Text or Vision mode."""
     extracted_text = state.get("extracted_text", "")
     file_type = state.get("file_type", "").lower()
     
     # 1. Determine Input Mode (Text vs Vision)
-    is_image = file_type in [".png", ".jpg", ".jpeg", ".bmp"]
-    
-    messages = [
-        {"role": "system", "content": EXTRACT_ORDER_SYSTEM_PROMPT}
-    ]
+    is_image = file_type in IMAGE_TYPES
 
     if is_image:
+        messages = [
+            {"role": "system", "content": EXTRACT_ORDER_SYSTEM_PROMPT}
+        ]
         logger.info(f"Detected Image ({file_type}). Preparing Vision Payload...")
         # For Vision, 'extracted_text' contains the Base64 string from Node 1
+        image_mime = state.get("image_mime") or "image/jpeg"
         user_content = [
             {"type": "text", "text": "Extract the Logistics Order details from this image."},
             {
                 "type": "image_url", 
-                "image_url": {"url": f"data:image/jpeg;base64,{extracted_text}"}
+                "image_url": {"url": f"data:{image_mime};base64,{extracted_text}"}
             }
         ]
         messages.append({"role": "user", "content": user_content})
     else:
         logger.info(f"Detected Text ({file_type}). Preparing Text Payload...")
-        user_content = f"Extract the Logistics Order details from the following text:\n\n{extracted_text}"
-        messages.append({"role": "user", "content": user_content})
+        messages = _build_text_messages(extracted_text, _text_branch(state) == "residual")
 
-    # 2. The Agentic Retry Loop (Layer 2 Defense)
-    MAX_RETRIES = 3
-    current_try = 0
-    
-    while current_try < MAX_RETRIES:
-        try:
-            current_try += 1
-            logger.info(f"LLM Call Attempt {current_try}/{MAX_RETRIES}...")
+    return messages
 
-            # API Call with Structured Outputs
-            completion = client.beta.chat.completions.parse(
-                model=DEPLOYMENT_NAME,
-                messages=messages,
-                response_format=FTLOrderResponse, 
-                temperature=0.0, # Deterministic for extraction
-            )
 
-            # 3. Parse and Validation
-            # If this succeeds, Pydantic has validated the structure
-            parsed_response = completion.choices[0].message.parsed
-            
-            # Convert to clean Dictionary for State Storage
-            raw_dict = parsed_response.model_dump(mode='json')
-            
-            logger.info(f"[SUCCESS]Extraction Successful on attempt {current_try}; {len(raw_dict["orders"])} orders extracted")
-            return {"raw_extraction": raw_dict}
-
-        except ValidationError as e:
-            logger.warning(f"⚠️ Validation Error on Attempt {current_try}: {e}")
-            
-            # Self-Correction: Add the error to conversation history so LLM can fix it
-            # We must convert the previous assistant output to string content for context
-            bad_response = completion.choices[0].message.content
-            messages.append({"role": "assistant", "content": bad_response})
-            messages.append({
-                "role": "user", 
-                "content": f"Your response failed validation. Error: {str(e)}. Please fix the format and try again."
-            })
+def _plan_image_batches(state: AgentState) -> List[List[Dict[str, Any]]]:
+    """Consecutive page images, VISION_BATCH_SIZE per request."""
+    images = state.get("page_images") or []
+    size = max(1, VISION_BATCH_SIZE)
+    batches = [images[i:i + size] for i in range(0, len(images), size)]
+    logger.info(f"{len(images)} scanned page images -> {len(batches)} Vision requests.")
+    return batches
 
-        except APITimeoutError as e:
-            logger.error("API Timeout: Azure OpenAI did not respond in time.")
-            continue
 
-        except RateLimitError:
-            logger.error("Rate limit exceeded from Azure OpenAI.")
-            break
+def _build_vision_batch_messages(images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """System prompt + several scanned pages of one document, in page order."""
+    pages = sorted({image["page"] for image in images})
+    label = f"page {pages[0]}" if len(pages) == 1 else f"pages {pages[0]}-{pages[-1]}"
+    user_content = [{
+        "type": "text",
+        "text": f"Extract the Logistics Order details from these scanned document images ({label}, in page order).",
+    }]
+    for image in images:
+        user_content.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:{image['mime']};base64,{image['data']}"}
+        })
+    return [
+        {"role": "system", "content": EXTRACT_ORDER_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content}
+    ]
 
-        except AuthenticationError:
-            logger.error("Authentication failed: Check Azure OpenAI credentials.")
-            break
 
-        except APIError as e:
-            logger.error(f"Azure OpenAI API error: {str(e)}")
-            break
+def _extract_row_batch(first_row: int, header: List[str], rows: List[List[str]]):
+    """(orders, ok) for one sheet batch: fast path first, the LLM for what is left."""
+    orders, leftover = rows_to_orders(header, rows)
+    if not leftover:
+        return orders, True
+    raw_dict = _call_with_retries(_build_text_messages(_row_batch_text(first_row, header, leftover)),
+                                  select_profile(tabular=True))
+    return orders + (raw_dict or {}).get("orders", []), raw_dict is not None
+
+
+async def _aextract_row_batch(first_row: int, header: List[str], rows: List[List[str]]):
+    orders, leftover = rows_to_orders(header, rows)
+    if not leftover:
+        return orders, True
+    raw_dict = await _acall_with_retries(_build_text_messages(_row_batch_text(first_row, header, leftover)),
+                                         select_profile(tabular=True))
+    return orders + (raw_dict or {}).get("orders", []), raw_dict is not None
+
+
+def _row_batch_text(first_row: int, header: List[str], rows: List[List[str]]) -> str:
+    return f"Spreadsheet rows of the batch starting at row {first_row} (header row first):\n" + format_rows(header, rows)
+
+
+def _merge_row_batches(results) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Concatenates batch orders in row order; (raw_extraction or None, all batches ok)."""
+    orders = [order for batch_orders, _ in results for order in batch_orders]
+    complete = all(ok for _, ok in results)
+    logger.info(f"Sheet extracted in {len(results)} row batches; {len(orders)} orders.")
+    if not orders and not complete:
+        return None, False
+    return {"orders": orders}, complete
+
+
+def _build_text_messages(text: str, residual: bool = False) -> List[Dict[str, Any]]:
+    """
+    System prompt + one text document (or chunk of one). A residual text is
+    what the tabular fast path left: its complete rows are already orders.
+    """
+    instruction = RESIDUAL_INSTRUCTION if residual else "Extract the Logistics Order details from the following text:"
+    return [
+        {"role": "system", "content": EXTRACT_ORDER_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{instruction}\n\n{text}"}
+    ]
+
+
+def cache_key_for(content_hash: str, branch: str = "") -> str:
+    """
+    Extraction cache key for a document under the current prompt/model/schema.
+    `branch` separates partial results ("scanned" pages, "residual" text
+    left by the tabular fast path) from whole-document ones.
+    """
+    source = f"{content_hash}:{branch}" if branch else content_hash
+    # The output profile changes what is extracted (e.g. no reasoning), so it is part of the key
+    # A schema change must not serve old-shaped extractions
+    schema = {"orders": order_response_schema(), "profile": SCHEMA_PROFILE}
+    prompt = EXTRACT_ORDER_SYSTEM_PROMPT + RESIDUAL_INSTRUCTION if branch == "residual" else EXTRACT_ORDER_SYSTEM_PROMPT
+    return make_cache_key(source, prompt, deployment_name(), schema)
+
+
+def _lookup_cache(state: AgentState, branch: str = ""):
+    """
+    Returns (cache_key, cached_raw_extraction). The key is None when caching
+    is off or the document has no content hash (e.g. state built by hand).
+    """
+    content_hash = state.get("content_hash")
+    if not EXTRACTION_CACHE_ENABLED or not content_hash:
+        return None, None
+
+    cache_key = cache_key_for(content_hash, branch)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"[CACHE HIT] Reusing extraction for content {content_hash[:12]}; {len(cached.get('orders', []))} orders")
+    return cache_key, cached
+
+
+def _throttle(messages: List[Dict[str, Any]]) -> int:
+    """Blocks until the shared limiter admits the request; returns its estimated tokens."""
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    estimated = estimate_request_tokens(messages)
+    rate_limiter.acquire(estimated)
+    return estimated
+
+
+async def _athrottle(messages: List[Dict[str, Any]]) -> int:
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    estimated = estimate_request_tokens(messages)
+    await rate_limiter.aacquire(estimated)
+    return estimated
+
+
+def _record_usage(completion, estimated: int, started: float):
+    """Replaces the estimate with the tokens the service actually counted; records the request."""
+    usage = getattr(completion, "usage", None)
+    record_llm_request(time.perf_counter() - started, "ok", usage)
+    if RATE_LIMIT_ENABLED and usage is not None:
+        rate_limiter.record_usage(estimated, getattr(usage, "total_tokens", None))
+
+
+def _is_transient(e: Exception) -> bool:
+    """
+    A 5xx answer or a dropped connection: worth re-sending as is.
+    Timeouts are not: the retry loop counts them as failed attempts.
+    """
+    from openai import APIConnectionError, APITimeoutError, InternalServerError
+    if isinstance(e, APITimeoutError):
+        return False
+    return isinstance(e, (APIConnectionError, InternalServerError))
+
+
+def _record_failed_request(e: Exception, started: float):
+    from openai import RateLimitError, APITimeoutError
+    if isinstance(e, RateLimitError):
+        result = "rate_limited"
+    elif isinstance(e, APITimeoutError):
+        result = "timeout"
+    elif _is_transient(e):
+        result = "transient"
+    else:
+        result = "error"
+    record_llm_request(time.perf_counter() - started, result)
+
+
+def _record_failed_attempt(outcome: str, current_try: int):
+    """An attempt that the loop repeats, unless it was the last one."""
+    record_llm_attempt(outcome)
+    if current_try < MAX_RETRIES:
+        record_llm_retry(outcome)
+
+
+def _response_content(completion) -> str:
+    """Raw JSON text of a completion; refusals and truncated output are unusable."""
+    choice = completion.choices[0]
+    if getattr(choice.message, "refusal", None):
+        raise UnusableResponseError(f"Model refused: {choice.message.refusal}")
+    if getattr(choice, "finish_reason", None) == "length":
+        raise UnusableResponseError("Response was cut off (max tokens reached)")
+    return choice.message.content
+
+
+def _profile_for(messages: List[Dict[str, Any]]) -> SchemaProfile:
+    """Output profile for a request: text requests are checked for tables, Vision ones are not."""
+    content = messages[-1]["content"]
+    return select_profile(content if isinstance(content, str) else None)
+
+
+def _repair_messages(orders: List[Dict[str, Any]], failures: Dict[int, List[Dict[str, Any]]],
+                     messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Repair prompt quoting source lines from the original text request (none for Vision)."""
+    source = messages[-1]["content"] if isinstance(messages[-1]["content"], str) else ""
+    return build_repair_messages(EXTRACT_ORDER_SYSTEM_PROMPT, orders, failures, source)
+
+
+def _log_repair(failures: Dict[int, List[Dict[str, Any]]], total: int, repair_round: int):
+    fields = sorted({error["field"] for errors in failures.values() for error in errors})
+    logger.warning(
+        f"⚠️ {len(failures)}/{total} orders failed validation ({', '.join(fields)}); "
+        f"repair round {repair_round}/{REPAIR_MAX_ROUNDS}."
+    )
+
+
+def _on_success(orders: List[Dict[str, Any]], validated: List[Optional[Dict[str, Any]]],
+                failures: Dict[int, List[Dict[str, Any]]], current_try: int) -> Dict[str, Any]:
+    """Every order is validated (or, if repair gave up, emptied for human review)."""
+    if failures:
+        drop_invalid_fields(orders, validated, failures)
+
+    raw_dict = {"orders": [order for order in validated if order is not None]}
+    
+    logger.info(f"[SUCCESS]Extraction Successful on attempt {current_try}; {len(raw_dict['orders'])} orders extracted")
+    return raw_dict
+
+
+def _finish(raw_dict: Optional[Dict[str, Any]], cache_key: Optional[str], complete: bool,
+            residual: bool = False) -> Dict[str, Any]:
+    """
+    State update for the node; caches only fully successful extractions.
+    A residual text's notes for every order become its document_context.
+    """
+    if raw_dict is None:
+        return _fallback()
+    if residual:
+        raw_dict = split_document_context(raw_dict)
+
+    if not complete:
+        logger.warning("Some chunks failed extraction; returning the orders that succeeded.")
+    elif cache_key:
+        # Only validated results are cached; the empty fallback never is
+        extraction_cache.put(cache_key, raw_dict)
+    return {"raw_extraction": raw_dict}
+
+
+def _log_fatal_error(e: Exception):
+    """Errors that should stop the retry loop immediately."""
+    from openai import APIError, RateLimitError, AuthenticationError
+    if isinstance(e, RateLimitError):
+        logger.error("Rate limit exceeded from Azure OpenAI.")
+    elif isinstance(e, AuthenticationError):
+        logger.error("Authentication failed: Check Azure OpenAI credentials.")
+    elif isinstance(e, APIError):
+        logger.error(f"Azure OpenAI API error: {str(e)}")
+    else:
+        logger.error(f"Unexpected system error: {e}", exc_info=True)
 
-        except Exception as e:
-            logger.error(f"Unexpected system error: {e}", exc_info=True)
-            # logger.error(f"Critical API Error")
-            # Check if it's an Auth error or Rate Limit (Logic to break loop can be added here)
-            break
 
-    # 4. Fallback (If all retries fail)
+def _fallback() -> Dict[str, Any]:
+    """Fallback (If all retries fail)"""
     logger.error("Max retries reached. Returning empty order to trigger Human Loop.")
     
     # We return an 'empty' order structure. 
@@ -142,4 +725,4 @@ def extract_order(state: AgentState) -> Dict[str, Any]:
     empty_structure = {
         "orders": [] 
     }
-    return {"raw_extraction": empty_structure}
\ No newline at end of file
+    return {"raw_extraction": empty_structure}
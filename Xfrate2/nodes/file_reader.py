@@ -1,12 +1,26 @@
 import os
-import requests
+import asyncio
 import base64
-import docx2txt
-import tempfile
-from pypdf import PdfReader
-from docx import Document
+import hashlib
+from io import BytesIO
+from urllib.parse import urlparse, unquote
+from Xfrate2.parsers.pdf import extract_pdf_pages
+from Xfrate2.parsers.images import preprocess_image
+from Xfrate2.parsers.docx_stream import read_docx_text
+from Xfrate2.parsers.spreadsheet import SHEET_TYPES
+from typing import Dict, Any
 from Xfrate2.utils import logger
 from Xfrate2.state import AgentState
+from Xfrate2.downloader import downloader, DocumentTooLargeError, MAX_DOCUMENT_BYTES
+
+# --- CONFIGURATION ---
+# file:// URLs are only read below this directory. Unset (the default), they are refused:
+# the HTTP API would otherwise read any file of the server for whoever asks.
+LOCAL_FILE_ROOT = os.getenv("LOCAL_FILE_ROOT", "")
+
+
+class LocalFileNotAllowedError(PermissionError):
+    """Raised for a file:// URL while LOCAL_FILE_ROOT is unset, or pointing outside it."""
 
 # def parse_document(state: AgentState) -> dict:
 #     """
@@ -87,79 +101,196 @@ from Xfrate2.state import AgentState
 def parse_document(state: AgentState) -> dict:
     """
     Node 1 (API Version): 
-    1. Downloads file from state['document_url'].
-    2. Runs standard text extraction (PyPDF, Docx, etc.).
+    1. Gets the file bytes: uploaded bytes in state['document_bytes'], a local
+       file:// URL (under LOCAL_FILE_ROOT only), or a download from state['document_url'] (pooled,
+       conditional-GET aware, see downloader.py).
+    2. Runs standard text extraction (PyPDF, Docx, etc.) straight from the buffer.
     """
     doc_url = state.get("document_url")
     if not doc_url:
         raise ValueError("Missing 'document_url' in state.")
 
-    logger.info(f"Downloading document from: {doc_url}")
+    ext = _infer_extension(doc_url)
 
-    # 1. Download File
+    # 1. Get the bytes into a (spooled) buffer
     try:
-        response = requests.get(doc_url, stream=True)
-        response.raise_for_status()
-        
-        # Infer extension from URL (fallback to .pdf)
-        filename = doc_url.split("?")[0].split("/")[-1]
-        _, ext = os.path.splitext(filename)
-        if not ext:
-            ext = ".pdf"
-        ext = ext.lower()
-
-        # Create Temp File
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
-            for chunk in response.iter_content(chunk_size=8192):
-                tmp_file.write(chunk)
-            temp_path = tmp_file.name
-            
-        logger.info(f"File saved to temp: {temp_path}")
+        if state.get("document_bytes") is not None:
+            buffer, content_hash = _buffer_from_bytes(state["document_bytes"])
+        elif doc_url.startswith("file://"):
+            buffer, content_hash = _buffer_from_local_file(doc_url)
+        else:
+            logger.info(f"Downloading document from: {doc_url}")
+            download = downloader.download(doc_url)
+            buffer, content_hash = download.buffer, download.content_hash
 
     except Exception as e:
         logger.error(f"Download Failed: {e}")
         raise e
 
-    # 2. Extract Content (Your Existing Logic)
-    extracted_text = ""
+    # 2. Extract Content
+    try:
+        buffer.seek(0)
+        content = _extract_content(buffer, ext)
+    finally:
+        buffer.close()
+
+    # Return updated state
+    return {
+        **content,
+        "file_type": ext,
+        "file_path": doc_url, # Keep the URL as the source of truth for metadata
+        "content_hash": content_hash
+    }
+
+
+async def aparse_document(state: AgentState) -> dict:
+    """
+    Node 1 (Async Version):
+    Same contract as parse_document, but the download runs on the shared
+    async httpx client and the CPU-bound parsing is pushed to a worker thread, so the
+    event loop stays free for other in-flight requests.
+    """
+    doc_url = state.get("document_url")
+    if not doc_url:
+        raise ValueError("Missing 'document_url' in state.")
+
+    ext = _infer_extension(doc_url)
+
+    # 1. Get the bytes (non-blocking for remote URLs)
     try:
-        # --- CASE A: PDF FILES ---
-        if ext == ".pdf":
-            reader = PdfReader(temp_path)
-            text_content = []
-            for page in reader.pages:
-                text_content.append(page.extract_text() or "")
-            extracted_text = "\n".join(text_content)
-
-        # --- CASE B: WORD DOCS ---
-        elif ext == ".docx":
-            doc = Document(temp_path)
-            extracted_text = "\n".join([para.text for para in doc.paragraphs])
-
-        # --- CASE C: IMAGES ---
-        elif ext in [".png", ".jpg", ".jpeg"]:
-            with open(temp_path, "rb") as image_file:
-                extracted_text = base64.b64encode(image_file.read()).decode('utf-8')
-
-        # --- CASE D: TEXT FILES ---
-        elif ext == ".txt":
-            with open(temp_path, "r", encoding="utf-8") as f:
-                extracted_text = f.read()
-        
+        if state.get("document_bytes") is not None:
+            buffer, content_hash = _buffer_from_bytes(state["document_bytes"])
+        elif doc_url.startswith("file://"):
+            buffer, content_hash = await asyncio.to_thread(_buffer_from_local_file, doc_url)
         else:
-            raise ValueError(f"Unsupported file format: {ext}")
+            logger.info(f"Downloading document from: {doc_url}")
+            download = await downloader.adownload(doc_url)
+            buffer, content_hash = download.buffer, download.content_hash
 
-        logger.info(f"Extraction complete. {len(extracted_text)} chars.")
+    except Exception as e:
+        logger.error(f"Download Failed: {e}")
+        raise e
 
+    # 2. Extract Content (off the event loop)
+    try:
+        buffer.seek(0)
+        content = await asyncio.to_thread(_extract_content, buffer, ext)
     finally:
-        # Cleanup: Delete the temp file to keep server clean
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            logger.info("Temp file cleaned up.")
+        buffer.close()
 
-    # Return updated state
     return {
-        "extracted_text": extracted_text,
+        **content,
         "file_type": ext,
-        "file_path": doc_url # Keep the URL as the source of truth for metadata
-    }
\ No newline at end of file
+        "file_path": doc_url,
+        "content_hash": content_hash
+    }
+
+
+# --- HELPER FUNCTIONS ---
+
+def _infer_extension(doc_url: str) -> str:
+    """Infer extension from URL (fallback to .pdf)"""
+    filename = doc_url.split("?")[0].split("/")[-1]
+    _, ext = os.path.splitext(filename)
+    if not ext:
+        ext = ".pdf"
+    return ext.lower()
+
+
+def _buffer_from_bytes(data: bytes):
+    """Wraps uploaded bytes without copying them to disk."""
+    if len(data) > MAX_DOCUMENT_BYTES:
+        raise DocumentTooLargeError(f"Document exceeds {MAX_DOCUMENT_BYTES} bytes")
+    logger.info(f"Using {len(data)} uploaded bytes.")
+    return BytesIO(data), hashlib.sha256(data).hexdigest()
+
+
+def _buffer_from_local_file(doc_url: str):
+    """Opens a file:// URL directly (the file itself is the buffer)."""
+    local_path = _resolve_local_path(doc_url)
+    if not os.path.exists(local_path):
+        raise FileNotFoundError(f"File not found: {local_path}")
+    if os.path.getsize(local_path) > MAX_DOCUMENT_BYTES:
+        raise DocumentTooLargeError(f"Document exceeds {MAX_DOCUMENT_BYTES} bytes")
+
+    logger.info(f"Reading local document: {local_path}")
+    local_file = open(local_path, "rb")
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: local_file.read(1024 * 1024), b""):
+        digest.update(chunk)
+    local_file.seek(0)
+    return local_file, digest.hexdigest()
+
+
+def _resolve_local_path(doc_url: str) -> str:
+    """
+    Real path of a file:// URL, with '..' and symlinks resolved, checked to
+    be inside LOCAL_FILE_ROOT.
+    """
+    if not LOCAL_FILE_ROOT:
+        raise LocalFileNotAllowedError("file:// URLs are disabled (set LOCAL_FILE_ROOT to allow them).")
+    parsed = urlparse(doc_url)
+    if parsed.netloc not in ("", "localhost"):
+        raise LocalFileNotAllowedError(f"file:// URL on another host: {parsed.netloc}")
+
+    root = os.path.realpath(LOCAL_FILE_ROOT)
+    local_path = os.path.realpath(unquote(parsed.path))
+    if os.path.commonpath([root, local_path]) != root:
+        raise LocalFileNotAllowedError(f"{unquote(parsed.path)} is outside LOCAL_FILE_ROOT.")
+    return local_path
+
+
+def _extract_content(stream, ext: str) -> Dict[str, Any]:
+    """
+    Runs the format specific parser over a binary file-like object.
+    Returns the state updates: always 'extracted_text', plus per-page
+    'pages' / 'page_timings' / 'page_images' (scanned pages) for PDFs,
+    'image_mime' / 'image_stats' for images and the raw 'sheet_bytes'
+    for CSV/XLSX.
+    """
+    extracted_text = ""
+    updates = {}
+
+    # --- CASE A: PDF FILES ---
+    if ext == ".pdf":
+        pages = extract_pdf_pages(stream.read())
+        # Scanned pages contribute no text; their images go to the Vision branch
+        page_texts = [page["text"] if page["has_text"] else "" for page in pages]
+        extracted_text = "\n".join(page_texts)
+        updates["pages"] = page_texts
+        updates["page_timings"] = [
+            {"page": page["page"], "seconds": round(page["seconds"], 4)} for page in pages
+        ]
+        updates["page_images"] = [
+            {"page": page["page"], **image} for page in pages for image in page["images"]
+        ]
+
+    # --- CASE B: WORD DOCS ---
+    elif ext == ".docx":
+        # Streamed straight from the XML; tables come out as ' | ' rows
+        extracted_text = read_docx_text(stream)
+
+    # --- CASE C: IMAGES ---
+    elif ext in [".png", ".jpg", ".jpeg"]:
+        # Downscale / re-encode to what the Vision model actually uses
+        image_bytes, mime, stats = preprocess_image(stream.read())
+        extracted_text = base64.b64encode(image_bytes).decode('utf-8')
+        updates["image_mime"] = mime
+        updates["image_stats"] = stats
+
+    # --- CASE D: TEXT FILES ---
+    elif ext == ".txt":
+        extracted_text = stream.read().decode("utf-8")
+
+    # --- CASE E: SPREADSHEETS ---
+    elif ext in SHEET_TYPES:
+        # Not parsed here: the sheet node streams the rows in batches. The state keeps
+        # bytes (capped by MAX_DOCUMENT_BYTES), never an open file that a failing node would leak
+        updates["sheet_bytes"] = stream.read()
+    
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    logger.info(f"Extraction complete. {len(extracted_text)} chars.")
+    updates["extracted_text"] = extracted_text
+    return updates
@@ -1,11 +1,13 @@
 # file: nodes/finalize_node.py
-import json
-import os
+import asyncio
 from typing import Dict, Any, List
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
 from Xfrate2.utils import logger
 from Xfrate2.state import AgentState
+from Xfrate2.order_batch import OrderBatch, as_batch
+from Xfrate2.replay import replay_store, REPLAY_STORE_ENABLED
+from Xfrate2.order_store import order_store, ORDER_STORE_ENABLED
 
 # Configuration for "Databases"
 # SUCCESS_DB_PATH = "success_orders.json"
@@ -123,67 +125,132 @@ from Xfrate2.state import AgentState
 def finalize_and_route(state: AgentState) -> Dict[str, Any]:
     """
     Node 4 (API Version): 
-    Separates 'Success' vs 'Needs Review' in memory.
+    Separates 'Success' vs 'Needs Review' in memory and stores both lists
+    in the order store (order_store.py) in one transaction.
     """
     logger.info(">>> NODE 4: Finalizing Data <<<")
     
     raw_extraction = state.get("raw_extraction", {})
     orders = raw_extraction.get("orders", [])
     validation_errors = state.get("validation_errors", [])
-    
-    success_batch = []
-    error_batch = []
-
-    # Map errors to order index
-    error_map = {i: [] for i in range(len(orders))}
-    for err in validation_errors:
-        idx = err.get("order_index")
-        if idx is not None and idx in error_map:
-            error_map[idx].append(err)
 
-    # Split Orders
-    for index, order in enumerate(orders):
-        order_errors = error_map[index]
-        
-        if not order_errors:
-            # Clean Order
-            clean_order = _flatten_and_format(order)
-            success_batch.append(clean_order)
-        else:
-            # Needs Review (Bundle raw data + errors)
-            error_record = {
-                "order_metadata": {
-                    "index": index, 
-                    "source": state.get("document_url", "unknown")
-                },
-                "raw_data": order,
-                "issues": order_errors
-            }
-            error_batch.append(error_record)
+    success_batch, error_batch = route_orders(orders, validation_errors, state.get("document_url", "unknown"))
 
     logger.info(f"Result: {len(success_batch)} Success, {len(error_batch)} Review")
 
+    _store_orders(state, success_batch, error_batch)
+
+    # Keep the raw extraction so threshold changes can be replayed offline
+    _record_run(state)
+
     # Update State with the result lists
     return {
         "final_orders": success_batch,
         "needs_review": error_batch
     }
 
-def _flatten_and_format(order: Dict) -> Dict:
-    """Helper to flatten Pydantic objects to simple dicts"""
-    flat = {}
-    for key, field_data in order.items():
-        if isinstance(field_data, dict):
-            # 1. Get Value
-            val = field_data.get("value")
-            
-            # 2. Date Formatting (ISO -> dd/mm/yyyy)
-            if "date" in key and isinstance(val, str):
+def route_orders(orders: Union[List[Dict], OrderBatch], validation_errors: List[Dict],
+                 source: str = "unknown") -> Tuple[List[Dict], List[Dict]]:
+    """Splits orders (an OrderBatch or a list of dicts) into (success, needs review) using their validation errors."""
+    batch = as_batch(orders)
+    error_batch = []
+
+    # Map errors to order index
+    error_map = {}
+    size = len(batch)
+    for err in validation_errors:
+        idx = err.get("order_index")
+        if isinstance(idx, int) and 0 <= idx < size:
+            error_map.setdefault(idx, []).append(err)
+
+    # Needs Review (Bundle raw data + errors)
+    for index in sorted(error_map):
+        error_record = {
+            "order_metadata": {
+                "index": index, 
+                "source": source
+            },
+            "raw_data": batch[index],
+            "issues": error_map[index]
+        }
+        error_batch.append(error_record)
+
+    # Clean Orders
+    clean = [index for index in range(size) if index not in error_map]
+    success_batch = _flatten_and_format(batch, clean)
+
+    return success_batch, error_batch
+
+async def afinalize_and_route(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 4 (Async Version): routing is in-memory; the order store and the
+    replay record touch disk, so the whole node runs in a worker thread.
+    """
+    return await asyncio.to_thread(finalize_and_route, state)
+
+def _store_orders(state: AgentState, success_batch: List[Dict], error_batch: List[Dict]):
+    """Persists the document's orders; the API response carries them even if the store fails."""
+    if not ORDER_STORE_ENABLED or not (success_batch or error_batch):
+        return
+    try:
+        stored = order_store.save(
+            success_batch, error_batch,
+            source=state.get("document_url") or state.get("file_path", ""),
+            request_id=state.get("request_id"),
+            content_hash=state.get("content_hash"),
+        )
+        logger.info(f"Committed {stored} orders to the order store.")
+    except Exception as e:
+        logger.error(f"Could not store orders: {e}", exc_info=True)
+
+def _record_run(state: AgentState):
+    """Stores the run for offline replay. Hand-built states (no content hash) are skipped."""
+    if not REPLAY_STORE_ENABLED or not state.get("content_hash"):
+        return
+    try:
+        replay_store.record(
+            raw_extraction=state.get("raw_extraction", {}),
+            source=state.get("document_url") or state.get("file_path", ""),
+            content_hash=state["content_hash"],
+            file_type=state.get("file_type", ""),
+        )
+    except Exception as e:
+        # Replay is a tuning aid; it must never fail a document
+        logger.warning(f"Could not record run for replay: {e}")
+
+def _flatten_and_format(batch: OrderBatch, indices: List[int]) -> List[Dict]:
+    """
+    Flattens the given orders to simple {field: value} dicts, column by column.
+    Dates go ISO -> dd/mm/yyyy; each distinct date string is parsed once.
+    """
+    columns = {}
+    for field in batch.fields:
+        column = batch.column(field)
+        values = column.values.tolist()
+        if "date" in field:
+            values = _format_dates(values)
+        columns[field] = (column.present.tolist(), values)
+
+    flat_orders = []
+    for index in indices:
+        flat = {}
+        for field in batch.field_order(index):
+            present, values = columns[field]
+            if present[index]:
+                flat[field] = values[index]
+        flat_orders.append(flat)
+    return flat_orders
+
+def _format_dates(values: List[Any]) -> List[Any]:
+    formatted = {}
+    result = []
+    for val in values:
+        if isinstance(val, str):
+            if val not in formatted:
                 try:
-                    dt = datetime.strptime(val, "%Y-%m-%d %H:%M")
-                    val = dt.strftime("%d/%m/%Y %H:%M")
+                    formatted[val] = datetime.strptime(val, "%Y-%m-%d %H:%M").strftime("%d/%m/%Y %H:%M")
                 except ValueError:
-                    pass 
-            
-            flat[key] = val
-    return flat
\ No newline at end of file
+                    formatted[val] = val
+            val = formatted[val]
+        result.append(val)
+    return result
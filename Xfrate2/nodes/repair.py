@@ -0,0 +1,171 @@
+# file: nodes/repair.py
+import os
+import copy
+import json
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import ValidationError
+from Xfrate2.utils import logger
+from Xfrate2.state import FTLOrder
+
+# --- CONFIGURATION ---
+# Repair re-prompts per response, each one only about the orders still failing
+REPAIR_MAX_ROUNDS = int(os.getenv("REPAIR_MAX_ROUNDS", "2"))
+# Source lines quoted per failing order so the model can re-read the value
+REPAIR_CONTEXT_LINES = int(os.getenv("REPAIR_CONTEXT_LINES", "3"))
+
+# Values used to find an order's own lines in the source text
+_ANCHOR_FIELDS = ["pickup_address", "destination_address", "pickup_date_and_time"]
+
+
+class UnusableResponseError(ValueError):
+    """The response as a whole cannot be used (bad JSON, refusal, truncation)."""
+
+
+def load_response(content: Optional[str]) -> Dict[str, Any]:
+    """The JSON object of a response; anything else is unusable."""
+    if not content:
+        raise UnusableResponseError("Empty response")
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise UnusableResponseError(f"Response is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise UnusableResponseError("Response is not a JSON object")
+    return data
+
+
+def parse_orders(content: Optional[str]) -> List[Dict[str, Any]]:
+    """The raw 'orders' list of a JSON response, before any validation."""
+    orders = load_response(content).get("orders")
+    if not isinstance(orders, list):
+        raise UnusableResponseError("Response has no 'orders' list")
+    return orders
+
+
+def validate_orders(orders: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], Dict[int, List[Dict[str, Any]]]]:
+    """
+    Validates every order on its own (FTLOrder, including its cleaners).
+    Returns (validated order or None per position, {position: field errors}).
+    """
+    validated: List[Optional[Dict[str, Any]]] = []
+    failures: Dict[int, List[Dict[str, Any]]] = {}
+    for index, order in enumerate(orders):
+        result, errors = _validate_one(order)
+        validated.append(result)
+        if errors:
+            failures[index] = errors
+    return validated, failures
+
+
+def build_repair_messages(system_prompt: str, orders: List[Dict[str, Any]],
+                          failures: Dict[int, List[Dict[str, Any]]], source_text: str) -> List[Dict[str, Any]]:
+    """
+    A minimal conversation about the failing orders only: each order, its
+    field errors and the few source lines it came from. The document itself
+    is not resent.
+    """
+    items = []
+    for index in sorted(failures):
+        item = {"order": orders[index], "errors": failures[index]}
+        lines = _source_lines(orders[index], source_text)
+        if lines:
+            item["source_lines"] = lines
+        items.append(item)
+
+    instruction = (
+        f"The following {len(items)} extracted orders failed validation. "
+        "Fix ONLY the fields listed under 'errors' (use the allowed values and types of the schema), "
+        "keep every other field exactly as given, and return exactly "
+        f"{len(items)} orders in the same order.\n\n"
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": instruction + json.dumps(items, ensure_ascii=False, default=str)},
+    ]
+
+
+def apply_repairs(orders: List[Dict[str, Any]], validated: List[Optional[Dict[str, Any]]],
+                  failures: Dict[int, List[Dict[str, Any]]], repaired: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Merges a repair response back by position (updates orders/validated in
+    place). Returns the failures that remain.
+    """
+    positions = sorted(failures)
+    if len(repaired) != len(positions):
+        logger.warning(f"Repair returned {len(repaired)} orders for {len(positions)} requested; ignoring it.")
+        return failures
+
+    remaining = {}
+    for index, candidate in zip(positions, repaired):
+        result, errors = _validate_one(candidate)
+        orders[index] = candidate
+        if errors:
+            remaining[index] = errors
+        else:
+            validated[index] = result
+    logger.info(f"Repair fixed {len(positions) - len(remaining)}/{len(positions)} orders.")
+    return remaining
+
+
+def drop_invalid_fields(orders: List[Dict[str, Any]], validated: List[Optional[Dict[str, Any]]],
+                        failures: Dict[int, List[Dict[str, Any]]]):
+    """
+    Last resort for orders repair could not fix: the offending fields are
+    emptied (value None, confidence 0) so the order reaches human review
+    instead of being lost. Updates `validated` in place.
+    """
+    for index, errors in failures.items():
+        order = copy.deepcopy(orders[index]) if isinstance(orders[index], dict) else {}
+        for error in errors:
+            order[error["field"]] = {
+                "value": None,
+                "confidence": 0.0,
+                "reasoning": f"Removed after failed validation: {error['issue']}",
+            }
+        validated[index], still_failing = _validate_one(order)
+        if still_failing:
+            logger.warning(f"Order {index} could not be salvaged; dropping it: {still_failing}")
+
+
+# --- HELPER FUNCTIONS ---
+
+def _validate_one(order: Any) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    try:
+        # The cleaners edit the field dicts they receive; keep the raw order intact
+        return FTLOrder.model_validate(copy.deepcopy(order)).model_dump(mode="json"), []
+    except ValidationError as e:
+        return None, _field_errors(e)
+
+
+def _field_errors(e: ValidationError) -> List[Dict[str, Any]]:
+    """One entry per top-level field, e.g. {'field': 'vehicle_type', 'issue': ..., 'value': 'Open'}."""
+    errors = {}
+    for error in e.errors():
+        field = str(error["loc"][0]) if error["loc"] else "order"
+        if field not in errors:
+            value = None if error["type"] == "missing" else error.get("input")
+            errors[field] = {"field": field, "issue": error["msg"], "value": value}
+    return list(errors.values())
+
+
+def _source_lines(order: Dict[str, Any], source_text: str) -> List[str]:
+    """Lines of the source that mention this order's addresses/date."""
+    if not source_text or not isinstance(order, dict):
+        return []
+    anchors = []
+    for field in _ANCHOR_FIELDS:
+        data = order.get(field)
+        value = data.get("value") if isinstance(data, dict) else None
+        if isinstance(value, str) and len(value.strip()) >= 4:
+            anchors.append(value.strip().lower())
+    if not anchors:
+        return []
+
+    lines = []
+    for line in source_text.splitlines():
+        lowered = line.lower()
+        if any(anchor in lowered for anchor in anchors):
+            lines.append(line.strip())
+            if len(lines) >= REPAIR_CONTEXT_LINES:
+                break
+    return lines
@@ -0,0 +1,195 @@
+# file: nodes/schema_profiles.py
+import os
+from functools import cached_property
+from typing import List, Dict, Any, Optional, Union, Literal, Generic, get_args, get_origin
+from pydantic import BaseModel, Field, create_model
+from Xfrate2.utils import logger
+from Xfrate2.state import FTLOrder, FTLOrderResponse, T
+from Xfrate2.nodes.repair import load_response, parse_orders, UnusableResponseError
+from Xfrate2.nodes.tabular import split_row
+
+# --- CONFIGURATION ---
+# Shape the model answers in (validation always sees FTLOrder dicts):
+#   full     - value + confidence + reasoning per field (most output tokens)
+#   lean     - value + confidence per field, no reasoning
+#   columnar - the field names once, then per-row value / confidence arrays
+#   auto     - columnar for tabular input, lean for everything else
+SCHEMA_PROFILE = os.getenv("SCHEMA_PROFILE", "auto").lower()
+# auto: text is tabular when this share of its lines are table rows
+TABULAR_MIN_ROW_SHARE = float(os.getenv("TABULAR_MIN_ROW_SHARE", "0.6"))
+
+ORDER_FIELDS = list(FTLOrder.model_fields)
+
+
+# --- COMPACT MODELS (generated from FTLOrder so they never drift from it) ---
+
+class LeanField(BaseModel, Generic[T]):
+    value: Optional[T] = Field(description="The extracted value")
+    confidence: float = Field(description="Confidence score between 0.0 and 1.0")
+
+
+def _value_type(annotation):
+    """T of FieldWithConfidence[T] / Optional[FieldWithConfidence[T]]."""
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    return annotation.__pydantic_generic_metadata__["args"][0]
+
+
+def _lean_annotation(annotation):
+    lean = LeanField[_value_type(annotation)]
+    return Optional[lean] if get_origin(annotation) is Union else lean
+
+
+LeanOrder = create_model(
+    "LeanOrder",
+    **{
+        name: (_lean_annotation(field.annotation), ... if field.is_required() else None)
+        for name, field in FTLOrder.model_fields.items()
+    },
+)
+LeanOrderResponse = create_model("LeanOrderResponse", orders=(List[LeanOrder], ...))
+
+
+class ColumnarRow(BaseModel):
+    values: List[Optional[Union[str, float]]] = Field(description="One value per column, in column order")
+    confidence: List[float] = Field(description="One confidence score (0.0 to 1.0) per column, in column order")
+
+
+class ColumnarOrderResponse(BaseModel):
+    columns: List[Literal[tuple(ORDER_FIELDS)]] = Field(description="The order fields, each listed once")
+    rows: List[ColumnarRow] = Field(description="One row per order")
+
+
+# --- PROFILES ---
+
+class SchemaProfile:
+    """
+    One output shape: its Structured Outputs `response_format`, a short
+    instruction for the model, and how to expand the answer back into
+    FTLOrder-shaped dicts ({"value", "confidence", "reasoning"} per field).
+    """
+
+    def __init__(self, name: str, model, instructions: str = ""):
+        self.name = name
+        self.model = model
+        self.instructions = instructions
+
+    @cached_property
+    def response_format(self) -> Dict[str, Any]:
+        """Built on first use: the strict schema needs openai, which is slow to import."""
+        from openai import pydantic_function_tool
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": self.model.__name__,
+                "schema": pydantic_function_tool(self.model)["function"]["parameters"],
+                "strict": True,
+            },
+        }
+
+    def parse(self, content: Optional[str]) -> List[Dict[str, Any]]:
+        """The raw orders of a response, in FTLOrder dict shape (not validated yet)."""
+        if self.name == "columnar":
+            return _expand_columnar(load_response(content))
+        orders = parse_orders(content)
+        if self.name == "lean":
+            return [_expand_lean(order) for order in orders]
+        return orders
+
+    def with_instructions(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The conversation with this profile's instruction after the system prompt."""
+        if not self.instructions:
+            return messages
+        return [messages[0], {"role": "system", "content": self.instructions}, *messages[1:]]
+
+    @property
+    def repair_profile(self) -> "SchemaProfile":
+        """Repairs re-send single orders, so they never use the columnar shape."""
+        return PROFILES["lean"] if self.name == "columnar" else self
+
+
+PROFILES = {
+    "full": SchemaProfile("full", FTLOrderResponse),
+    "lean": SchemaProfile(
+        "lean", LeanOrderResponse,
+        "Give only 'value' and 'confidence' for each field; no reasoning.",
+    ),
+    "columnar": SchemaProfile(
+        "columnar", ColumnarOrderResponse,
+        "Answer as a table: list the order fields once in 'columns', then one entry in 'rows' "
+        "per order with its 'values' and 'confidence' arrays in the same column order "
+        "(null value and 0.0 confidence when a field is not found).",
+    ),
+}
+
+if SCHEMA_PROFILE not in PROFILES and SCHEMA_PROFILE != "auto":
+    logger.warning(f"Unknown SCHEMA_PROFILE '{SCHEMA_PROFILE}'; using 'auto'.")
+    SCHEMA_PROFILE = "auto"
+
+
+def select_profile(text: Optional[str] = None, tabular: bool = False) -> SchemaProfile:
+    """
+    The profile for one request. `tabular` marks input known to be table
+    rows (sheet batches); otherwise auto looks at the text itself.
+    """
+    if SCHEMA_PROFILE != "auto":
+        return PROFILES[SCHEMA_PROFILE]
+    if tabular or (text and looks_tabular(text)):
+        return PROFILES["columnar"]
+    return PROFILES["lean"]
+
+
+def looks_tabular(text: str) -> bool:
+    """True when most non-empty lines split into 3+ table cells."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return False
+    rows = sum(1 for line in lines if len(split_row(line)) >= 3)
+    return rows / len(lines) >= TABULAR_MIN_ROW_SHARE
+
+
+# --- HELPER FUNCTIONS ---
+
+# Text fields: a columnar cell may come back as a number ("Qty" 12 -> "12")
+_TEXT_FIELDS = {name for name, field in FTLOrder.model_fields.items() if _value_type(field.annotation) is str}
+
+
+def _coerce(column: str, value: Any) -> Any:
+    if column in _TEXT_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(int(value)) if float(value).is_integer() else str(value)
+    return value
+
+
+def _expand_lean(order: Any) -> Any:
+    if not isinstance(order, dict):
+        return order
+    return {
+        name: {**field, "reasoning": None} if isinstance(field, dict) else field
+        for name, field in order.items()
+    }
+
+
+def _expand_columnar(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    columns, rows = data.get("columns"), data.get("rows")
+    if not isinstance(columns, list) or not isinstance(rows, list):
+        raise UnusableResponseError("Columnar response needs 'columns' and 'rows' lists")
+
+    orders = []
+    for number, row in enumerate(rows):
+        if not isinstance(row, dict):
+            row = {}
+        values, scores = row.get("values") or [], row.get("confidence") or []
+        if len(values) != len(columns):
+            # Short rows are padded with nulls: the order then goes to review, not lost
+            logger.warning(f"Columnar row {number} has {len(values)} values for {len(columns)} columns.")
+        order = {}
+        for position, column in enumerate(columns):
+            value = values[position] if position < len(values) else None
+            score = scores[position] if position < len(scores) else 0.0
+            order[column] = {"value": _coerce(column, value), "confidence": score, "reasoning": None}
+        # Required fields the model left out are explicit nulls, as in the other profiles
+        for name, field in FTLOrder.model_fields.items():
+            if name not in order and field.is_required():
+                order[name] = {"value": None, "confidence": 0.0, "reasoning": None}
+        orders.append(order)
+    return orders
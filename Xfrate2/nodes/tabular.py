@@ -0,0 +1,323 @@
+# file: nodes/tabular.py
+import os
+import re
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+from Xfrate2.normalize import normalize_date
+from pydantic import ValidationError
+from Xfrate2.utils import logger
+from Xfrate2.state import AgentState, FTLOrder
+from Xfrate2.nodes.validate_node import REQUIRED_FIELDS
+
+# --- CONFIGURATION ---
+TABULAR_FAST_PATH_ENABLED = os.getenv("TABULAR_FAST_PATH_ENABLED", "true").lower() == "true"
+# A header row needs at least this many columns mapped to FTLOrder fields
+TABULAR_MIN_MAPPED_COLUMNS = int(os.getenv("TABULAR_MIN_MAPPED_COLUMNS", "3"))
+# Numeric dates like 05/01/2026 are read day-first (Indian shippers)
+TABULAR_DAYFIRST = os.getenv("TABULAR_DAYFIRST", "true").lower() == "true"
+# Words outside the tables (titles, "Date: ...") up to which the rest of a fully read
+# document is not worth an LLM call. More text may hold orders of its own or notes for
+# the table's orders ("Refrigerated body for all orders"), so it goes to the LLM.
+TABULAR_MAX_CONTEXT_WORDS = int(os.getenv("TABULAR_MAX_CONTEXT_WORDS", "12"))
+
+IMAGE_TYPES = [".png", ".jpg", ".jpeg", ".bmp"]
+
+# Normalized header text -> FTLOrder field
+HEADER_SYNONYMS = {
+    "pickup_address": [
+        "origin", "from", "source", "pickup location", "pickup address", "pick up location",
+        "loading point", "loading location", "loading address",
+    ],
+    "destination_address": [
+        "destination", "to", "drop", "drop location", "drop address", "delivery location",
+        "delivery address", "unloading point", "unloading location",
+    ],
+    "vehicle_type": ["vehicle", "vehicle type", "vehicle required", "truck", "truck type"],
+    "body_type": ["body", "body type"],
+    "number_of_vehicle": [
+        "quantity", "qty", "vehicles", "no of vehicles", "number of vehicles", "trucks",
+        "no of trucks", "number of trucks",
+    ],
+    "total_weight": ["weight", "total weight", "tonnage", "load", "gross weight"],
+    "pickup_date_and_time": [
+        "pickup date", "pickup time", "pickup date/time", "pickup date time", "pick up date",
+        "loading date", "loading time", "placement date", "date",
+    ],
+    "expected_delivery_date_and_time": ["delivery date", "expected delivery", "delivery time", "eta"],
+    "product_category": ["category", "product category", "commodity"],
+    "product_description": ["product", "description", "product description", "material", "goods"],
+    "vehicle_size": ["vehicle size", "truck size", "size"],
+    "pod_type": ["pod", "pod type"],
+    "shippers_note": ["remarks", "remark", "notes", "note", "instructions", "comments"],
+}
+# Row counters carry no order data
+IGNORED_COLUMNS = {"", "s no", "sno", "sr", "sr no", "sl", "sl no", "no", "serial", "serial no", "row"}
+# Several columns may feed one of these (e.g. separate Date / Time columns)
+JOINABLE_FIELDS = {"pickup_date_and_time", "expected_delivery_date_and_time"}
+DATE_FIELDS = JOINABLE_FIELDS
+ORDER_FIELDS = list(FTLOrder.model_fields)
+
+_WEIGHT = re.compile(r"^(\d+(?:\.\d+)?)\s*(mt|t|tons?|tonnes?)?$", re.IGNORECASE)
+_COUNT = re.compile(r"^(\d+)\s*(?:nos?\.?|trucks?|vehicles?)?$", re.IGNORECASE)
+_WEIGHT_UNITS_OK = {"", "mt", "t", "ton", "tons", "tonne", "tonnes"}
+# Enum cells must be a bare label: "2x Trailer (Open Body)" carries more than one field
+_ENUM_LABEL = re.compile(r"^[A-Za-z][A-Za-z .-]*$")
+ENUM_FIELDS = {"vehicle_type", "body_type", "pod_type"}
+# Details a note outside the tables may give for every order ("Closed body, softcopy POD")
+DOCUMENT_CONTEXT_FIELDS = ["body_type", "pod_type", "product_category", "product_description",
+                           "vehicle_size", "shippers_note"]
+# An order with none of these is not an order of its own
+ORDER_IDENTITY_FIELDS = ["pickup_address", "destination_address", "pickup_date_and_time",
+                         "total_weight", "number_of_vehicle"]
+
+
+def _normalize_header(cell: str) -> Tuple[str, str]:
+    """'Weight (MT)' -> ('weight', 'mt'): header text and its unit, if any."""
+    unit = re.search(r"\(([^)]*)\)", cell)
+    name = re.sub(r"\([^)]*\)", " ", cell).lower()
+    name = re.sub(r"[^a-z0-9/ ]", " ", name)
+    return " ".join(name.split()), (unit.group(1).strip().lower() if unit else "")
+
+
+_SYNONYM_TO_FIELD = {
+    _normalize_header(synonym)[0]: field for field, synonyms in HEADER_SYNONYMS.items() for synonym in synonyms
+}
+
+
+def extract_tables(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 1.8: Deterministic Tabular Fast Path.
+    Recognizes tables with known headers ("Origin", "Destination", "Vehicle",
+    "Weight (MT)"...), maps each row to an FTLOrder and runs it through the
+    FTLOrder validators. Rows with every required field are final and never
+    reach the LLM; the remaining rows and the text outside the tables (with
+    the header rows) are left in 'extracted_text' for extract_node, which
+    reads orders written there and notes that apply to every order.
+    Only a title-sized rest (TABULAR_MAX_CONTEXT_WORDS) skips the LLM.
+    """
+    file_type = state.get("file_type", "").lower()
+    if not TABULAR_FAST_PATH_ENABLED or file_type in IMAGE_TYPES:
+        return {}
+
+    logger.info(">>> NODE 1.8: extract_tables STARTED <<<")
+
+    text = state.get("extracted_text", "")
+    pages = state.get("pages") or [text]
+    lines = [(page_index, line) for page_index, page in enumerate(pages) for line in page.splitlines()]
+
+    orders, consumed, table_lines, stats = _extract_rows([line for _, line in lines])
+    if not orders:
+        return {"tabular_stats": stats}
+
+    context_words = sum(len(line.split()) for index, (_, line) in enumerate(lines) if index not in table_lines)
+    needs_llm = stats["rows_left"] > 0 or context_words > TABULAR_MAX_CONTEXT_WORDS
+    logger.info(
+        f"Tabular fast path: {stats['rows_extracted']} rows extracted without the LLM, "
+        f"{stats['rows_left']} rows and {context_words} words of other text left for the LLM."
+    )
+
+    # Rebuild the text the LLM still has to read
+    kept_pages: List[List[str]] = [[] for _ in pages]
+    for index, (page_index, line) in enumerate(lines):
+        if index not in consumed:
+            kept_pages[page_index].append(line)
+    residual_pages = ["\n".join(page_lines) for page_lines in kept_pages]
+
+    updates = {
+        "raw_extraction": {"orders": orders},
+        "tabular_stats": stats,
+        # Nothing but the tables and a title: the LLM would only re-read context
+        "extracted_text": "\n".join(residual_pages) if needs_llm else "",
+    }
+    if state.get("pages"):
+        updates["pages"] = residual_pages if needs_llm else []
+    return updates
+
+
+async def aextract_tables(state: AgentState) -> Dict[str, Any]:
+    """Node 1.8 (Async Version): runs the row parsing off the event loop."""
+    return await asyncio.to_thread(extract_tables, state)
+
+
+def split_row(line: str) -> List[str]:
+    """Cells of a table row: pipe separated (DOCX/CSV), else tab, else 2+ spaces."""
+    stripped = line.strip()
+    if "|" in stripped:
+        if len(stripped) > 1 and stripped.startswith("|") and stripped.endswith("|"):
+            stripped = stripped[1:-1]   # markdown style | a | b |
+        cells = [cell.strip() for cell in stripped.split("|")]
+    elif "\t" in stripped:
+        cells = [cell.strip() for cell in stripped.split("\t")]
+    else:
+        cells = [cell.strip() for cell in re.split(r"\s{2,}", stripped)]
+    return cells if len(cells) >= 3 else []
+
+
+def map_header(cells: List[str]) -> Optional[List[Tuple[Optional[str], str]]]:
+    """
+    (field or None, unit) per column when the row is a recognizable header,
+    else None. Ambiguous headers (two columns claiming one field) are refused.
+    """
+    columns = []
+    seen = set()
+    for cell in cells:
+        name, unit = _normalize_header(cell)
+        field = _SYNONYM_TO_FIELD.get(name)
+        if field and field in seen and field not in JOINABLE_FIELDS:
+            return None
+        if field:
+            seen.add(field)
+        columns.append((field, unit))
+    return columns if len(seen) >= TABULAR_MIN_MAPPED_COLUMNS else None
+
+
+def rows_to_orders(header: List[str], rows: List[List[str]]) -> Tuple[List[Dict[str, Any]], List[List[str]]]:
+    """
+    Fast path for rows that are already split into cells (CSV/XLSX batches).
+    Returns (orders read by the rules, rows left for the LLM).
+    """
+    columns = map_header(header) if TABULAR_FAST_PATH_ENABLED else None
+    if columns is None:
+        return [], rows
+
+    orders, leftover = [], []
+    for row in rows:
+        # Writers trim or pad trailing empty cells; only real extra data needs the LLM
+        cells = (row + [""] * len(header))[:len(header)]
+        extra = any(row[len(header):])
+        order = None if extra else _row_to_order(header, columns, cells)
+        if order is None:
+            leftover.append(row)
+        else:
+            orders.append(order)
+    return orders, leftover
+
+
+def split_document_context(raw_extraction: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    For the LLM's reading of the residual text: an "order" with no lane, date,
+    weight or vehicle count only carries the document's notes. Its
+    DOCUMENT_CONTEXT_FIELDS move to raw_extraction["document_context"], which
+    the raw_extraction reducer applies to the fast path's orders.
+    """
+    orders, context = [], {}
+    for order in raw_extraction.get("orders", []):
+        if any(_value(order, field) is not None for field in ORDER_IDENTITY_FIELDS):
+            orders.append(order)
+            continue
+        for field in DOCUMENT_CONTEXT_FIELDS:
+            if _value(order, field) is not None:
+                context.setdefault(field, order[field])
+    if not context:
+        return raw_extraction
+    logger.info(f"Notes outside the tables apply to every order: {', '.join(context)}.")
+    return {**raw_extraction, "orders": orders, "document_context": context}
+
+
+# --- HELPER FUNCTIONS ---
+
+def _value(order: Dict[str, Any], field: str):
+    data = order.get(field)
+    return data.get("value") if isinstance(data, dict) else None
+
+
+def _extract_rows(lines: List[str]) -> Tuple[List[Dict[str, Any]], set, set, Dict[str, int]]:
+    """
+    Orders from every complete row, the indexes of the lines they came from,
+    the indexes of every table line (headers and rows), and counts.
+    """
+    orders = []
+    consumed = set()
+    table_lines = set()
+    stats = {"tables": 0, "rows_extracted": 0, "rows_left": 0}
+
+    index = 0
+    while index < len(lines):
+        cells = split_row(lines[index])
+        columns = map_header(cells) if cells else None
+        if columns is None:
+            index += 1
+            continue
+
+        stats["tables"] += 1
+        header = cells
+        table_lines.add(index)
+        index += 1
+        while index < len(lines):
+            row = split_row(lines[index])
+            if len(row) != len(header):
+                break   # end of the table
+            table_lines.add(index)
+            order = _row_to_order(header, columns, row)
+            if order is None:
+                stats["rows_left"] += 1
+            else:
+                orders.append(order)
+                consumed.add(index)
+                stats["rows_extracted"] += 1
+            index += 1
+
+    return orders, consumed, table_lines, stats
+
+
+def _row_to_order(header: List[str], columns: List[Tuple[Optional[str], str]],
+                  row: List[str]) -> Optional[Dict[str, Any]]:
+    """A validated order dict, or None when the row needs the LLM."""
+    values: Dict[str, List[str]] = {}
+    sources: Dict[str, List[str]] = {}
+    for (field, unit), title, cell in zip(columns, header, row):
+        if not cell:
+            continue
+        if field is None:
+            if _normalize_header(title)[0] in IGNORED_COLUMNS:
+                continue
+            return None   # data in a column we cannot map
+        value = _parse_value(field, cell, unit)
+        if value is None:
+            return None
+        values.setdefault(field, []).append(value)
+        sources.setdefault(field, []).append(title)
+
+    order = {}
+    for field in ORDER_FIELDS:
+        if field in values:
+            value = " ".join(values[field]) if field in JOINABLE_FIELDS else values[field][0]
+            if field in DATE_FIELDS:
+                value = _parse_date(value)
+                if value is None:
+                    return None
+            order[field] = {
+                "value": value,
+                "confidence": 1.0,
+                "reasoning": f"Table column: {', '.join(sources[field])}",
+            }
+        else:
+            order[field] = {"value": None, "confidence": 0.0, "reasoning": None}
+
+    if any(order[field]["value"] is None for field in REQUIRED_FIELDS):
+        return None
+
+    try:
+        # Same cleaners (clean_dates / clean_enums) and type checks as LLM output
+        return FTLOrder.model_validate(order).model_dump(mode="json")
+    except ValidationError:
+        return None
+
+
+def _parse_value(field: str, cell: str, unit: str):
+    """Strict per-field parsing; None means 'not sure, ask the LLM'."""
+    if field == "total_weight":
+        match = _WEIGHT.match(cell)
+        if not match or unit not in _WEIGHT_UNITS_OK:
+            return None
+        return float(match.group(1))
+    if field == "number_of_vehicle":
+        match = _COUNT.match(cell)
+        return int(match.group(1)) if match else None
+    if field in ENUM_FIELDS and not _ENUM_LABEL.match(cell):
+        return None
+    return cell
+
+
+def _parse_date(value: str) -> Optional[str]:
+    return normalize_date(value, dayfirst=TABULAR_DAYFIRST)
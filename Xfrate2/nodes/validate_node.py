@@ -1,7 +1,9 @@
 # file: nodes/validate_node.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
+import numpy as np
 from Xfrate2.utils import logger
 from Xfrate2.state import AgentState
+from Xfrate2.order_batch import OrderBatch, as_batch
 
 # --- CONFIGURATION ---
 CONFIDENCE_THRESHOLD = 0.8
@@ -26,9 +28,6 @@ def validate_data(state: AgentState) -> Dict[str, Any]:
     raw_extraction = state.get("raw_extraction", {})
     orders = raw_extraction.get("orders", [])
     
-    # The master list of all errors found across all orders
-    all_validation_errors = []
-
     if not orders:
         logger.warning("Critical: No orders found in extraction.")
         return {
@@ -40,19 +39,8 @@ def validate_data(state: AgentState) -> Dict[str, Any]:
             }]
         }
 
-    # --- MAIN LOOP: Process One Order at a Time ---
-    for index, order in enumerate(orders):
-        # Layer 1: Check for Missing Data
-        errs_1 = _check_completeness(order, index)
-        
-        # Layer 2: Check for Low Confidence
-        errs_2 = _check_confidence(order, index)
-        
-        # Layer 3: Check Business Physics (Negative weights, etc.)
-        errs_3 = _check_physics(order, index)
-        
-        # Aggregate logic: We show ALL errors to the user at once
-        all_validation_errors.extend(errs_1 + errs_2 + errs_3)
+    # The master list of all errors found across all orders
+    all_validation_errors = collect_validation_errors(orders)
 
     # Log Summary
     if all_validation_errors:
@@ -64,92 +52,109 @@ def validate_data(state: AgentState) -> Dict[str, Any]:
     return {"validation_errors": all_validation_errors}
 
 
-# --- SUB-NODES (The Modular Logic Layers) ---
+def collect_validation_errors(orders: Union[List[Dict], OrderBatch], confidence_threshold: float = CONFIDENCE_THRESHOLD,
+                              required_fields: List[str] = REQUIRED_FIELDS) -> List[Dict]:
+    """
+    The 3 layers over a batch of orders (an OrderBatch or a list of order dicts).
+    Each layer flags whole columns at once; error dicts are then built only
+    for the flagged orders, in the usual order: per order, completeness,
+    confidence, then physics.
+    The thresholds are parameters so stored extractions can be replayed
+    against candidate settings (see Xfrate2/replay.py).
+    """
+    batch = as_batch(orders)
 
-def _check_completeness(order: Dict, index: int) -> List[Dict]:
-    """Layer 1: Ensures all mandatory fields are present."""
-    errors = []
-    
-    for field in REQUIRED_FIELDS:
-        field_data = order.get(field)
-        
-        # Scenario A: Field is missing entirely from JSON
-        if field_data is None:
-            errors.append({
+    # Layer 1: Check for Missing Data
+    completeness = _check_completeness(batch, required_fields)
+
+    # Layer 2: Check for Low Confidence
+    low_confidence = _check_confidence(batch, confidence_threshold)
+
+    # Layer 3: Check Business Physics (Negative weights, etc.)
+    physics = _check_physics(batch)
+
+    # Errors are collected column by column into per-order lists; filling
+    # the layers in sequence keeps each order's errors in layer order.
+    by_order: List[List[Dict]] = [[] for _ in range(len(batch))]
+    for field, issue, mask in completeness:
+        for index in np.flatnonzero(mask).tolist():
+            by_order[index].append({"order_index": index, "field": field, "issue": issue, "current_value": None})
+
+    for field, mask in low_confidence.items():
+        column = batch.column(field)
+        values, scores = column.values.tolist(), column.confidence.tolist()
+        for index in np.flatnonzero(mask).tolist():
+            by_order[index].append({
                 "order_index": index,
                 "field": field,
-                "issue": "Field is missing",
-                "current_value": None
+                "issue": f"Low Confidence ({scores[index]:.2f})",
+                "current_value": values[index]
             })
-            continue
+    # Orders with their own key order list their confidence errors in that order
+    for index in batch.reordered:
+        if by_order[index]:
+            position = {field: n for n, field in enumerate(batch.field_order(index))}
+            by_order[index].sort(key=lambda e: position[e["field"]] if e["issue"].startswith("Low Confidence") else -1)
+
+    for field, issue, mask in physics:
+        column = batch.column(field)
+        # The weight is reported as the number it was checked as
+        values = (column.numbers() if field == "total_weight" else column.values).tolist()
+        for index in np.flatnonzero(mask).tolist():
+            by_order[index].append({"order_index": index, "field": field, "issue": issue, "current_value": values[index]})
+
+    # Aggregate logic: We show ALL errors to the user at once
+    all_validation_errors = []
+    for errors in by_order:
+        if errors:
+            all_validation_errors.extend(errors)
+    return all_validation_errors
+
 
+async def avalidate_data(state: AgentState) -> Dict[str, Any]:
+    """
+    Node 3 (Async Version): validation is pure CPU work on a small dict,
+    so it runs inline on the event loop.
+    """
+    return validate_data(state)
+
+
+# --- SUB-NODES (The Modular Logic Layers) ---
+# Each layer returns boolean masks over the batch (True = order has the issue).
+
+def _check_completeness(batch: OrderBatch, required_fields: List[str] = REQUIRED_FIELDS) -> List[Tuple[str, str, np.ndarray]]:
+    """Layer 1: Ensures all mandatory fields are present."""
+    checks = []
+    for field in required_fields:
+        column = batch.column(field)
+        # Scenario A: Field is missing entirely from JSON
+        checks.append((field, "Field is missing", column.missing))
         # Scenario B: Field exists but value is explicit None/Null
         # (This happens when LLM obeys 'return null if not found')
-        val = field_data.get("value")
-        if val is None:
-            errors.append({
-                "order_index": index,
-                "field": field,
-                "issue": "Missing required value",
-                "current_value": None
-            })
-            
-    return errors
+        checks.append((field, "Missing required value", ~column.missing & ~column.has_value))
+    return checks
 
 
-def _check_confidence(order: Dict, index: int) -> List[Dict]:
-    """Layer 2: Flags values where the AI is uncertain."""
-    errors = []
-    
-    for field_name, field_data in order.items():
-        # Skip metadata or non-dict fields
-        if not isinstance(field_data, dict):
-            continue
-            
-        value = field_data.get("value")
-        confidence = field_data.get("confidence", 0.0)
-        
-        # Only check confidence if we actually have a value
-        if value is not None:
-            if confidence < CONFIDENCE_THRESHOLD:
-                errors.append({
-                    "order_index": index,
-                    "field": field_name,
-                    "issue": f"Low Confidence ({confidence:.2f})",
-                    "current_value": value
-                })
-                
-    return errors
-
-
-def _check_physics(order: Dict, index: int) -> List[Dict]:
+def _check_confidence(batch: OrderBatch, threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, np.ndarray]:
+    """Layer 2: Flags values where the AI is uncertain (only fields that have a value)."""
+    masks = {}
+    for field in batch.fields:
+        column = batch.column(field)
+        mask = column.has_value & (column.confidence < threshold)
+        if mask.any():
+            masks[field] = mask
+    return masks
+
+
+def _check_physics(batch: OrderBatch) -> List[Tuple[str, str, np.ndarray]]:
     """Layer 3: Basic logic checks (Phase 1 Physics)."""
-    errors = []
-    
-    # Check 1: Weight must be positive
-    weight_data = order.get("total_weight", {})
-    if weight_data and weight_data.get("value"):
-        try:
-            val = float(weight_data["value"])
-            if val <= 0:
-                errors.append({
-                    "order_index": index,
-                    "field": "total_weight",
-                    "issue": "Weight must be positive",
-                    "current_value": val
-                })
-        except (ValueError, TypeError):
-            pass # Pydantic usually catches types, but safety first
-
-    # Check 2: Vehicle Count must be at least 1
-    count_data = order.get("number_of_vehicle", {})
-    if count_data and count_data.get("value"):
-        if count_data["value"] < 1:
-            errors.append({
-                "order_index": index,
-                "field": "number_of_vehicle",
-                "issue": "Vehicle count must be at least 1",
-                "current_value": count_data["value"]
-            })
-            
-    return errors
\ No newline at end of file
+    # Empty / non-numeric values are NaN and never flagged (Pydantic catches types)
+    weights = batch.column("total_weight").numbers()
+    counts = batch.column("number_of_vehicle").numbers()
+    return [
+        # Check 1: Weight must be positive
+        ("total_weight", "Weight must be positive", weights <= 0),
+        # Check 2: Vehicle Count must be at least 1
+        ("number_of_vehicle", "Vehicle count must be at least 1", counts < 1),
+    ]
+
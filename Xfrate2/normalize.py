@@ -0,0 +1,95 @@
+# file: normalize.py
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Iterable, Tuple
+from dateutil import parser
+
+# --- CONFIGURATION ---
+# Distinct strings remembered per normalizer (tables repeat the same few values)
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "4096"))
+
+DATE_OUTPUT_FORMAT = "%Y-%m-%d %H:%M"
+
+# Tried with strptime before dateutil. Only formats that dateutil reads the
+# same way are listed, so the fast path never changes a result.
+_TEXT_MONTH_FORMATS = (
+    "%d %b %Y", "%d %B %Y", "%d-%b-%Y", "%d-%B-%Y", "%b %d, %Y", "%B %d, %Y",
+    "%d %b %Y %H:%M", "%d %B %Y %H:%M", "%d-%b-%Y %H:%M", "%b %d, %Y %H:%M", "%B %d, %Y %H:%M",
+)
+# Numeric day/month order follows `dayfirst`, as dateutil does
+_NUMERIC_FORMATS = {
+    True: ("%d/%m/%Y", "%d/%m/%Y %H:%M", "%d-%m-%Y", "%d-%m-%Y %H:%M", "%d.%m.%Y", "%d.%m.%Y %H:%M"),
+    False: ("%m/%d/%Y", "%m/%d/%Y %H:%M", "%m-%d-%Y", "%m-%d-%Y %H:%M", "%m.%d.%Y", "%m.%d.%Y %H:%M"),
+}
+
+
+# Two different "today"s: a string that only parses the same under both names a full date
+_PROBE_DEFAULTS = (datetime(2000, 1, 1), datetime(2001, 2, 2))
+_PARTIAL = object()
+
+
+def normalize_date(value: str, dayfirst: bool = False) -> Optional[str]:
+    """
+    A date/time string as 'YYYY-MM-DD HH:MM', or None if it is not a date.
+    ISO and the known formats are parsed directly; only other strings go
+    through dateutil. Complete dates are memoized; a partial one ("Monday
+    10am", "15 Jan") takes the missing parts from today, so it is parsed
+    on every call.
+    """
+    text = value.strip()
+    result = _complete_date(text, dayfirst)
+    if result is not _PARTIAL:
+        return result
+    try:
+        return parser.parse(text, dayfirst=dayfirst).strftime(DATE_OUTPUT_FORMAT)
+    except (ValueError, OverflowError):
+        return None
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _complete_date(text: str, dayfirst: bool):
+    """normalize_date of a string that does not depend on today (None: not a date), else _PARTIAL."""
+    try:
+        # dayfirst would swap month and day of an ISO date, so ISO comes first
+        return datetime.fromisoformat(text).strftime(DATE_OUTPUT_FORMAT)
+    except ValueError:
+        pass
+    for fmt in (_NUMERIC_FORMATS[dayfirst] if text[:1].isdigit() else ()) + _TEXT_MONTH_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime(DATE_OUTPUT_FORMAT)
+        except ValueError:
+            continue
+    try:
+        first, second = (parser.parse(text, dayfirst=dayfirst, default=default) for default in _PROBE_DEFAULTS)
+    except (ValueError, OverflowError):
+        return None
+    return first.strftime(DATE_OUTPUT_FORMAT) if first == second else _PARTIAL
+
+
+# Cache controls, as on the other memoized normalizers
+normalize_date.cache_info = _complete_date.cache_info
+normalize_date.cache_clear = _complete_date.cache_clear
+
+
+class EnumTable:
+    """
+    Maps free-text labels of ONE enum field to its allowed values: exact
+    labels (any case) first, then the field's own keyword rules in order.
+    Unknown strings are returned unchanged (validation rejects them).
+    Lookups are memoized.
+    """
+
+    def __init__(self, enum, keywords: Iterable[Tuple[str, str]] = ()):
+        self.exact = {member.value.lower(): member.value for member in enum}
+        self.keywords = list(keywords)
+        self.lookup = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(self._lookup)
+
+    def _lookup(self, value: str) -> str:
+        lowered = value.strip().lower()
+        if lowered in self.exact:
+            return self.exact[lowered]
+        for keyword, label in self.keywords:
+            if keyword in lowered:
+                return label
+        return value
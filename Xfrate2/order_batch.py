@@ -0,0 +1,121 @@
+# file: order_batch.py
+from typing import List, Dict, Any, Iterator, Optional
+import numpy as np
+
+
+class FieldColumn:
+    """
+    One field of every order in a batch, as parallel arrays:
+      present     - the field is a {"value", "confidence", ...} dict
+      missing     - the field is absent (or None) in the order
+      has_value   - present with a non-null value
+      values      - the raw values (object array, None where absent)
+      confidence  - float array (0.0 where the dict has none, NaN where absent)
+    """
+    __slots__ = ("present", "missing", "has_value", "values", "confidence", "_numbers")
+
+    def __init__(self, present: np.ndarray, missing: np.ndarray, has_value: np.ndarray,
+                 values: np.ndarray, confidence: np.ndarray):
+        self.present = present
+        self.missing = missing
+        self.has_value = has_value
+        self.values = values
+        self.confidence = confidence
+        self._numbers: Optional[np.ndarray] = None
+
+    def numbers(self) -> np.ndarray:
+        """Truthy numeric values as floats; NaN for empty, zero or non-numeric values."""
+        if self._numbers is None:
+            self._numbers = np.fromiter((_as_number(v) for v in self.values), dtype=float, count=len(self.values))
+        return self._numbers
+
+
+class OrderBatch:
+    """
+    Struct-of-arrays view of a list of extracted orders (FTLOrder dicts), so
+    the validation layers and the finalizer work on whole columns instead of
+    walking every field of every order.
+
+    The per-order dict API stays available: `batch[i]`, iteration and
+    `batch.orders` return the original dicts, untouched.
+    """
+
+    def __init__(self, orders: List[Dict[str, Any]]):
+        self.orders = orders
+        self.size = len(orders)
+        # Field order matters: errors and flattened orders follow each order's key order
+        self._columns: Dict[str, FieldColumn] = {}
+
+        key_orders = [tuple(order) for order in orders]
+        layout = key_orders[0] if key_orders else ()
+        differing = [index for index, keys in enumerate(key_orders) if keys != layout]
+        self.fields = list(dict.fromkeys(layout + tuple(k for index in differing for k in key_orders[index])))
+        # Orders whose keys do not follow the batch's field order (rare: the LLM output
+        # is model-dumped). Orders that merely miss some fields still follow it.
+        position = {field: n for n, field in enumerate(self.fields)}
+        self.reordered = {index for index in differing if not _follows(key_orders[index], position)}
+
+        # One pass per field (list comprehensions), not one per field per order
+        for field in self.fields:
+            cells = [order.get(field) for order in orders]
+            present = [isinstance(cell, dict) for cell in cells]
+            values = [cell.get("value") if ok else None for cell, ok in zip(cells, present)]
+            # A null confidence counts as 0.0, like a missing one
+            confidence = [(cell.get("confidence", 0.0) or 0.0) if ok else np.nan for cell, ok in zip(cells, present)]
+            value_array = np.empty(self.size, dtype=object)
+            value_array[:] = values
+            self._columns[field] = FieldColumn(
+                present=np.array(present, dtype=bool),
+                missing=np.array([cell is None for cell in cells], dtype=bool),
+                has_value=np.array([value is not None for value in values], dtype=bool),
+                values=value_array,
+                confidence=np.array(confidence, dtype=float),
+            )
+
+    def column(self, field: str) -> FieldColumn:
+        """The column of `field`; an all-missing column if no order has it."""
+        column = self._columns.get(field)
+        if column is None:
+            values = np.empty(self.size, dtype=object)
+            column = FieldColumn(np.zeros(self.size, dtype=bool), np.ones(self.size, dtype=bool),
+                                 np.zeros(self.size, dtype=bool), values, np.full(self.size, np.nan))
+            self._columns[field] = column
+        return column
+
+    def field_order(self, index: int) -> List[str]:
+        """The fields of one order, in that order's own key order."""
+        return list(self.orders[index]) if index in self.reordered else self.fields
+
+    # --- Compatibility view (list of dicts) ---
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.orders[index]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.orders)
+
+
+def as_batch(orders) -> OrderBatch:
+    """Accepts either an OrderBatch or a plain list of order dicts."""
+    return orders if isinstance(orders, OrderBatch) else OrderBatch(orders)
+
+
+# --- HELPER FUNCTIONS ---
+
+
+def _follows(keys: tuple, position: Dict[str, int]) -> bool:
+    positions = [position[key] for key in keys]
+    return all(a < b for a, b in zip(positions, positions[1:]))
+
+
+def _as_number(value) -> float:
+    # Mirrors the per-order physics checks: falsy and non-numeric values are skipped
+    if not value:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
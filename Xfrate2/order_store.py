@@ -0,0 +1,307 @@
+# file: order_store.py
+"""
+Persistent store for finalized orders (Node 4).
+
+Replaces the old JSON-file "databases" (success_orders.json /
+needs_review_orders.json), which were reloaded and rewritten whole on
+every batch. The backend is pluggable (ORDER_STORE_BACKEND); the default
+is an embedded SQLite database:
+  - one transaction per document, rows inserted in bulk
+  - indexed by source document, pickup date and lane (pickup -> destination)
+  - WAL mode, so API processes and job workers can write concurrently
+
+The JSON files are imported once with:
+    python -m Xfrate2.order_store --migrate
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Tuple
+from Xfrate2.utils import logger
+from Xfrate2.normalize import normalize_date
+
+# --- CONFIGURATION ---
+ORDER_STORE_ENABLED = os.getenv("ORDER_STORE_ENABLED", "true").lower() == "true"
+# "sqlite", or "package.module:ClassName" for a backend of your own (built with no arguments)
+ORDER_STORE_BACKEND = os.getenv("ORDER_STORE_BACKEND", "sqlite")
+ORDER_DB_PATH = os.getenv("ORDER_DB_PATH", "orders.db")
+# The files written by the old finalize node
+LEGACY_SUCCESS_PATH = "success_orders.json"
+LEGACY_REVIEW_PATH = "needs_review_orders.json"
+
+STATUS_SUCCESS = "success"
+STATUS_REVIEW = "needs_review"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    status              TEXT NOT NULL,
+    source              TEXT,
+    request_id          TEXT,
+    content_hash        TEXT,
+    order_index         INTEGER,
+    pickup_date         TEXT,
+    pickup_address      TEXT,
+    destination_address TEXT,
+    record              TEXT NOT NULL,
+    created_at          REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_source ON orders (source);
+CREATE INDEX IF NOT EXISTS idx_orders_pickup_date ON orders (pickup_date);
+CREATE INDEX IF NOT EXISTS idx_orders_lane ON orders (pickup_address, destination_address);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, created_at);
+CREATE TABLE IF NOT EXISTS migrations (
+    name       TEXT PRIMARY KEY,
+    rows       INTEGER NOT NULL,
+    applied_at REAL NOT NULL
+);
+"""
+
+
+class OrderStore(ABC):
+    """
+    Interface of an order store backend. `save` receives one document's
+    routed orders as finalize_and_route produced them: flat success orders
+    and review records ({"order_metadata", "raw_data", "issues"}).
+    A backend missing a method fails when it is built, not mid-finalize.
+    """
+
+    @abstractmethod
+    def save(self, success: List[Dict[str, Any]], review: List[Dict[str, Any]], source: str,
+             request_id: Optional[str] = None, content_hash: Optional[str] = None) -> int:
+        """Stores both lists atomically. Returns the number of orders stored."""
+
+    @abstractmethod
+    def find(self, status: Optional[str] = None, source: Optional[str] = None,
+             pickup_from: Optional[str] = None, pickup_to: Optional[str] = None,
+             lane: Optional[Tuple[str, str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Stored orders, newest first. Pickup dates are ISO ('YYYY-MM-DD'), both ends inclusive."""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of stored orders per status."""
+
+
+class SQLiteOrderStore(OrderStore):
+    """
+    Embedded SQLite backend. The database is created on first use, so
+    importing the module is free.
+    """
+
+    def __init__(self, db_path: str = ORDER_DB_PATH):
+        self.db_path = db_path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            with self._lock:
+                conn.executescript(_SCHEMA)
+                self._ready = True
+        return conn
+
+    def save(self, success, review, source, request_id=None, content_hash=None) -> int:
+        rows = _rows(success, review, source, request_id, content_hash, time.time())
+        if not rows:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(_INSERT, rows)
+        return len(rows)
+
+    def find(self, status=None, source=None, pickup_from=None, pickup_to=None, lane=None, limit=100):
+        query = "SELECT * FROM orders WHERE 1=1"
+        params: List[Any] = []
+        for clause, value in (("status = ?", status), ("source = ?", source),
+                              ("pickup_date >= ?", pickup_from), ("pickup_date <= ?", pickup_to)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        if lane is not None:
+            query += " AND pickup_address = ? AND destination_address = ?"
+            params.extend(lane)
+        query += " ORDER BY order_id DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            return [_row_to_order(row) for row in conn.execute(query, params)]
+
+    def counts(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall()
+        counts = {STATUS_SUCCESS: 0, STATUS_REVIEW: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def migrate_json_files(self, success_path: str = LEGACY_SUCCESS_PATH,
+                           review_path: str = LEGACY_REVIEW_PATH) -> Dict[str, int]:
+        """
+        One-time import of the old JSON files. Each file is imported in the
+        same transaction that marks it done, so running this again (or from
+        two processes at once) never duplicates orders. An empty or unreadable
+        file is skipped without being marked, so it can be imported once
+        repaired. Returns rows imported per file.
+        """
+        imported = {}
+        for path, status in ((success_path, STATUS_SUCCESS), (review_path, STATUS_REVIEW)):
+            if not os.path.exists(path):
+                continue
+            name = f"json:{os.path.abspath(path)}"
+            records = _load_json_list(path)
+            if not records:
+                logger.warning(f"{path} holds no orders; not importing it (nor marking it imported).")
+                continue
+            with closing(self._connect()) as conn:
+                conn.isolation_level = None
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                        conn.execute("ROLLBACK")
+                        logger.info(f"{path} was already imported; skipping.")
+                        continue
+                    if status == STATUS_SUCCESS:
+                        rows = _rows(records, [], None, None, None, time.time())
+                    else:
+                        rows = _rows([], records, None, None, None, time.time())
+                    conn.executemany(_INSERT, rows)
+                    conn.execute("INSERT INTO migrations (name, rows, applied_at) VALUES (?, ?, ?)",
+                                 (name, len(rows), time.time()))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            imported[path] = len(rows)
+            logger.info(f"Imported {len(rows)} orders from {path}.")
+        return imported
+
+
+# Backends by name; ORDER_STORE_BACKEND may also name a class by import path
+ORDER_STORE_BACKENDS = {"sqlite": SQLiteOrderStore}
+
+
+def create_order_store(backend: str = ORDER_STORE_BACKEND) -> OrderStore:
+    if backend in ORDER_STORE_BACKENDS:
+        return ORDER_STORE_BACKENDS[backend]()
+    module_name, _, class_name = backend.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown order store backend {backend!r} (known: {', '.join(ORDER_STORE_BACKENDS)})")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# Global instance, like replay_store
+order_store = create_order_store()
+
+
+# --- HELPER FUNCTIONS ---
+
+_INSERT = """
+INSERT INTO orders (status, source, request_id, content_hash, order_index, pickup_date,
+                    pickup_address, destination_address, record, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _rows(success: List[Dict[str, Any]], review: List[Dict[str, Any]], source: Optional[str],
+          request_id: Optional[str], content_hash: Optional[str], created_at: float) -> List[Tuple]:
+    """INSERT parameters for one document (success orders first, then review records)."""
+    rows = []
+    for index, order in enumerate(success):
+        # Flat success orders carry the delivery format (dd/mm/yyyy HH:MM)
+        rows.append((
+            STATUS_SUCCESS, source, request_id, content_hash, index,
+            _iso_day(order.get("pickup_date_and_time"), dayfirst=True),
+            order.get("pickup_address"), order.get("destination_address"),
+            json.dumps(order, default=str), created_at,
+        ))
+    for record in review:
+        metadata = record.get("order_metadata", {})
+        raw = record.get("raw_data") or {}
+        rows.append((
+            STATUS_REVIEW,
+            # Old records named these index_in_file / source_file
+            source or metadata.get("source") or metadata.get("source_file"),
+            request_id, content_hash, metadata.get("index", metadata.get("index_in_file")),
+            _iso_day(_field_value(raw, "pickup_date_and_time")),
+            _field_value(raw, "pickup_address"), _field_value(raw, "destination_address"),
+            json.dumps(record, default=str), created_at,
+        ))
+    return rows
+
+
+def _field_value(raw: Dict[str, Any], field: str) -> Any:
+    """Value of a {value, confidence} field of a raw order (review records)."""
+    data = raw.get(field)
+    return data.get("value") if isinstance(data, dict) else data
+
+
+def _iso_day(value: Any, dayfirst: bool = False) -> Optional[str]:
+    """'YYYY-MM-DD' of a pickup date, so the index orders chronologically; None if unreadable."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    if dayfirst:
+        try:
+            return datetime.strptime(value, "%d/%m/%Y %H:%M").strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    try:
+        normalized = normalize_date(value, dayfirst=dayfirst)
+    except (ValueError, OverflowError):
+        return None
+    return normalized[:10] if normalized else None
+
+
+def _row_to_order(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "order_id": row["order_id"],
+        "status": row["status"],
+        "source": row["source"],
+        "request_id": row["request_id"],
+        "pickup_date": row["pickup_date"],
+        "record": json.loads(row["record"]),
+        "created_at": row["created_at"],
+    }
+
+
+def _load_json_list(path: str) -> List[Dict[str, Any]]:
+    """Records of an old JSON "database"; an empty or corrupt file has none."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        logger.warning(f"{path} could not be read as JSON: {e}")
+        return []
+    if not isinstance(data, list):
+        logger.warning(f"{path} is not a JSON list of orders.")
+        return []
+    return data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Inspect the order store or import the old JSON files.")
+    arg_parser.add_argument("--db", default=ORDER_DB_PATH, help="Path to the orders SQLite file")
+    arg_parser.add_argument("--migrate", action="store_true", help="Import the JSON files (once)")
+    arg_parser.add_argument("--success-json", default=LEGACY_SUCCESS_PATH)
+    arg_parser.add_argument("--review-json", default=LEGACY_REVIEW_PATH)
+    args = arg_parser.parse_args(argv)
+
+    store = SQLiteOrderStore(args.db)
+    report: Dict[str, Any] = {}
+    if args.migrate:
+        report["imported"] = store.migrate_json_files(args.success_json, args.review_json)
+    report["counts"] = store.counts()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
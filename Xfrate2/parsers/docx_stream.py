@@ -0,0 +1,84 @@
+# file: parsers/docx_stream.py
+import zipfile
+from typing import Iterator
+from Xfrate2.utils import logger
+
+# WordprocessingML namespace
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+DOCUMENT_PART = "word/document.xml"
+ROW_SEPARATOR = " | "
+
+_TEXT_TAGS = (W + "t", W + "tab", W + "br", W + "cr")
+
+
+def iter_docx_blocks(stream) -> Iterator[str]:
+    """
+    Streams the body of a .docx in document order, one block at a time:
+    - a paragraph -> its text
+    - a table row -> its cell texts joined with ' | '
+    The XML is read with an incremental parser and every element is dropped
+    once it has been emitted, so memory stays flat no matter how long the
+    document is. Nested tables are flattened into their outer cell.
+    """
+    from lxml import etree   # ships with python-docx; loaded on first .docx
+    with zipfile.ZipFile(stream) as archive:
+        if DOCUMENT_PART not in archive.namelist():
+            raise ValueError("Not a Word document: word/document.xml missing")
+
+        with archive.open(DOCUMENT_PART) as xml:
+            for _, element in etree.iterparse(xml, events=("end",), tag=(W + "p", W + "tr")):
+                tables = sum(1 for _ in element.iterancestors(W + "tbl"))
+
+                if element.tag == W + "p":
+                    # Table paragraphs are read with their row; text-box paragraphs with their outer one
+                    if tables or _in_paragraph(element):
+                        continue
+                    yield _paragraph_text(element)
+                else:
+                    if tables != 1:
+                        continue   # nested table row: part of the outer cell
+                    cells = [_cell_text(cell) for cell in element.iterchildren(W + "tc")]
+                    if any(cells):
+                        yield ROW_SEPARATOR.join(cells)
+
+                _release(element)
+
+
+def read_docx_text(stream) -> str:
+    """Whole document text: paragraphs and table rows, one per line."""
+    lines = list(iter_docx_blocks(stream))
+    logger.info(f"DOCX streamed: {len(lines)} paragraphs / table rows.")
+    return "\n".join(lines)
+
+
+# --- HELPER FUNCTIONS ---
+
+def _paragraph_text(element) -> str:
+    parts = []
+    for node in element.iter(*_TEXT_TAGS):
+        if node.tag == W + "t":
+            parts.append(node.text or "")
+        elif node.getparent().tag == W + "r":
+            # w:tab also defines tab stops in paragraph properties; only runs count
+            parts.append("\t" if node.tag == W + "tab" else "\n")
+    return "".join(parts)
+
+
+def _cell_text(cell) -> str:
+    """All paragraphs of a cell (nested tables included) on one line."""
+    texts = [_paragraph_text(p) for p in cell.iter(W + "p") if not _in_paragraph(p)]
+    return " ".join(" ".join(texts).split())
+
+
+def _in_paragraph(element) -> bool:
+    """Text-box paragraphs sit inside a run of another paragraph."""
+    return next(element.iterancestors(W + "p"), None) is not None
+
+
+def _release(element):
+    """Frees an emitted element and the already processed siblings before it."""
+    element.clear()
+    parent = element.getparent()
+    while element.getprevious() is not None:
+        del parent[0]
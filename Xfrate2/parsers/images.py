@@ -0,0 +1,162 @@
+# file: parsers/images.py
+import os
+import io
+import math
+import time
+import functools
+from typing import Dict, Any, Tuple
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+# gpt-4o 'high' detail: the image is fit into 2048x2048, then the short side scaled to 768.
+# Anything above that is thrown away by the service after we paid to upload it.
+IMAGE_MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_LONG_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "false").lower() == "true"
+IMAGE_CROP_BORDERS = os.getenv("IMAGE_CROP_BORDERS", "false").lower() == "true"
+# Used only to estimate the upload time saved per image
+IMAGE_UPLOAD_BYTES_PER_SEC = float(os.getenv("IMAGE_UPLOAD_BYTES_PER_SEC", str(1_000_000)))
+
+# Magic numbers -> MIME type
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+
+
+def detect_image_mime(data: bytes) -> str:
+    """Real image format from the file header (the extension/label can lie)."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    return "image/jpeg"
+
+
+def estimate_vision_tokens(width: int, height: int) -> int:
+    """gpt-4o high-detail cost: 85 base + 170 per 512px tile after service-side scaling."""
+    width, height = _target_size(width, height)
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def preprocess_image(data: bytes) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Prepares an image for the Vision call.
+    Returns (image bytes, MIME type, stats). The stats report the size and
+    token change and the estimated end-to-end latency saved (upload time
+    of the base64 payload minus the time spent re-encoding).
+    """
+    original_mime = detect_image_mime(data)
+    stats = {"original_bytes": len(data), "final_bytes": len(data), "original_mime": original_mime}
+
+    pillow = _pillow() if IMAGE_PREPROCESS_ENABLED else None
+    if pillow is None:
+        if IMAGE_PREPROCESS_ENABLED:
+            logger.info("Pillow not installed; sending image unchanged.")
+        return data, original_mime, stats
+    Image, _, ImageOps = pillow
+
+    started = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(data))
+        image = ImageOps.exif_transpose(image)   # phone photos: honour the rotation flag
+    except Exception as e:
+        logger.warning(f"Could not decode image ({e}); sending it unchanged.")
+        return data, original_mime, stats
+
+    original_size = image.size
+    image = _flatten(image)
+
+    if IMAGE_CROP_BORDERS:
+        image = _crop_borders(image)
+    if IMAGE_GRAYSCALE:
+        image = image.convert("L")
+
+    target = _target_size(*image.size)
+    if target != image.size:
+        image = image.resize(target, Image.LANCZOS)
+
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    processed = out.getvalue()
+    elapsed = time.perf_counter() - started
+
+    # Re-encoding is only worth it if it actually made the payload smaller
+    if len(processed) >= len(data) and target == original_size:
+        logger.info("Re-encoded image is not smaller; sending original.")
+        return data, original_mime, stats
+
+    bytes_saved = len(data) - len(processed)
+    # base64 inflates the payload by 4/3 on the wire
+    upload_saved = (bytes_saved * 4 / 3) / IMAGE_UPLOAD_BYTES_PER_SEC
+    stats.update({
+        "final_bytes": len(processed),
+        "bytes_saved": bytes_saved,
+        "original_size": list(original_size),
+        "final_size": list(image.size),
+        "vision_tokens_before": estimate_vision_tokens(*original_size),
+        "vision_tokens_after": estimate_vision_tokens(*image.size),
+        "preprocess_ms": round(elapsed * 1000, 1),
+        "estimated_latency_saved_ms": round((upload_saved - elapsed) * 1000, 1),
+    })
+    logger.info(
+        f"Image preprocessed: {original_size} {len(data)}B -> {image.size} {len(processed)}B "
+        f"(saved {bytes_saved}B, ~{stats['estimated_latency_saved_ms']}ms)."
+    )
+    return processed, "image/jpeg", stats
+
+
+# --- HELPER FUNCTIONS ---
+
+@functools.lru_cache(maxsize=1)
+def _pillow():
+    """
+    (Image, ImageChops, ImageOps), imported on the first image; None without
+    Pillow, which is optional: images are then sent as-is (with their real MIME type).
+    """
+    try:
+        from PIL import Image, ImageChops, ImageOps
+    except ImportError:  # pragma: no cover - depends on the deployment
+        return None
+    return Image, ImageChops, ImageOps
+
+
+def _target_size(width: int, height: int) -> Tuple[int, int]:
+    """Fit into MAX_LONG x MAX_LONG, then cap the short side at MAX_SHORT (never upscale)."""
+    scale = min(1.0, IMAGE_MAX_LONG_SIDE / max(width, height))
+    scale = min(scale, IMAGE_MAX_SHORT_SIDE / max(1, min(width, height) * scale) * scale)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _flatten(image):
+    """JPEG has no alpha/palette: paste transparent images on white."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        Image = _pillow()[0]
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode not in ("RGB", "L"):
+        return image.convert("RGB")
+    return image
+
+
+def _crop_borders(image, tolerance: int = 12):
+    """Trims uniform borders (scanner margins, phone-photo desk edges)."""
+    Image, ImageChops, _ = _pillow()
+    corner = image.getpixel((0, 0))
+    background = Image.new(image.mode, image.size, corner)
+    diff = ImageChops.difference(image, background).convert("L")
+    bbox = diff.point(lambda value: 255 if value > tolerance else 0).getbbox()
+    if bbox and (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) < image.size[0] * image.size[1]:
+        return image.crop(bbox)
+    return image
@@ -0,0 +1,136 @@
+# file: parsers/pdf.py
+import os
+import time
+import base64
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+from Xfrate2.utils import logger, log_to_stderr_only
+from Xfrate2.parsers.images import preprocess_image
+
+# --- CONFIGURATION ---
+PDF_PARALLEL_ENABLED = os.getenv("PDF_PARALLEL_ENABLED", "true").lower() == "true"
+# Below this many pages the process pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Pages slower than this are logged as pathological
+PDF_SLOW_PAGE_SECONDS = float(os.getenv("PDF_SLOW_PAGE_SECONDS", "1.0"))
+# A page with fewer characters than this has no usable text layer (scanned page)
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "20"))
+# Embedded images smaller than this are logos/stamps, not page scans
+PDF_MIN_IMAGE_BYTES = int(os.getenv("PDF_MIN_IMAGE_BYTES", "4096"))
+PDF_MAX_IMAGES_PER_PAGE = int(os.getenv("PDF_MAX_IMAGES_PER_PAGE", "4"))
+
+_pool = None
+
+
+def extract_pdf_pages(data: bytes) -> List[Dict[str, Any]]:
+    """
+    Extracts text page by page.
+    Returns one record per page, in page order:
+        {"page": 1-based index, "text": str, "seconds": float,
+         "has_text": bool, "images": [{"mime": str, "data": base64 str}]}
+    Pages without a text layer (scans) get their embedded images pulled
+    out and preprocessed for the Vision model instead.
+    Large PDFs are split into page ranges across a process pool; small
+    ones (or PDF_PARALLEL_ENABLED=false) run serially in-process.
+    """
+    from pypdf import PdfReader   # loaded on first PDF, not at import
+    page_count = len(PdfReader(BytesIO(data)).pages)
+    started = time.perf_counter()
+
+    if PDF_PARALLEL_ENABLED and PDF_PARALLEL_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+        pages = _extract_parallel(data, page_count)
+        mode = f"parallel x{PDF_PARALLEL_WORKERS}"
+    else:
+        pages = _extract_page_range(data, 0, page_count)
+        mode = "serial"
+
+    elapsed = time.perf_counter() - started
+    scanned = sum(1 for page in pages if not page["has_text"])
+    logger.info(f"PDF text extracted: {page_count} pages in {elapsed:.2f}s ({mode}); {scanned} without text layer.")
+    _report_slow_pages(pages)
+    return pages
+
+
+# --- HELPER FUNCTIONS ---
+
+def _extract_page_range(data: bytes, start: int, end: int) -> List[Dict[str, Any]]:
+    """Worker body: parse pages [start, end) of the document. Must stay picklable."""
+    from pypdf import PdfReader
+    reader = PdfReader(BytesIO(data))
+    pages = []
+    for index in range(start, end):
+        page_started = time.perf_counter()
+        page = reader.pages[index]
+        text = page.extract_text() or ""
+        has_text = len(text.strip()) >= PDF_MIN_TEXT_CHARS
+        images = [] if has_text else _page_images(page, index + 1)
+        pages.append({
+            "page": index + 1,
+            "text": text,
+            "seconds": time.perf_counter() - page_started,
+            "has_text": has_text,
+            "images": images,
+        })
+    return pages
+
+
+def _page_images(page, page_number: int) -> List[Dict[str, str]]:
+    """Embedded images of a scanned page, downscaled for the Vision call."""
+    images = []
+    try:
+        for embedded in page.images:
+            if len(embedded.data) < PDF_MIN_IMAGE_BYTES:
+                continue
+            image_bytes, mime, _ = preprocess_image(embedded.data)
+            images.append({"mime": mime, "data": base64.b64encode(image_bytes).decode("utf-8")})
+            if len(images) >= PDF_MAX_IMAGES_PER_PAGE:
+                break
+    except Exception as e:
+        # Exotic encodings (JBIG2, CCITT...) may not be decodable here
+        logger.warning(f"Could not extract images from page {page_number}: {e}")
+    return images
+
+
+def _extract_parallel(data: bytes, page_count: int) -> List[Dict[str, Any]]:
+    # ~2 ranges per worker keeps the pool busy when some pages are much slower than others
+    range_count = min(page_count, PDF_PARALLEL_WORKERS * 2)
+    bounds = [round(i * page_count / range_count) for i in range(range_count + 1)]
+
+    futures = [
+        _get_pool().submit(_extract_page_range, data, bounds[i], bounds[i + 1])
+        for i in range(range_count)
+    ]
+    # Futures are collected in submission order, so page order is preserved
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Lazily created, shared pool ('spawn' so we never fork a threaded server).
+    Workers log to stderr: only this process writes LOG_FILE.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_PARALLEL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=log_to_stderr_only,
+        )
+    return _pool
+
+
+def _report_slow_pages(pages: List[Dict[str, Any]]):
+    slow = sorted(pages, key=lambda p: p["seconds"], reverse=True)
+    pathological = [p for p in slow if p["seconds"] >= PDF_SLOW_PAGE_SECONDS]
+    if pathological:
+        summary = ", ".join(f"p{p['page']}={p['seconds']:.2f}s" for p in pathological[:10])
+        logger.warning(f"Slow PDF pages (>= {PDF_SLOW_PAGE_SECONDS}s): {summary}")
+    elif slow:
+        summary = ", ".join(f"p{p['page']}={p['seconds']:.3f}s" for p in slow[:3])
+        logger.info(f"Slowest PDF pages: {summary}")
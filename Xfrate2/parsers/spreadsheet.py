@@ -0,0 +1,104 @@
+# file: parsers/spreadsheet.py
+import io
+import os
+import csv
+import datetime
+from typing import Iterator, List, Tuple
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+# Data rows per LLM request (the header row is sent with every batch)
+SHEET_BATCH_ROWS = int(os.getenv("SHEET_BATCH_ROWS", "50"))
+
+SHEET_TYPES = [".csv", ".xlsx"]
+SNIFF_BYTES = 64 * 1024
+
+
+def iter_sheet_rows(stream, ext: str) -> Iterator[List[str]]:
+    """
+    Streams the rows of a CSV file or of the first worksheet of an XLSX
+    workbook as lists of strings. Nothing is loaded whole: the CSV is read
+    line by line and the workbook is opened in read-only mode.
+    """
+    if ext == ".csv":
+        yield from _iter_csv_rows(stream)
+    elif ext == ".xlsx":
+        yield from _iter_xlsx_rows(stream)
+    else:
+        raise ValueError(f"Unsupported spreadsheet format: {ext}")
+
+
+def iter_row_batches(stream, ext: str, batch_rows: int = SHEET_BATCH_ROWS) -> Iterator[Tuple[int, List[str], List[List[str]]]]:
+    """
+    Yields (first_row_number, header, rows) with at most `batch_rows` data
+    rows each. The header is the first non-empty row; empty rows are skipped.
+    Row numbers are 1-based sheet rows, so batches can be reported/merged in order.
+    """
+    header = None
+    batch: List[List[str]] = []
+    batch_start = 0
+    for row_number, row in enumerate(iter_sheet_rows(stream, ext), start=1):
+        if not any(row):
+            continue
+        if header is None:
+            header = row
+            continue
+        if not batch:
+            batch_start = row_number
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch_start, header, batch
+            batch = []
+    if batch:
+        yield batch_start, header, batch
+
+
+def format_rows(header: List[str], rows: List[List[str]]) -> str:
+    """Header + rows as ' | ' delimited lines, the shape DOCX tables are sent in."""
+    return "\n".join(" | ".join(row) for row in [header, *rows])
+
+
+# --- HELPER FUNCTIONS ---
+
+def _iter_csv_rows(stream) -> Iterator[List[str]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        sample = text.read(SNIFF_BYTES)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(text, dialect):
+            yield [cell.strip() for cell in row]
+    finally:
+        # Leave the caller's stream open; the wrapper must not close it
+        text.detach()
+
+
+def _iter_xlsx_rows(stream) -> Iterator[List[str]]:
+    # openpyxl is optional (only .xlsx documents need it) and slow to import: loaded on first use
+    try:
+        import openpyxl
+    except ImportError:  # pragma: no cover - depends on the deployment
+        raise ValueError("Reading .xlsx documents requires openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        logger.info(f"Streaming worksheet '{sheet.title}'.")
+        for values in sheet.iter_rows(values_only=True):
+            yield [_cell_text(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
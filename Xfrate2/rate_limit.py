@@ -0,0 +1,195 @@
+# file: rate_limit.py
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, Any, List, Optional
+from Xfrate2.utils import logger, estimate_tokens
+from Xfrate2.parsers.images import estimate_vision_tokens, IMAGE_MAX_LONG_SIDE, IMAGE_MAX_SHORT_SIDE
+
+# --- CONFIGURATION ---
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Deployment quota (Azure assigns 6 RPM per 1000 TPM)
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "30000"))
+AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", str(AZURE_OPENAI_TPM * 6 // 1000)))
+# Share of the quota we allow ourselves, so bursts stay just under the limit
+RATE_LIMIT_HEADROOM = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+# Azure counts the completion budget against TPM when the request is admitted
+RATE_LIMIT_COMPLETION_TOKENS = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", "1000"))
+# 429 handling: retries on top of the normal attempts, and the backoff curve
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+BACKOFF_BASE_SECONDS = float(os.getenv("BACKOFF_BASE_SECONDS", "1.0"))
+BACKOFF_MAX_SECONDS = float(os.getenv("BACKOFF_MAX_SECONDS", "60.0"))
+# 5xx answers and dropped connections: re-sent on the same backoff curve, at most this often
+TRANSIENT_MAX_RETRIES = int(os.getenv("TRANSIENT_MAX_RETRIES", "3"))
+
+
+class TokenBucketLimiter:
+    """
+    Shared client-side limiter for the Azure OpenAI deployment.
+    Two token buckets (requests/min and tokens/min) refill continuously.
+    A caller reserves its request up front; balances may go negative, which
+    queues later callers behind earlier ones (FIFO) instead of letting them
+    all hit the service and get 429s. A 429's Retry-After pauses everyone.
+    Works for threads (acquire) and coroutines (aacquire).
+
+    The buckets live in this process. N API processes or job workers each
+    admit the full quota, N times what Azure allows: give each process its
+    share (AZURE_OPENAI_TPM / AZURE_OPENAI_RPM divided by N).
+    """
+
+    def __init__(self, rpm: int = AZURE_OPENAI_RPM, tpm: int = AZURE_OPENAI_TPM,
+                 headroom: float = RATE_LIMIT_HEADROOM):
+        self.request_capacity = max(1.0, rpm * headroom)
+        self.token_capacity = max(1.0, tpm * headroom)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "queued": 0,
+            "rate_limited": 0,
+            "transient_errors": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+        }
+
+    # --- PUBLIC API ---
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until the request fits the quota. Returns the seconds waited."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int) -> float:
+        """Async twin of acquire: waits without blocking the event loop."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Corrects the token bucket once the real usage of a request is known."""
+        if actual is None:
+            return
+        with self._lock:
+            self._tokens += min(estimated, self.token_capacity) - actual
+
+    def on_rate_limited(self, error: Exception, retry: int) -> float:
+        """
+        Handles a 429: pauses every caller for Retry-After (when given) and
+        returns this caller's delay: jittered exponential backoff, never
+        shorter than Retry-After.
+        """
+        retry_after = _retry_after_seconds(error)
+        delay = _backoff(retry, retry_after)
+        with self._lock:
+            self._stats["rate_limited"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + (retry_after or 0.0))
+        logger.warning(f"Rate limited by Azure OpenAI (Retry-After: {retry_after}); retrying in {delay:.1f}s.")
+        return delay
+
+    def on_transient_error(self, error: Exception, retry: int) -> float:
+        """
+        Handles a 5xx or a dropped connection: returns this caller's delay
+        (same backoff as a 429). Only the failing request waits; the quota
+        is not at fault.
+        """
+        delay = _backoff(retry, _retry_after_seconds(error))
+        with self._lock:
+            self._stats["transient_errors"] += 1
+        logger.warning(f"Transient Azure OpenAI error ({type(error).__name__}); retrying in {delay:.1f}s.")
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                **self._stats,
+                "requests_available": round(self._requests, 1),
+                "tokens_available": round(self._tokens),
+            }
+
+    # --- INTERNALS ---
+
+    def _refill(self, now: float):
+        """Adds what the buckets earned since the last update (caller holds the lock)."""
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60.0)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60.0)
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes the request out of both buckets; returns how long the caller must wait."""
+        # A single request bigger than the bucket would otherwise wait forever
+        tokens = min(tokens, self.token_capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._requests -= 1
+            self._tokens -= tokens
+            wait = max(
+                0.0,
+                -self._requests * 60.0 / self.request_capacity,
+                -self._tokens * 60.0 / self.token_capacity,
+                self._paused_until - now,
+            )
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["queued"] += 1
+                self._stats["queue_wait_seconds_total"] += wait
+                self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], wait)
+        if wait > 1.0:
+            logger.info(f"Rate limiter: request queued for {wait:.1f}s.")
+        return wait
+
+
+def estimate_request_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Tokens Azure will charge at admission: prompt (text + images) + completion budget."""
+    total = RATE_LIMIT_COMPLETION_TOKENS
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_tokens(content) + 4
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                total += estimate_tokens(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                # Payloads are downscaled to at most this size before upload
+                total += estimate_vision_tokens(IMAGE_MAX_LONG_SIDE, IMAGE_MAX_SHORT_SIDE)
+    return total
+
+
+# --- HELPER FUNCTIONS ---
+
+def _backoff(retry: int, retry_after: Optional[float]) -> float:
+    """Jittered exponential backoff, never shorter than Retry-After."""
+    backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** retry))
+    delay = random.uniform(backoff / 2, backoff)   # jitter spreads the retries out
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After (or Azure's retry-after-ms) from a 429/503 response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+# Shared instance: one quota per deployment, shared by every node and thread
+rate_limiter = TokenBucketLimiter()
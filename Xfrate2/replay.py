@@ -0,0 +1,333 @@
+# file: replay.py
+"""
+Offline replay of stored extractions.
+
+Every finished document keeps its latest `raw_extraction` (with source
+and prompt version) in a small SQLite store, one row per document and
+prompt version, so documents sent (or served from cache) again are not
+counted twice. Replaying re-runs only the pure nodes,
+validate_data and finalize_and_route, so threshold / required-field
+changes can be measured over thousands of past documents in seconds,
+without a single LLM call.
+
+    python -m Xfrate2.replay --threshold 0.7
+    python -m Xfrate2.replay --required-fields vehicle_type,pickup_address --workers 4
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from contextlib import closing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import numpy as np
+from Xfrate2.utils import logger, log_to_stderr_only, deployment_name
+from Xfrate2.state import order_response_schema
+from Xfrate2.order_batch import OrderBatch
+from Xfrate2.nodes.prompt import EXTRACT_ORDER_SYSTEM_PROMPT
+from Xfrate2.nodes.schema_profiles import SCHEMA_PROFILE
+
+# --- CONFIGURATION ---
+REPLAY_STORE_ENABLED = os.getenv("REPLAY_STORE_ENABLED", "true").lower() == "true"
+REPLAY_DB_PATH = os.getenv("REPLAY_DB_PATH", "replay.db")
+# Stored runs per worker task (large chunks keep the pickling overhead low)
+REPLAY_CHUNK_SIZE = int(os.getenv("REPLAY_CHUNK_SIZE", "500"))
+# Runs whose routing changed that are listed in the report
+REPLAY_MAX_CHANGED = 20
+
+# Which prompt/schema/output profile produced an extraction: replays can be limited to one version
+PROMPT_VERSION = hashlib.sha256(
+    (EXTRACT_ORDER_SYSTEM_PROMPT + json.dumps(order_response_schema(), sort_keys=True)
+     + SCHEMA_PROFILE).encode("utf-8")
+).hexdigest()[:16]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash   TEXT NOT NULL,
+    source         TEXT,
+    file_type      TEXT,
+    prompt_version TEXT NOT NULL,
+    deployment     TEXT,
+    order_count    INTEGER NOT NULL,
+    raw_extraction TEXT NOT NULL,
+    created_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_prompt ON runs (prompt_version, created_at);
+"""
+# Added later: stores written before it may hold repeats, of which the latest run is kept
+_UNIQUE_INDEX = """
+BEGIN IMMEDIATE;
+DELETE FROM runs WHERE run_id NOT IN (SELECT MAX(run_id) FROM runs GROUP BY content_hash, prompt_version);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_runs_document ON runs (content_hash, prompt_version);
+COMMIT;
+"""
+
+
+class ReplayStore:
+    """
+    SQLite store of raw extractions, one row per (document, prompt version):
+    a repeated document replaces its earlier run.
+    The database is created on first use, so importing the module is free.
+    """
+
+    def __init__(self, db_path: str = REPLAY_DB_PATH):
+        self.db_path = db_path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            with self._lock:
+                conn.executescript(_SCHEMA)
+                if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_runs_document'").fetchone():
+                    conn.executescript(_UNIQUE_INDEX)
+                self._ready = True
+        return conn
+
+    def record(self, raw_extraction: Dict[str, Any], source: str, content_hash: str,
+               file_type: str = "", prompt_version: str = PROMPT_VERSION,
+               deployment: Optional[str] = None) -> int:
+        """Stores (or replaces) the document's run for this prompt version. Returns its run_id."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO runs (content_hash, source, file_type, prompt_version, deployment,
+                                  order_count, raw_extraction, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash, prompt_version) DO UPDATE SET
+                    source = excluded.source, file_type = excluded.file_type,
+                    deployment = excluded.deployment, order_count = excluded.order_count,
+                    raw_extraction = excluded.raw_extraction, created_at = excluded.created_at
+                """,
+                (content_hash, source, file_type, prompt_version, deployment or deployment_name(),
+                 len(raw_extraction.get("orders", [])), json.dumps(raw_extraction), time.time())
+            )
+            return conn.execute(
+                "SELECT run_id FROM runs WHERE content_hash = ? AND prompt_version = ?",
+                (content_hash, prompt_version)
+            ).fetchone()[0]
+
+    def iter_runs(self, prompt_version: Optional[str] = None, since: Optional[float] = None,
+                  limit: Optional[int] = None) -> Iterator[Tuple[int, str, str]]:
+        """Yields (run_id, source, raw_extraction JSON) oldest first; the JSON is left encoded."""
+        query = "SELECT run_id, source, raw_extraction FROM runs WHERE 1=1"
+        params: List[Any] = []
+        if prompt_version:
+            query += " AND prompt_version = ?"
+            params.append(prompt_version)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        query += " ORDER BY run_id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            for row in conn.execute(query, params):
+                yield row["run_id"], row["source"], row["raw_extraction"]
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+
+def replay_runs(store: "ReplayStore", confidence_threshold: Optional[float] = None,
+                required_fields: Optional[List[str]] = None, workers: int = 1,
+                prompt_version: Optional[str] = None, since: Optional[float] = None,
+                limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Re-validates and re-routes stored runs with the current settings
+    (baseline) and with the candidate ones, and reports the difference.
+    Settings left as None keep their current value.
+    """
+    from Xfrate2.nodes import validate_node
+    candidate = {
+        "confidence_threshold": validate_node.CONFIDENCE_THRESHOLD if confidence_threshold is None else confidence_threshold,
+        "required_fields": list(validate_node.REQUIRED_FIELDS if required_fields is None else required_fields),
+    }
+
+    started = time.perf_counter()
+    chunks = _chunks(store.iter_runs(prompt_version, since, limit), REPLAY_CHUNK_SIZE)
+    if workers > 1:
+        # Workers log to stderr: only this process writes LOG_FILE
+        with ProcessPoolExecutor(max_workers=workers, initializer=log_to_stderr_only) as pool:
+            partials = list(pool.map(_replay_chunk, chunks, _repeat(candidate)))
+    else:
+        partials = [_replay_chunk(chunk, candidate) for chunk in chunks]
+
+    report = _merge_partials(partials)
+    report["candidate_settings"] = candidate
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Replayed {report['runs']} runs / {report['orders']} orders in {report['seconds']}s: "
+        f"success {report['baseline']['success']} -> {report['candidate']['success']}, "
+        f"review {report['baseline']['needs_review']} -> {report['candidate']['needs_review']}"
+    )
+    return report
+
+
+# --- HELPER FUNCTIONS ---
+
+def _chunks(rows: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _repeat(value):
+    while True:
+        yield value
+
+
+def _review_counts(batch: OrderBatch, owners: np.ndarray, runs: int, confidence_threshold: float,
+                   required_fields: List[str]) -> Tuple[np.ndarray, Counter]:
+    """
+    Orders sent to review per run (an order goes to review iff it has a
+    validation error, as Node 4 decides it) and the issue count per field.
+    """
+    # Imported here: finalize_node (Node 4) imports this module to record runs
+    from Xfrate2.nodes.validate_node import collect_validation_errors
+    errors = collect_validation_errors(batch, confidence_threshold, required_fields)
+    flagged = np.zeros(len(batch), dtype=bool)
+    flagged[[error["order_index"] for error in errors]] = True
+    review = np.bincount(owners, weights=flagged, minlength=runs).astype(int)
+    return review, Counter(error["field"] for error in errors)
+
+
+def _replay_chunk(rows: List[Tuple[int, str, str]], candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs in a worker process: baseline vs candidate routing for a chunk of
+    stored runs. The orders of every run in the chunk form one OrderBatch,
+    so each setting is a single columnar validation pass.
+    """
+    from Xfrate2.nodes import validate_node
+    orders: List[Dict[str, Any]] = []
+    counts = []
+    for _, _, raw_json in rows:
+        run_orders = json.loads(raw_json).get("orders", [])
+        orders.extend(run_orders)
+        counts.append(len(run_orders))
+    counts = np.array(counts, dtype=int)
+    owners = np.repeat(np.arange(len(rows)), counts)
+    batch = OrderBatch(orders)
+
+    base_review, base_issues = _review_counts(batch, owners, len(rows), validate_node.CONFIDENCE_THRESHOLD,
+                                              validate_node.REQUIRED_FIELDS)
+    cand_review, cand_issues = _review_counts(batch, owners, len(rows), candidate["confidence_threshold"],
+                                              candidate["required_fields"])
+    base_ok, cand_ok = counts - base_review, counts - cand_review
+
+    partial = _empty_report()
+    partial["runs"] = len(rows)
+    partial["orders"] = len(orders)
+    partial["baseline"] = {"success": int(base_ok.sum()), "needs_review": int(base_review.sum())}
+    partial["candidate"] = {"success": int(cand_ok.sum()), "needs_review": int(cand_review.sum())}
+    for field in base_issues.keys() | cand_issues.keys():
+        partial["issues_by_field"][field] = {"baseline": base_issues[field], "candidate": cand_issues[field]}
+    for position in np.flatnonzero(base_ok != cand_ok).tolist():
+        run_id, source, _ = rows[position]
+        partial["changed_runs"].append({
+            "run_id": run_id, "source": source,
+            "baseline_success": int(base_ok[position]), "candidate_success": int(cand_ok[position]),
+        })
+    return partial
+
+
+def _empty_report() -> Dict[str, Any]:
+    return {
+        "runs": 0,
+        "orders": 0,
+        "baseline": {"success": 0, "needs_review": 0},
+        "candidate": {"success": 0, "needs_review": 0},
+        "issues_by_field": {},
+        "changed_runs": [],
+    }
+
+
+def _merge_partials(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    report = _empty_report()
+    changed = []
+    for partial in partials:
+        report["runs"] += partial["runs"]
+        report["orders"] += partial["orders"]
+        for name in ("baseline", "candidate"):
+            for key in ("success", "needs_review"):
+                report[name][key] += partial[name][key]
+        for field, counts in partial["issues_by_field"].items():
+            merged = report["issues_by_field"].setdefault(field, {"baseline": 0, "candidate": 0})
+            merged["baseline"] += counts["baseline"]
+            merged["candidate"] += counts["candidate"]
+        changed.extend(partial["changed_runs"])
+
+    report["diff"] = {
+        key: report["candidate"][key] - report["baseline"][key] for key in ("success", "needs_review")
+    }
+    report["changed_run_count"] = len(changed)
+    report["changed_runs"] = changed[:REPLAY_MAX_CHANGED]
+    return report
+
+
+def _print_report(report: Dict[str, Any]):
+    settings = report["candidate_settings"]
+    print(f"Replayed {report['runs']} runs ({report['orders']} orders) in {report['seconds']}s")
+    print(f"Candidate: threshold={settings['confidence_threshold']} required={','.join(settings['required_fields'])}")
+    print(f"{'':14}{'baseline':>10}{'candidate':>11}{'diff':>8}")
+    for key in ("success", "needs_review"):
+        print(f"{key:14}{report['baseline'][key]:>10}{report['candidate'][key]:>11}{report['diff'][key]:>+8}")
+    print("Issues by field:")
+    for field, counts in sorted(report["issues_by_field"].items()):
+        print(f"  {field:26}{counts['baseline']:>8} -> {counts['candidate']}")
+    print(f"Runs with a different success count: {report['changed_run_count']}")
+    for run in report["changed_runs"]:
+        print(f"  #{run['run_id']} {run['source']}: {run['baseline_success']} -> {run['candidate_success']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay stored extractions through validation and routing (no LLM calls).")
+    parser.add_argument("--db", default=REPLAY_DB_PATH, help="Replay store (SQLite) path")
+    parser.add_argument("--threshold", type=float, help="Candidate CONFIDENCE_THRESHOLD")
+    parser.add_argument("--required-fields", help="Candidate REQUIRED_FIELDS, comma separated")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--prompt-version", help="Only runs extracted with this prompt version")
+    parser.add_argument("--since", type=float, help="Only runs recorded after this unix timestamp")
+    parser.add_argument("--limit", type=int, help="At most this many runs (oldest first)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No replay store at {args.db}", file=sys.stderr)
+        return 1
+
+    required = [f.strip() for f in args.required_fields.split(",") if f.strip()] if args.required_fields else None
+    report = replay_runs(
+        ReplayStore(args.db), confidence_threshold=args.threshold, required_fields=required,
+        workers=args.workers, prompt_version=args.prompt_version, since=args.since, limit=args.limit,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0
+
+
+# Shared instance used by the finalize node
+replay_store = ReplayStore()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
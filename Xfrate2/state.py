@@ -1,7 +1,8 @@
-from typing import TypedDict, List, Dict, Any, Optional, TypeVar, Generic
+from typing import TypedDict, List, Dict, Any, Optional, TypeVar, Generic, Annotated
 from enum import Enum
-from pydantic import BaseModel, Field, field_validator
-from dateutil import parser
+from functools import lru_cache
+from pydantic import BaseModel, Field, field_validator, ValidationInfo
+from Xfrate2.normalize import normalize_date, EnumTable
 
 # Define a Type Variable for Generics
 T = TypeVar('T')
@@ -25,6 +26,16 @@ class PODType(str, Enum):
     SOFTCOPY = "Softcopy"
     BOTH = "Both"
 
+# Fuzzy terms per enum field, tried in order after an exact (any case) label match.
+# Each field only maps to its own enum: 'Open trailer' is never a vehicle_type.
+ENUM_TABLES = {
+    'vehicle_type': EnumTable(VehicleType, [('lcv', VehicleType.LCV.value), ('hcv', VehicleType.HCV.value)]),
+    'body_type': EnumTable(BodyType, [
+        ('open', BodyType.OPEN.value), ('close', BodyType.CLOSED.value), ('ref', BodyType.REFRIGERATED.value),
+    ]),
+    'pod_type': EnumTable(PODType),
+}
+
 
 # --- SECTION 2: PYDANTIC MODELS (Now with Generics) ---
 
@@ -73,36 +84,31 @@ class FTLOrder(BaseModel):
     @classmethod
     def clean_dates(cls, v):
         if isinstance(v, dict) and v.get('value'):
-            try:
-                dt = parser.parse(str(v['value']))
-                v['value'] = dt.strftime("%Y-%m-%d %H:%M")
-            except Exception:
-                pass 
+            normalized = normalize_date(str(v['value']))
+            if normalized is not None:
+                v['value'] = normalized
         return v
 
     @field_validator('vehicle_type', 'body_type', 'pod_type', mode='before')
     @classmethod
-    def clean_enums(cls, v):
+    def clean_enums(cls, v, info: ValidationInfo):
         """
         Maps fuzzy terms. Pydantic will run this BEFORE checking the Generic Type.
+        e.g. 'Open truck' -> 'Open' (body_type), 'LCV Truck' -> 'LCV' (vehicle_type)
         """
         if isinstance(v, dict) and v.get('value') and isinstance(v['value'], str):
-            val_lower = v['value'].lower()
-            
-            # Example: Map 'Open truck' to BodyType.OPEN enum value
-            if 'open' in val_lower: v['value'] = BodyType.OPEN.value
-            elif 'close' in val_lower: v['value'] = BodyType.CLOSED.value
-            elif 'ref' in val_lower: v['value'] = BodyType.REFRIGERATED.value
-            
-            # If the LLM output 'LCV Truck', map it to 'LCV'
-            if 'lcv' in val_lower: v['value'] = VehicleType.LCV.value
-            elif 'hcv' in val_lower: v['value'] = VehicleType.HCV.value
-            
+            v['value'] = ENUM_TABLES[info.field_name].lookup(v['value'])
         return v
 
 class FTLOrderResponse(BaseModel):
     orders: List[FTLOrder]
 
+
+@lru_cache(maxsize=1)
+def order_response_schema() -> Dict[str, Any]:
+    """FTLOrderResponse's JSON schema, generated once (cache keys and prompt versions hash it)."""
+    return FTLOrderResponse.model_json_schema()
+
 # --- SECTION 3: LANGGRAPH STATE ---
 # (Stays the same as previous response)
 from typing import TypedDict, List, Dict, Any, Optional
@@ -138,6 +144,28 @@ from typing import TypedDict, List, Dict, Any, Optional
 #     final_orders: List[Dict[str, Any]]
 
 
+def merge_extractions(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reducer for raw_extraction: the text and scanned-page branches run in
+    parallel and each contribute their orders to the same record.
+    An update's "document_context" (notes read around the tables) fills the
+    empty fields of the orders already there (the tabular fast path's).
+    """
+    if not update:
+        return current or {}
+    if not current or not current.get("orders"):
+        return update
+    orders = current["orders"]
+    context = update.get("document_context")
+    if context:
+        orders = [
+            {**order, **{field: data for field, data in context.items()
+                         if (order.get(field) or {}).get("value") is None}}
+            for order in orders
+        ]
+    return {**current, "orders": orders + update.get("orders", [])}
+
+
 class AgentState(TypedDict):
     """
     State representing the full lifecycle of the extraction process.
@@ -145,13 +173,26 @@ class AgentState(TypedDict):
     # --- 1. Inputs ---
     document_url: str      # <--- NEW: URL from API
     file_path: str         # Internal temp path (or source name)
+    document_bytes: Optional[bytes]  # Uploaded file content (skips the download)
+    request_id: str        # Caller's request id, stamped on every log record of the run
+    log_level: Optional[str]         # Log level for this run only (e.g. "DEBUG"); None = LOG_LEVEL
     
     # --- 2. Processing Data ---
     extracted_text: str
     file_type: str
+    content_hash: str      # sha256 of the downloaded bytes (extraction cache key)
+    pages: List[str]       # PDF only: text per page, in page order
+    page_timings: List[Dict[str, Any]]  # PDF only: [{'page': int, 'seconds': float}]
+    page_images: List[Dict[str, Any]]   # PDF only: scanned pages [{'page': int, 'mime': str, 'data': base64}]
+    compaction_stats: Dict[str, int]    # {'tokens_before': int, 'tokens_after': int}
+    tabular_stats: Dict[str, int]       # {'tables', 'rows_extracted', 'rows_left'} of the fast path
+    image_mime: str        # Images only: real MIME type of the base64 payload
+    image_stats: Dict[str, Any]         # Images only: bytes / tokens / latency saved
+    sheet_bytes: bytes     # CSV/XLSX only: the file, streamed in row batches by the sheet node
 
     # --- 3. The Master Record ---
-    raw_extraction: Dict[str, Any] 
+    # Merged across the parallel text / scanned-page extraction branches
+    raw_extraction: Annotated[Dict[str, Any], merge_extractions]
 
     # --- 4. Validation Data ---
     validation_errors: List[Dict[str, Any]]
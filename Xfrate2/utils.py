@@ -1,39 +1,275 @@
 # file: utils.py
-import logging
-import sys
 import os
+import sys
+import json
+import copy
+import queue
+import atexit
+import asyncio
+import logging
+import functools
+import contextlib
+import contextvars
+import logging.handlers
+from typing import Optional, Union
+
+# --- LOGGING CONFIGURATION ---
+# Read from the process environment: the logger exists before the .env file is loaded
+LOG_FILE = os.getenv("LOG_FILE", "agent.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" (human readable) or "json" (one object per line, for log shippers)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Size rotation of LOG_FILE; LOG_ROTATE_WHEN (e.g. "midnight", "H") rotates by time instead.
+# Every process rotates the file it writes, so no two processes may share one:
+#  - process pool workers (PDF pages, replay) never open LOG_FILE: they log to stderr
+#    (pool initializer log_to_stderr_only), and the parent process owns the file;
+#  - "{pid}" in LOG_FILE is replaced by the process id, one file (and rotation) per process.
+#    Job workers default to WORKER_LOG_FILE ("worker-{pid}.log"); run several API
+#    processes (e.g. uvicorn --workers) with LOG_FILE=agent-{pid}.log.
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Records are written by a background thread; false writes them in the calling thread
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true"
+
+# Request being processed (ExtractionRequest.request_id) and its own log level, if any
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+_request_log_level: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("request_log_level", default=None)
+
+
+class RequestLogger(logging.Logger):
+    """
+    Logger whose threshold can be changed for one request (request_context):
+    a request asking for DEBUG gets debug lines, every other request keeps
+    LOG_LEVEL and pays one context variable lookup per disabled call.
+    """
+
+    def isEnabledFor(self, level: int) -> bool:
+        override = _request_log_level.get()
+        if override is None:
+            return super().isEnabledFor(level)
+        return level >= override and self.manager.disable < level
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the request id of the calling context (before they are queued)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
 
-def setup_logger(name: str = "sysagent", log_file: str = "agent.log", level: int = logging.INFO):
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, request_id, message (and exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "request_id": getattr(record, "request_id", "-"),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread. Only the message and traceback are
+    rendered here (the arguments may change after the call); formatting and
+    I/O happen in the background.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logger(name: str = "sysagent", log_file: Optional[str] = LOG_FILE, level: Union[int, str] = LOG_LEVEL,
+                 json_format: bool = LOG_FORMAT == "json", use_queue: bool = LOG_QUEUE_ENABLED, stream=None):
     """
-    Configures a shared logger that outputs to Console and File.
+    Configures a shared logger that outputs to Console and a rotating File
+    (none when log_file is None; "{pid}" in it becomes the process id).
+    With use_queue (the default) callers only enqueue records; a
+    QueueListener thread formats and writes them, and is flushed at exit.
     """
-    # Create a custom logger
-    logger = logging.getLogger(name)
-    
+    logger = _get_request_logger(name)
+
     # prevent duplicate handlers if function is called multiple times
-    if logger.hasHandlers():
+    # (own handlers only: test runners put theirs on the root logger)
+    if logger.handlers:
         return logger
-        
+
     logger.setLevel(level)
 
     # 1. Define Format
-    # Format: [Time] [Level] - Message
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] - %(message)s',
-        datefmt='%H:%M:%S'
-    )
+    # Format: [Time] [Level] [request_id] - Message
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s [%(levelname)s] [%(request_id)s] - %(message)s',
+            datefmt='%H:%M:%S'
+        )
 
     # 2. Console Handler (Standard Output)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [logging.StreamHandler(stream or sys.stdout)]
+
+    # 3. File Handler (Persistent Log, rotated by size or time; opened on the first record)
+    if log_file:
+        log_file = log_file.replace("{pid}", str(os.getpid()))
+        if LOG_ROTATE_WHEN:
+            handlers.append(logging.handlers.TimedRotatingFileHandler(
+                log_file, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+            ))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+            ))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
-    # 3. File Handler (Persistent Log)
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    # 4. Request ids are read in the calling context, so the filter sits on the logger's own handler
+    if use_queue:
+        queue_handler = _QueueHandler(queue.SimpleQueue())
+        queue_handler.listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+        queue_handler.listener.start()
+        atexit.register(stop_logging, logger)
+        handlers = [queue_handler]
+    for handler in handlers:
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
 
     return logger
 
+
+def stop_logging(logger: logging.Logger):
+    """Writes out the queued records and stops the logger's writer thread (runs at exit)."""
+    for handler in logger.handlers:
+        listener, handler.listener = getattr(handler, "listener", None), None
+        if listener is not None:
+            listener.stop()
+
+
+def reconfigure_logger(name: str = "sysagent", **settings) -> logging.Logger:
+    """Replaces the handlers set up by setup_logger (e.g. another log_file); settings as setup_logger."""
+    logger = _get_request_logger(name)
+    stop_logging(logger)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    return setup_logger(name, **settings)
+
+
+def log_to_stderr_only():
+    """
+    Initializer for process pool workers: the parent owns (and rotates)
+    LOG_FILE, so a pool worker logs to stderr only. Also drops the queue
+    handler a forked worker inherits without its writer thread.
+    """
+    reconfigure_logger(log_file=None, stream=sys.stderr, use_queue=False)
+
+
+def _get_request_logger(name: str) -> logging.Logger:
+    """logging.getLogger(name), created as a RequestLogger (without changing other libraries' loggers)."""
+    manager = logging.Logger.manager
+    previous, manager.loggerClass = manager.loggerClass, RequestLogger
+    try:
+        return logging.getLogger(name)
+    finally:
+        manager.loggerClass = previous
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str] = None, log_level: Optional[str] = None):
+    """
+    Tags every log record written inside the block (and in tasks and
+    threads started from it, see carry_context) with `request_id`;
+    `log_level` (e.g. "DEBUG") overrides LOG_LEVEL for the block.
+    """
+    id_token = _request_id.set(request_id or "-")
+    level_token = _request_log_level.set(logging.getLevelName(log_level.upper()) if log_level else None)
+    try:
+        yield
+    finally:
+        _request_log_level.reset(level_token)
+        _request_id.reset(id_token)
+
+
+def bind_request_context(node):
+    """Wraps a graph node (sync or async) to run in the request context named by its state."""
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            with request_context(state.get("request_id"), state.get("log_level")):
+                return await node(state)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        with request_context(state.get("request_id"), state.get("log_level")):
+            return node(state)
+    return wrapper
+
 # Initialize a global instance so other files can just import 'logger'
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger()
+
+
+@functools.lru_cache(maxsize=1)
+def load_env() -> bool:
+    """
+    Loads the .env file into os.environ, once. Entry points (server, worker)
+    call it before importing the modules that read their configuration;
+    the LLM client calls it again on first use (a no-op by then).
+    """
+    from dotenv import load_dotenv
+    return load_dotenv()
+
+
+@functools.lru_cache(maxsize=1)
+def deployment_name() -> str:
+    """Azure OpenAI chat deployment the extraction nodes call."""
+    load_env()
+    return os.getenv("CHAT_COMPLETION_NAME", "gpt-4o")
+
+
+def carry_context(fn):
+    """
+    `fn` for a worker thread, run in a copy of the caller's context
+    variables (a thread pool does not inherit them, asyncio.to_thread does).
+    """
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(fn, *args)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_token_encoder():
+    """tiktoken's o200k_base (gpt-4o) if installed and loadable, else None."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token count estimate for budgeting prompts.
+    Exact with tiktoken, otherwise the usual ~4 characters per token.
+    """
+    if not text:
+        return 0
+    encoder = _get_token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
\ No newline at end of file
@@ -0,0 +1,207 @@
+# file: warmup.py
+"""
+Startup of the API server and the workers.
+
+Parsers, the LLM client and the graph are loaded lazily on first use, so
+importing the service is cheap. `warmup()` is the readiness hook: it
+preloads only the components this deployment needs (WARMUP_COMPONENTS),
+so the first request does not pay for them either.
+
+The import-time report runs a fresh interpreter with `-X importtime`
+(median of a few runs) and breaks the cost down per package and module,
+to track startup regressions:
+
+    python -m Xfrate2.warmup                      # time the warmup hook
+    python -m Xfrate2.warmup --report --top 20
+    python -m Xfrate2.warmup --report --target Xfrate2.worker --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from Xfrate2.utils import logger
+
+# --- CONFIGURATION ---
+# Comma separated, from WARMUP_STEPS. Parsers of formats a deployment never sees stay unloaded.
+WARMUP_COMPONENTS = os.getenv("WARMUP_COMPONENTS", "graph,llm")
+IMPORT_REPORT_RUNS = int(os.getenv("IMPORT_REPORT_RUNS", "3"))
+
+
+# --- WARMUP STEPS ---
+
+def _warm_graph():
+    from Xfrate2.main import get_agent
+    get_agent(async_mode=True)
+
+
+def _warm_llm():
+    from Xfrate2.nodes.extractor import get_client, get_async_client
+    from Xfrate2.nodes.schema_profiles import PROFILES
+    from Xfrate2.state import order_response_schema
+    get_client()
+    get_async_client()
+    order_response_schema()
+    for profile in PROFILES.values():
+        profile.response_format
+
+
+def _warm_pdf():
+    import pypdf
+
+
+def _warm_images():
+    import PIL.Image
+
+
+def _warm_docx():
+    import lxml.etree
+
+
+def _warm_sheet():
+    import openpyxl
+
+
+WARMUP_STEPS = {
+    "graph": _warm_graph,
+    "llm": _warm_llm,
+    "pdf": _warm_pdf,
+    "images": _warm_images,
+    "docx": _warm_docx,
+    "sheet": _warm_sheet,
+}
+
+
+def warmup(components: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    Preloads `components` (default: WARMUP_COMPONENTS) and returns the
+    seconds each took. A component that fails (e.g. an optional package
+    not installed) is logged and skipped: it is loaded lazily, or not at all.
+    """
+    if components is None:
+        components = [name.strip() for name in WARMUP_COMPONENTS.split(",") if name.strip()]
+
+    started = time.perf_counter()
+    seconds = {}
+    for name in components:
+        step = WARMUP_STEPS.get(name)
+        if step is None:
+            logger.warning(f"Unknown warmup component '{name}' (known: {', '.join(WARMUP_STEPS)}).")
+            continue
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warmup of '{name}' failed ({e}); it will load on first use.")
+            continue
+        seconds[name] = round(time.perf_counter() - step_started, 3)
+    logger.info(f"Warmup done in {time.perf_counter() - started:.2f}s: {seconds}")
+    return seconds
+
+
+# --- IMPORT-TIME REPORT ---
+
+def import_time_report(target: str = "server", runs: int = IMPORT_REPORT_RUNS, top: int = 25) -> Dict[str, Any]:
+    """
+    Import cost of `target` in a fresh interpreter, median of `runs` runs:
+    the total, the self time summed per top-level package, and the `top`
+    modules by cumulative time (milliseconds).
+    """
+    samples = [_import_times(target) for _ in range(runs)]
+    modules = set().union(*samples)
+
+    def median(name: str, column: int) -> float:
+        return statistics.median(sample.get(name, (0, 0))[column] for sample in samples) / 1000
+
+    packages = defaultdict(float)
+    for name in modules:
+        packages[name.split(".")[0]] += median(name, 0)
+    ranked = sorted(modules, key=lambda name: median(name, 1), reverse=True)[:top]
+
+    return {
+        "target": target,
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "total_ms": round(median(target, 1), 1),
+        "module_count": len(modules),
+        "packages": {
+            name: round(ms, 1)
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "modules": [
+            {"module": name, "cumulative_ms": round(median(name, 1), 1), "self_ms": round(median(name, 0), 1)}
+            for name in ranked
+        ],
+    }
+
+
+def parse_importtime(output: str) -> Dict[str, tuple]:
+    """`-X importtime` stderr -> {module: (self_us, cumulative_us)}."""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[0].isdigit():
+            continue   # the header line
+        times[fields[2]] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+# --- HELPER FUNCTIONS ---
+
+def _import_times(target: str) -> Dict[str, tuple]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"import {report['target']}: {report['total_ms']} ms "
+          f"({report['module_count']} modules, median of {report['runs']} runs, Python {report['python']})")
+    print("Self time by package:")
+    for name, ms in report["packages"].items():
+        print(f"  {name:32}{ms:>10.1f} ms")
+    print("Slowest modules (cumulative / self):")
+    for row in report["modules"]:
+        print(f"  {row['module']:48}{row['cumulative_ms']:>10.1f}{row['self_ms']:>10.1f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm up the service, or report its import time.")
+    parser.add_argument("--report", action="store_true", help="Per-module import-time report instead of a warmup")
+    parser.add_argument("--target", default="server", help="Module to import for the report")
+    parser.add_argument("--runs", type=int, default=IMPORT_REPORT_RUNS)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--components", help=f"Warmup components, comma separated (default: {WARMUP_COMPONENTS})")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args(argv)
+
+    if args.report:
+        report = import_time_report(args.target, args.runs, args.top)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_report(report)
+        return 0
+
+    components = [name.strip() for name in args.components.split(",")] if args.components else None
+    seconds = warmup(components)
+    if args.json:
+        print(json.dumps(seconds, indent=2))
+    else:
+        for name, took in seconds.items():
+            print(f"{name:10}{took:>8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# file: worker.py
+"""
+Background worker for the durable job queue (see jobs.py).
+
+Run as many of these as needed, independently of the API process:
+    python -m Xfrate2.worker --concurrency 4
+
+Each worker logs to a file of its own (WORKER_LOG_FILE), never to the
+API's LOG_FILE: a log file must only be rotated by the process writing it.
+
+Jobs live in SQLite, so a restart (of the API or of a worker) never loses
+queued work; a job held by a worker that died is picked up again once its
+lease expires.
+"""
+import os
+import socket
+import asyncio
+import argparse
+from typing import Dict, Any
+from Xfrate2.utils import logger, load_env, reconfigure_logger
+load_env()   # before the modules below read their configuration
+from Xfrate2.jobs import JobQueue, JOBS_DB_PATH
+from Xfrate2.main import get_agent, build_initial_state, build_response_payload
+
+# --- CONFIGURATION ---
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+# "{pid}" is replaced by the process id, so workers never share (and rotate) one file
+WORKER_LOG_FILE = os.getenv("WORKER_LOG_FILE", "worker-{pid}.log")
+
+
+async def run_worker(queue: JobQueue, concurrency: int = WORKER_CONCURRENCY,
+                     poll_seconds: float = WORKER_POLL_SECONDS, stop_when_idle: bool = False):
+    """
+    Runs `concurrency` job slots on one event loop until cancelled.
+    With stop_when_idle=True the worker exits once the queue is drained.
+    """
+    agent_app = await asyncio.to_thread(get_agent, True)
+    worker_base = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Worker {worker_base} started with {concurrency} slots on {queue.db_path}")
+
+    async def slot(slot_index: int):
+        worker_id = f"{worker_base}:{slot_index}"
+        while True:
+            job = await asyncio.to_thread(queue.claim, worker_id)
+            if job is None:
+                if stop_when_idle:
+                    return
+                await asyncio.sleep(poll_seconds)
+                continue
+            await _process_job(queue, agent_app, job, worker_id)
+
+    await asyncio.gather(*[slot(i) for i in range(concurrency)])
+
+
+async def _process_job(queue: JobQueue, agent_app, job: Dict[str, Any], worker_id: str):
+    """
+    Runs one job through the graph, keeping its lease alive meanwhile.
+    If the lease is lost (another worker reclaimed the job), the run is
+    abandoned: its result would be dropped anyway.
+    """
+    job_id = job["job_id"]
+    payload = job["payload"]
+    logger.info(f"Job {job_id} claimed by {worker_id} (attempt {job['attempts']})")
+
+    heartbeat = asyncio.create_task(_keep_lease(queue, job_id, worker_id))
+    run = None
+    try:
+        initial_state = build_initial_state(
+            payload["document_url"], request_id=payload.get("request_id"), log_level=payload.get("log_level")
+        )
+        run = asyncio.create_task(agent_app.ainvoke(initial_state))
+        await asyncio.wait({run, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        if not run.done():
+            logger.warning(f"Job {job_id}: lease lost by {worker_id}; abandoning the run.")
+            return
+        response = build_response_payload(payload.get("request_id", "req_default"), run.result())
+        await asyncio.to_thread(queue.complete, job_id, worker_id, response)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        await asyncio.to_thread(queue.fail, job_id, worker_id, str(e))
+    finally:
+        tasks = [task for task in (run, heartbeat) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _keep_lease(queue: JobQueue, job_id: str, worker_id: str):
+    """Renews the lease at a third of its length; returns once this worker no longer holds the job."""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if not await asyncio.to_thread(queue.heartbeat, job_id, worker_id):
+            return
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Drain the extraction job queue.")
+    arg_parser.add_argument("--db", default=JOBS_DB_PATH, help="Path to the jobs SQLite file")
+    arg_parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    arg_parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = arg_parser.parse_args()
+    reconfigure_logger(log_file=WORKER_LOG_FILE)
+
+    try:
+        asyncio.run(run_worker(JobQueue(args.db), args.concurrency, stop_when_idle=args.once))
+    except KeyboardInterrupt:
+        # In-flight jobs keep status 'running' and are reclaimed after their lease expires
+        logger.info("Worker stopped.")
@@ -0,0 +1,110 @@
+# file: benchmarks/bench_docx.py
+"""
+Time and peak memory of reading a large .docx, before and after the
+streaming DOCX reader.
+
+    python -m benchmarks.bench_docx [--paragraphs 20000] [--rows 4000]
+
+"before" is the old file_reader path: python-docx's Document(), then
+every body paragraph (tables were dropped). "before, with tables" also walks
+the table cells, which is what python-docx would need to read the same text
+as the streaming reader. "after" is read_docx_text. Peak memory is taken with
+tracemalloc on a separate run so that tracing does not skew the timings.
+tracemalloc only sees Python allocations, not libxml2's, so the python-docx
+peak (which holds the whole lxml tree) is a lower bound.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from io import BytesIO
+from docx import Document
+
+from Xfrate2.parsers.docx_stream import read_docx_text, ROW_SEPARATOR
+
+CITIES = ["Delhi", "Mumbai", "Pune", "Chennai", "Kolkata", "Jaipur", "Nagpur", "Indore"]
+VEHICLES = ["32ft MXL HCV", "LCV 14ft", "Trailer 40ft", "20ft SXL"]
+
+
+def make_docx(paragraphs: int, rows: int, seed: int = 7) -> bytes:
+    """A dispatch plan: `paragraphs` lines of notes, then a 5-column lane table with `rows` rows."""
+    rng = random.Random(seed)
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Note {i}: load {rng.choice(CITIES)} to {rng.choice(CITIES)} before 10:00, "
+                          f"report at gate {rng.randint(1, 12)}.")
+    if rows:
+        table = doc.add_table(rows=rows + 1, cols=5)
+        cells = table._tbl.xpath("./w:tr/w:tc")   # one pass; table.cell() is O(rows) per call
+        header = ["Origin", "Destination", "Vehicle", "Weight", "Pickup"]
+        values = header + [
+            value
+            for _ in range(rows)
+            for value in (rng.choice(CITIES), rng.choice(CITIES), rng.choice(VEHICLES),
+                          f"{rng.randint(5, 30)} MT", f"2026-01-{rng.randint(1, 28):02d}")
+        ]
+        for tc, value in zip(cells, values):
+            tc.p_lst[0].add_r().text = value
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def read_before(data: bytes) -> str:
+    doc = Document(BytesIO(data))
+    return "\n".join([para.text for para in doc.paragraphs])
+
+
+def read_before_with_tables(data: bytes) -> str:
+    doc = Document(BytesIO(data))
+    lines = [para.text for para in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            lines.append(ROW_SEPARATOR.join(cell.text for cell in row.cells))
+    return "\n".join(lines)
+
+
+def read_after(data: bytes) -> str:
+    return read_docx_text(BytesIO(data))
+
+
+def _best_seconds(func, data: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_mib(func, data: bytes) -> float:
+    tracemalloc.start()
+    try:
+        func(data)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Streaming DOCX reader vs python-docx")
+    arg_parser.add_argument("--paragraphs", type=int, default=20000)
+    arg_parser.add_argument("--rows", type=int, default=4000, help="Rows in the lane table")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    data = make_docx(args.paragraphs, args.rows)
+    readers = [
+        ("python-docx, before", read_before),
+        ("python-docx, with tables", read_before_with_tables),
+        ("read_docx_text, after", read_after),
+    ]
+    print(f"{args.paragraphs} paragraphs + {args.rows}-row table, {len(data) / 2**20:.1f} MiB .docx")
+    for label, func in readers:
+        lines = func(data).count("\n") + 1
+        seconds = _best_seconds(func, data, args.repeat)
+        print(f"  {label:<26} {seconds * 1e3:9.1f} ms {_peak_mib(func, data):8.1f} MiB peak {lines:7d} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# file: benchmarks/bench_normalize.py
+"""
+Per-order cost of date / enum normalization, before and after the
+memoized normalize layer.
+
+    python -m benchmarks.bench_normalize [--orders 2000] [--distinct 20]
+
+"before" re-implements the old FTLOrder validators inline (dateutil on every
+value, substring chain on every enum); "after" is the current code.
+`--distinct` is how many different strings a column holds: tables repeat
+the same few dates and vehicle labels.
+"""
+import argparse
+import copy
+import random
+import time
+from dateutil import parser
+
+from Xfrate2.normalize import normalize_date
+from Xfrate2.state import FTLOrder, ENUM_TABLES
+
+DATE_SHAPES = ["2026-01-{day:02d} 09:00", "{day:02d}/01/2026 14:30", "{day} Jan 2026", "Jan {day}, 2026 10:15"]
+VEHICLES = ["HCV", "LCV Truck", "32ft MXL hcv", "Trailer", "lcv"]
+BODIES = ["Closed", "open truck", "Closed container", "Refrigerated body", "Open"]
+
+
+def _legacy_date(value):
+    try:
+        return parser.parse(str(value)).strftime("%Y-%m-%d %H:%M")
+    except Exception:
+        return value
+
+
+def _legacy_enum(value):
+    val_lower = value.lower()
+    if 'open' in val_lower: value = "Open"
+    elif 'close' in val_lower: value = "Closed"
+    elif 'ref' in val_lower: value = "Refrigerated"
+    if 'lcv' in val_lower: value = "LCV"
+    elif 'hcv' in val_lower: value = "HCV"
+    return value
+
+
+def make_orders(count: int, distinct: int, seed: int = 7):
+    rng = random.Random(seed)
+    dates = [rng.choice(DATE_SHAPES).format(day=rng.randint(1, 28)) for _ in range(distinct)]
+    field = lambda value: {"value": value, "confidence": 0.95, "reasoning": None}
+    return [
+        {
+            "vehicle_type": field(rng.choice(VEHICLES)),
+            "body_type": field(rng.choice(BODIES)),
+            "number_of_vehicle": field(1),
+            "total_weight": field(12.0),
+            "pickup_address": field("Okhla, Delhi"),
+            "destination_address": field("Bhiwandi, Mumbai"),
+            "product_category": field("FMCG"),
+            "product_description": field("Cartons"),
+            "pickup_date_and_time": field(rng.choice(dates)),
+            "expected_delivery_date_and_time": field(rng.choice(dates)),
+        }
+        for _ in range(count)
+    ]
+
+
+def bench_before(orders):
+    for order in orders:
+        for name in ("pickup_date_and_time", "expected_delivery_date_and_time"):
+            _legacy_date(order[name]["value"])
+        for name in ("vehicle_type", "body_type"):
+            _legacy_enum(order[name]["value"])
+
+
+def bench_after(orders):
+    for order in orders:
+        for name in ("pickup_date_and_time", "expected_delivery_date_and_time"):
+            normalize_date(str(order[name]["value"]))
+        for name in ("vehicle_type", "body_type"):
+            ENUM_TABLES[name].lookup(order[name]["value"])
+
+
+def _cold():
+    normalize_date.cache_clear()
+    for table in ENUM_TABLES.values():
+        table.lookup.cache_clear()
+
+
+def _per_order_us(func, orders, repeat: int, reset=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        func(orders)
+        best = min(best, time.perf_counter() - start)
+    return best / len(orders) * 1e6
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Date/enum normalization microbenchmarks")
+    arg_parser.add_argument("--orders", type=int, default=2000)
+    arg_parser.add_argument("--distinct", type=int, default=20, help="Distinct date strings per column")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    orders = make_orders(args.orders, args.distinct)
+    validate = lambda batch: [FTLOrder.model_validate(copy.deepcopy(order)) for order in batch]
+    copies = lambda batch: [copy.deepcopy(order) for order in batch]
+
+    rows = [
+        ("normalizers, before", _per_order_us(bench_before, orders, args.repeat)),
+        ("normalizers, after (cold cache)", _per_order_us(bench_after, orders, args.repeat, reset=_cold)),
+        ("normalizers, after (warm cache)", _per_order_us(bench_after, orders, args.repeat)),
+        ("FTLOrder.model_validate, after", _per_order_us(validate, orders, args.repeat)
+            - _per_order_us(copies, orders, args.repeat)),
+    ]
+    print(f"{args.orders} orders, {args.distinct} distinct dates per column")
+    for label, cost in rows:
+        print(f"  {label:<34} {cost:8.2f} us/order")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# file: benchmarks/corpus.py
+"""
+Synthetic document corpus for the offline benchmark suite.
+
+Every kind of document the service reads, at several sizes (orders per
+document). Generation is seeded, so a corpus is identical across runs and
+machines; files already on disk are reused.
+
+    pdf          text PDF, one free-text order per paragraph (LLM path)
+    pdf_table    text PDF holding a dispatch table (tabular fast path + LLM for messy rows)
+    scanned_pdf  image-only PDF pages (Vision path)
+    docx         Word document: free text plus a dispatch table
+    image        JPEG photo of an order sheet (Vision path)
+    csv / xlsx   spreadsheets streamed in row batches (sheet path)
+"""
+import io
+import os
+import csv
+import random
+import functools
+from typing import List, Dict
+
+SIZES = {"small": 5, "medium": 50, "large": 250}
+KINDS = ["pdf", "pdf_table", "scanned_pdf", "docx", "image", "csv", "xlsx"]
+EXTENSIONS = {"pdf_table": ".pdf", "scanned_pdf": ".pdf", "image": ".jpg"}
+
+# Share of table rows that only the LLM can read (the fast path rejects them)
+MESSY_ROW_SHARE = 0.3
+ORDERS_PER_PAGE = 10
+TABLE_HEADER = ["S.No", "Origin", "Destination", "Vehicle", "Body", "Qty", "Weight (MT)",
+                "Pickup Date", "Commodity", "Material"]
+
+_CITIES = ["Okhla, Delhi", "Bhiwandi, Mumbai", "Peenya, Bengaluru", "Sriperumbudur, Chennai",
+           "Chakan, Pune", "Manesar, Gurugram", "Sanand, Ahmedabad", "Uluberia, Howrah"]
+_PRODUCTS = [("FMCG", "Cartons of biscuits"), ("Electronics", "Boxed TVs"), ("Steel", "HR coils"),
+             ("Pharma", "Medicine cartons"), ("Textiles", "Cotton bales")]
+
+
+def build_corpus(directory: str, kinds: List[str] = None, sizes: List[str] = None, seed: int = 7) -> List[Dict]:
+    """
+    Writes the corpus into `directory` (skipping files that exist) and
+    returns one record per document: {"name", "kind", "size", "orders", "path"},
+    where "orders" is the number of orders the document actually holds.
+    """
+    os.makedirs(directory, exist_ok=True)
+    documents = []
+    for kind in kinds or KINDS:
+        for size in sizes or list(SIZES):
+            count = SIZES[size]
+            name = f"{kind}_{size}{EXTENSIONS.get(kind, '.' + kind)}"
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                rows = _orders(count, random.Random(f"{seed}:{kind}:{size}"))
+                data = _WRITERS[kind](rows)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+            orders = min(count, ORDERS_PER_PAGE) if kind == "image" else count
+            documents.append({"name": name, "kind": kind, "size": size, "orders": orders, "path": path})
+    return documents
+
+
+# --- ORDER CONTENT ---
+
+def _orders(count: int, rng: random.Random) -> List[Dict]:
+    orders = []
+    for number in range(1, count + 1):
+        origin, destination = rng.sample(_CITIES, 2)
+        category, description = rng.choice(_PRODUCTS)
+        orders.append({
+            "number": number,
+            "origin": origin,
+            "destination": destination,
+            "vehicle": rng.choice(["LCV", "HCV", "Trailer"]),
+            "body": rng.choice(["Open", "Closed"]),
+            "qty": rng.randint(1, 4),
+            "weight": rng.choice([2.5, 7.5, 12.0, 18.0, 25.0]),
+            "date": f"{rng.randint(1, 28):02d}/0{rng.randint(1, 9)}/2026",
+            "category": category,
+            "description": description,
+            "messy": rng.random() < MESSY_ROW_SHARE,
+        })
+    return orders
+
+
+def _paragraph(order: Dict) -> List[str]:
+    return [
+        f"Order {order['number']}: please arrange {order['qty']} {order['body'].lower()} body "
+        f"{order['vehicle']} truck(s) from {order['origin']}",
+        f"to {order['destination']} for pickup on {order['date']} 09:00. "
+        f"Cargo: {order['category']} - {order['description']}, about {order['weight']} MT.",
+        "",
+    ]
+
+
+def _table_row(order: Dict) -> List[str]:
+    vehicle = order["vehicle"]
+    if order["messy"]:
+        vehicle = f"{order['qty']}x {vehicle} ({order['body']} Body)"   # more than one field in a cell
+    return [str(order["number"]), order["origin"], order["destination"], vehicle, order["body"],
+            str(order["qty"]), str(order["weight"]), order["date"], order["category"], order["description"]]
+
+
+def _pages(lines_per_order: List[List[str]], header: List[str] = ()) -> List[List[str]]:
+    pages = []
+    for start in range(0, len(lines_per_order), ORDERS_PER_PAGE):
+        page = list(header)
+        for lines in lines_per_order[start:start + ORDERS_PER_PAGE]:
+            page.extend(lines)
+        pages.append(page)
+    return pages or [list(header)]
+
+
+# --- WRITERS ---
+
+def _write_pdf(orders: List[Dict]) -> bytes:
+    return _text_pdf(_pages([_paragraph(order) for order in orders], ["Transport requirement", ""]))
+
+
+def _write_pdf_table(orders: List[Dict]) -> bytes:
+    header = ["Dispatch plan", " | ".join(TABLE_HEADER)]
+    return _text_pdf(_pages([[" | ".join(_table_row(order))] for order in orders], header))
+
+
+def _write_scanned_pdf(orders: List[Dict]) -> bytes:
+    images = [_render(page) for page in _pages([_paragraph(order) for order in orders])]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=100)
+    return out.getvalue()
+
+
+def _write_docx(orders: List[Dict]) -> bytes:
+    from docx import Document
+    document = Document()
+    document.add_paragraph("Transport requirement")
+    half = len(orders) // 2
+    for order in orders[:half]:
+        document.add_paragraph(" ".join(_paragraph(order)).strip())
+    table = document.add_table(rows=1, cols=len(TABLE_HEADER))
+    for cell, text in zip(table.rows[0].cells, TABLE_HEADER):
+        cell.text = text
+    for order in orders[half:]:
+        for cell, text in zip(table.add_row().cells, _table_row(order)):
+            cell.text = text
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def _write_image(orders: List[Dict]) -> bytes:
+    # Size scales the photo (up to 2x), not the order count: one page of orders
+    lines = [line for order in orders[:ORDERS_PER_PAGE] for line in _paragraph(order)]
+    scale = min(2.0, 1 + len(orders) / (2 * SIZES["medium"]))
+    image = _render(lines).resize((int(1240 * scale), int(1754 * scale)))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def _write_csv(orders: List[Dict]) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(TABLE_HEADER)
+    writer.writerows(_table_row(order) for order in orders)
+    return out.getvalue().encode("utf-8")
+
+
+def _write_xlsx(orders: List[Dict]) -> bytes:
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Orders")
+    sheet.append(TABLE_HEADER)
+    for order in orders:
+        sheet.append(_table_row(order))
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+_WRITERS = {
+    "pdf": _write_pdf,
+    "pdf_table": _write_pdf_table,
+    "scanned_pdf": _write_scanned_pdf,
+    "docx": _write_docx,
+    "image": _write_image,
+    "csv": _write_csv,
+    "xlsx": _write_xlsx,
+}
+
+
+# --- HELPER FUNCTIONS ---
+
+@functools.lru_cache(maxsize=1)
+def _paper():
+    """A4 at 150 dpi; the noise keeps pages from compressing like blank ones (a 'photo')."""
+    from PIL import Image
+    return Image.effect_noise((1240, 1754), 12).convert("RGB").point(lambda v: 200 + v // 5)
+
+
+def _render(lines: List[str]):
+    """One page with the lines drawn on it."""
+    from PIL import ImageDraw
+    image = _paper().copy()
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((80, 80 + 22 * index), line, fill=(20, 20, 20))
+    return image
+
+
+def _text_pdf(pages: List[List[str]]) -> bytes:
+    """Minimal PDF with a Helvetica text layer, one content stream per page."""
+    objects: List[bytes] = []
+    page_ids = []
+    font_id = 3
+    objects.append(b"")   # 1: catalog (filled below)
+    objects.append(b"")   # 2: page tree (filled below)
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for lines in pages:
+        text = "".join(f"({_pdf_escape(line)}) '\n" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td\n{text}ET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (content_id, font_id)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -0,0 +1,228 @@
+# file: benchmarks/mock_azure.py
+"""
+Local stand-ins for the network: an Azure OpenAI chat-completions endpoint
+and a plain file server for `document_url`. Both run on 127.0.0.1 in
+daemon threads, so the suite needs no network and no credentials.
+
+The Azure stand-in answers `POST .../openai/deployments/<name>/chat/completions`
+with a canned Structured Outputs response in the shape the request asked for
+(full, lean or columnar profile, by json_schema name):
+  - table rows in the prompt ('a | b | c' lines) -> one order per data row
+  - free-text orders of the benchmark corpus       -> one order per 'Order N:' paragraph
+    (both add up when a prompt holds both)
+  - anything else (other text, images)             -> `orders_per_response` orders
+Orders are derived from their number (S.No cell / 'Order N'), so an order
+seen by two overlapping chunks comes back identical, as from the real model.
+Latency, jitter, per-order generation time and a 429 rate are configurable.
+"""
+import re
+import json
+import time
+import random
+import threading
+import functools
+import http.server
+from typing import Dict, Any, List, Optional, Tuple
+
+FIELD_VALUES = {
+    "vehicle_type": ["LCV", "HCV", "Trailer"],
+    "body_type": ["Closed", "Open"],
+    "number_of_vehicle": [1, 2],
+    "total_weight": [7.5, 12.0, 18.0],
+    "pickup_address": ["Okhla, Delhi", "Chakan, Pune", "Peenya, Bengaluru"],
+    "destination_address": ["Bhiwandi, Mumbai", "Sanand, Ahmedabad"],
+    "product_category": ["FMCG", "Electronics"],
+    "product_description": ["Cartons of biscuits", "Boxed TVs"],
+    "pickup_date_and_time": ["2026-01-15 09:00", "2026-01-16 10:30"],
+    "expected_delivery_date_and_time": [None],
+    "vehicle_size": [None],
+    "pod_type": [None],
+    "shippers_note": [None],
+}
+MAX_ROWS_PER_RESPONSE = 1000
+# How the corpus (corpus.py) opens each free-text order
+ORDER_PARAGRAPH = re.compile(r"^\s*Order (\d+):", re.MULTILINE)
+# Document header the chunker repeats in front of later chunks (chunker.py): context, not orders
+CARRIED_CONTEXT = re.compile(r"\[Context carried over[^\n]*\].*?\[End of context\]", re.DOTALL)
+
+
+class MockAzureOpenAI:
+    """
+    Threaded HTTP server mimicking Azure OpenAI chat completions.
+    Use as a context manager; `endpoint` goes into AZURE_OPENAI_ENDPOINT.
+    """
+
+    def __init__(self, latency_ms: float = 150, jitter_ms: float = 50, ms_per_order: float = 5,
+                 orders_per_response: int = 3, error_rate: float = 0.0, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_order = ms_per_order
+        self.orders_per_response = orders_per_response
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "orders": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_AzureHandler, self))
+        self._server.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "MockAzureOpenAI":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- Request handling (called from the handler threads) ---
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+        with self._lock:
+            self.stats["requests"] += 1
+            number = self.stats["requests"]
+            throttled = self._random.random() < self.error_rate
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if throttled:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            error = {"error": {"code": "429", "message": "Rate limit is exceeded. Try again shortly."}}
+            return 429, {"retry-after-ms": "50"}, error
+
+        schema_name = ((body.get("response_format") or {}).get("json_schema") or {}).get("name", "FTLOrderResponse")
+        prompt = _prompt_text(body.get("messages", []))
+        numbers = _order_numbers(prompt) or list(range(self.orders_per_response))
+        count = len(numbers)
+        content = json.dumps(canned_response(schema_name, count, numbers))
+
+        time.sleep(max(0.0, delay + self.ms_per_order * count) / 1000)
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(content) // 4
+        with self._lock:
+            self.stats["orders"] += count
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        return 200, {}, {
+            "id": f"chatcmpl-mock-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "logprobs": None,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def canned_response(schema_name: str, count: int, numbers: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    `count` valid orders in the shape of the requested response schema.
+    Each is derived from its order number (default 0..count-1); distinct numbers give distinct orders.
+    """
+    orders = []
+    for number in numbers or range(count):
+        order = {field: values[number % len(values)] for field, values in FIELD_VALUES.items()}
+        order["total_weight"] = round(order["total_weight"] + number / 100, 2)
+        orders.append(order)
+    if schema_name == "ColumnarOrderResponse":
+        columns = list(FIELD_VALUES)
+        return {
+            "columns": columns,
+            "rows": [
+                {"values": [order[c] for c in columns], "confidence": [0.0 if order[c] is None else 0.95 for c in columns]}
+                for order in orders
+            ],
+        }
+    lean = schema_name == "LeanOrderResponse"
+    return {"orders": [
+        {
+            field: ({"value": value, "confidence": 0.0 if value is None else 0.95}
+                    if lean else {"value": value, "confidence": 0.0 if value is None else 0.95, "reasoning": None})
+            for field, value in order.items()
+        }
+        for order in orders
+    ]}
+
+
+class FileServer:
+    """Serves a directory over HTTP (quietly); `base_url` + '/' + file name is a document_url."""
+
+    def __init__(self, directory: str):
+        handler = functools.partial(_QuietFileHandler, directory=directory)
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "FileServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# --- HELPER FUNCTIONS ---
+
+class _AzureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, as the real endpoint
+
+    def __init__(self, mock: MockAzureOpenAI, *args, **kwargs):
+        self.mock = mock
+        super().__init__(*args, **kwargs)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            status, headers, payload = 404, {}, {"error": {"code": "404", "message": "Resource not found"}}
+        else:
+            status, headers, payload = self.mock.respond(body)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _QuietFileHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    """Text of the last user message (image parts are skipped)."""
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, list):
+            return "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return content or ""
+    return ""
+
+
+def _order_numbers(text: str) -> List[int]:
+    """
+    Numbers of the orders the prompt visibly holds: 'Order N:' paragraphs
+    (outside carried context), then the data rows of its ' | ' table
+    (header excluded, carried or not), by their S.No cell when they have one.
+    """
+    numbers = [int(number) for number in ORDER_PARAGRAPH.findall(CARRIED_CONTEXT.sub("", text))]
+    rows = [line for line in text.splitlines() if line.count("|") >= 2][1:]
+    for position, row in enumerate(rows, start=1):
+        first_cell = row.split("|")[0].strip()
+        numbers.append(int(first_cell) if first_cell.isdigit() else position)
+    return numbers[:MAX_ROWS_PER_RESPONSE]
@@ -0,0 +1,298 @@
+# file: benchmarks/run_suite.py
+"""
+Offline end-to-end benchmark of the extraction graph.
+
+Every corpus document (see corpus.py) is downloaded from a local file
+server and run through the async graph, as server.py does, against a
+local Azure OpenAI stand-in (mock_azure.py). No network, no credentials,
+no quota: runnable in CI.
+
+Each scenario (one document kind at one size) runs in its own process, so
+its peak RSS is its own. The first document of a scenario warms the process
+up and is not measured. Reported per scenario: docs/sec, end-to-end latency
+(p50/p95/max), per-node latency, LLM requests and tokens, peak RSS, and the
+orders found against the orders the corpus document holds.
+
+The stand-in answers with as many orders as the prompt visibly holds, so a
+text document yielding a different count is a correctness regression and
+fails the run. Image kinds are only reported: the stand-in cannot read pixels.
+
+    python -m benchmarks.run_suite --quick                       # CI
+    python -m benchmarks.run_suite --sizes small,medium --docs 8 --concurrency 4
+    python -m benchmarks.run_suite --json bench.json --baseline main.json --tolerance 0.25
+
+With --baseline, the run fails (exit 1) when a scenario's docs/sec falls, or
+its peak RSS grows, by more than --tolerance compared to the baseline JSON.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import functools
+import subprocess
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.corpus import build_corpus, KINDS, SIZES
+from benchmarks.mock_azure import MockAzureOpenAI, FileServer
+
+# Service configuration for a benchmark process (set before Xfrate2 is imported)
+SUITE_ENV = {
+    "AZURE_OPENAI_KEY": "offline-benchmark",
+    "CHAT_COMPLETION_NAME": "gpt-4o",
+    "EXTRACTION_CACHE_ENABLED": "false",   # every document must reach the LLM stand-in
+    "REPLAY_STORE_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",         # the stand-in has no quota (--rate-limit keeps the limiter)
+}
+QUICK = {"sizes": "small", "docs": 4, "concurrency": 2, "latency_ms": 20, "jitter_ms": 5, "ms_per_order": 1}
+# Kinds the stand-in sees as images: their order counts are not checked
+VISION_KINDS = {"scanned_pdf", "image"}
+
+
+def run_scenario(document: Dict[str, Any], docs: int, concurrency: int, workdir: str,
+                 mock: Dict[str, Any], rate_limit: bool = False) -> Dict[str, Any]:
+    """
+    Benchmarks one corpus document in THIS process (a fresh one: the service
+    reads its configuration at import). Returns the scenario's result.
+    """
+    os.environ.update(SUITE_ENV)
+    if rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "true"
+    os.chdir(workdir)   # agent.log and the download cache stay out of the repo
+
+    with MockAzureOpenAI(**mock) as azure, FileServer(os.path.dirname(document["path"])) as files:
+        os.environ["AZURE_OPENAI_ENDPOINT"] = azure.endpoint
+        from Xfrate2.main import build_agent, build_initial_state
+
+        timings = defaultdict(list)
+        agent = build_agent(async_mode=True, wrap_node=functools.partial(_timed, timings))
+        url = f"{files.base_url}/{document['name']}"
+        latencies, counts, failures, seconds = asyncio.run(
+            _run_documents(agent, build_initial_state, url, docs, concurrency, timings, azure)
+        )
+        llm = dict(azure.stats)
+
+    return {
+        "name": document["name"],
+        "kind": document["kind"],
+        "size": document["size"],
+        "docs": docs,
+        "concurrency": concurrency,
+        "failed": failures,
+        "seconds": round(seconds, 3),
+        "docs_per_sec": round(docs / seconds, 2) if seconds else None,
+        "latency_ms": _summary(latencies),
+        "nodes": {name: {"calls": len(values), **_summary(values)} for name, values in sorted(timings.items())},
+        "orders_per_doc": round(sum(counts) / docs, 1),
+        "expected_orders": document["orders"],
+        # Documents whose order count differs from the corpus (None: not checked)
+        "order_mismatches": (None if document["kind"] in VISION_KINDS
+                             else sum(1 for count in counts if count != document["orders"])),
+        "llm": llm,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+async def _run_documents(agent, build_initial_state, url: str, docs: int, concurrency: int,
+                         timings: Dict[str, List[float]], azure: MockAzureOpenAI):
+    # Warm-up document (imports, connection pools, lazy clients): not measured
+    await agent.ainvoke(build_initial_state(url))
+    timings.clear()
+    for key in azure.stats:
+        azure.stats[key] = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, counts, failures = [], [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await agent.ainvoke(build_initial_state(url))
+            except Exception as e:
+                print(f"Document failed: {e!r}", file=sys.stderr)
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - started)
+            count = len(result.get("final_orders", [])) + len(result.get("needs_review", []))
+            counts.append(count)
+            if not count:
+                failures += 1   # a document that yields nothing is a broken pipeline here
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(docs)])
+    return latencies, counts, failures, time.perf_counter() - started
+
+
+def _timed(timings: Dict[str, List[float]], name: str, node):
+    """build_agent wrap_node hook: records each call's duration under the node name."""
+    @functools.wraps(node)
+    async def wrapper(state):
+        started = time.perf_counter()
+        try:
+            return await node(state)
+        finally:
+            timings[name].append(time.perf_counter() - started)
+    return wrapper
+
+
+# --- SUITE (parent process) ---
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark (local LLM stand-in).")
+    parser.add_argument("--quick", action="store_true", help="CI preset: small documents, short latencies")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Document kinds, comma separated")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="Document sizes, comma separated")
+    parser.add_argument("--docs", type=int, default=8, help="Measured documents per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=150, help="LLM stand-in base latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--ms-per-order", type=float, default=5, help="LLM stand-in generation time per order")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of LLM requests answered with 429")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the client-side rate limiter on")
+    parser.add_argument("--workdir", help="Corpus and scratch directory (default: a temp dir)")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression vs the baseline")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)      # child process: one document
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.quick:
+        for key, value in QUICK.items():
+            setattr(args, key, value)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="xfrate-bench-"))
+    documents = build_corpus(os.path.join(workdir, "corpus"), _split(args.kinds), _split(args.sizes))
+    mock = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "ms_per_order": args.ms_per_order, "error_rate": args.error_rate}
+
+    if args.scenario:
+        document = next(d for d in documents if d["name"] == args.scenario)
+        result = run_scenario(document, args.docs, args.concurrency, workdir, mock, args.rate_limit)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    results = [_run_isolated(document, args, workdir) for document in documents]
+    report = {"settings": {**mock, "docs": args.docs, "concurrency": args.concurrency,
+                           "rate_limit": args.rate_limit, "python": sys.version.split()[0]},
+              "scenarios": results}
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    problems = [f"{r['name']}: {r['error']}" for r in results if r.get("error")]
+    problems += [f"{r['name']}: {r['failed']} failed documents" for r in results if r.get("failed")]
+    problems += [f"{r['name']}: {r['order_mismatches']} documents without the {r['expected_orders']} orders "
+                 f"they hold ({r['orders_per_doc']} per document)" for r in results if r.get("order_mismatches")]
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems += _regressions(json.load(f), report, args.tolerance)
+    for problem in problems:
+        print(f"FAIL {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+def _run_isolated(document: Dict[str, Any], args, workdir: str) -> Dict[str, Any]:
+    """One scenario in a child process; its output goes to <workdir>/<name>.log."""
+    result_file = os.path.join(workdir, f"{document['name']}.result.json")
+    command = [
+        sys.executable, "-m", "benchmarks.run_suite", "--scenario", document["name"],
+        "--result-file", result_file, "--workdir", workdir,
+        "--kinds", document["kind"], "--sizes", document["size"],
+        "--docs", str(args.docs), "--concurrency", str(args.concurrency),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--ms-per-order", str(args.ms_per_order), "--error-rate", str(args.error_rate),
+    ] + (["--rate-limit"] if args.rate_limit else [])
+    log_path = os.path.join(workdir, f"{document['name']}.log")
+    with open(log_path, "w") as log:
+        finished = subprocess.run(command, cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT)
+    if finished.returncode != 0 or not os.path.exists(result_file):
+        with open(log_path) as log:
+            tail = log.read()[-1500:]
+        return {"name": document["name"], "kind": document["kind"], "size": document["size"],
+                "error": f"exit code {finished.returncode}, see {log_path}\n{tail}"}
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def _regressions(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float) -> List[str]:
+    before = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    problems = []
+    for scenario in report["scenarios"]:
+        old = before.get(scenario["name"])
+        if not old or scenario.get("error") or old.get("error"):
+            continue
+        if old.get("docs_per_sec") and scenario["docs_per_sec"] < old["docs_per_sec"] * (1 - tolerance):
+            problems.append(f"{scenario['name']}: {scenario['docs_per_sec']} docs/s vs {old['docs_per_sec']} baseline")
+        if old.get("peak_rss_mb") and scenario["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{scenario['name']}: peak RSS {scenario['peak_rss_mb']} MB vs {old['peak_rss_mb']} baseline")
+    return problems
+
+
+def _print_report(report: Dict[str, Any]):
+    settings = report["settings"]
+    print(f"LLM stand-in {settings['latency_ms']}±{settings['jitter_ms']} ms (+{settings['ms_per_order']} ms/order), "
+          f"{settings['docs']} docs per scenario, concurrency {settings['concurrency']}")
+    print(f"{'scenario':26}{'docs/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'LLM req':>9}{'orders':>8}{'expect':>8}{'RSS MB':>8}")
+    for r in report["scenarios"]:
+        if r.get("error"):
+            print(f"{r['name']:26}  ERROR {r['error'].splitlines()[0]}")
+            continue
+        print(f"{r['name']:26}{r['docs_per_sec']:>8}{r['latency_ms']['p50_ms']:>9}{r['latency_ms']['p95_ms']:>9}"
+              f"{r['llm']['requests']:>9}{r['orders_per_doc']:>8}{_expected(r):>8}{r['peak_rss_mb']:>8}")
+    print("Per-node p50 ms:")
+    for r in report["scenarios"]:
+        if not r.get("error"):
+            print(f"  {r['name']:24}" + "  ".join(f"{name.replace('_node', '')}={node['p50_ms']}"
+                                                   for name, node in r["nodes"].items()))
+
+
+# --- HELPER FUNCTIONS ---
+
+def _expected(result: Dict[str, Any]) -> str:
+    """Orders the document holds; '~' where the count is not checked, '!' where it was wrong."""
+    mark = "~" if result.get("order_mismatches") is None else ("!" if result["order_mismatches"] else "")
+    return f"{mark}{result.get('expected_orders')}"
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _summary(seconds: List[float]) -> Dict[str, Optional[float]]:
+    if not seconds:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None, "mean_ms": None}
+    ordered = sorted(seconds)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": round(ordered[-1] * 1000, 1),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1)}
+
+
+def _peak_rss_mb() -> float:
+    # Linux: VmHWM starts afresh at exec; ru_maxrss would carry over the parent's peak
+    # (the suite process, which built the corpus)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,34 @@
 # file: server.py
+import os
+import asyncio
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
-from Xfrate2.utils import logger
-from Xfrate2.main import build_agent # Ensure main.py has build_agent() exposed
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Response
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, Dict, Any, List, Literal
+from Xfrate2.utils import logger, load_env, request_context
+load_env()   # before the modules below read their configuration
+from Xfrate2.main import get_agent, build_initial_state, build_response_payload # Ensure main.py has get_agent() exposed
+from Xfrate2.jobs import JobQueue
+from Xfrate2.cache import extraction_cache
+from Xfrate2.nodes.extractor import cache_key_for, CACHE_BRANCHES
+from Xfrate2.downloader import MAX_DOCUMENT_BYTES, DocumentTooLargeError
+from Xfrate2.nodes.file_reader import LocalFileNotAllowedError
+from Xfrate2.rate_limit import rate_limiter
+from Xfrate2.replay import replay_store, replay_runs
+from Xfrate2.warmup import warmup
+from Xfrate2.metrics import registry as metrics_registry
+
+# --- CONFIGURATION ---
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "500"))
 
 # --- API Models ---
 class ExtractionRequest(BaseModel):
     document_url: str
     request_id: Optional[str] = "req_default"
+    # Log level for this request only (e.g. DEBUG to trace one document); default LOG_LEVEL
+    log_level: Optional[Literal["DEBUG", "INFO", "WARNING", "ERROR"]] = None
 
 class ExtractionResponse(BaseModel):
     status: str
@@ -17,54 +36,243 @@ class ExtractionResponse(BaseModel):
     metrics: Dict[str, int]
     successful_orders: List[Dict[str, Any]]
     orders_requiring_review: List[Dict[str, Any]]
+    error: Optional[str] = None
+
+class BatchExtractionRequest(BaseModel):
+    documents: List[ExtractionRequest]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+class BatchExtractionResponse(BaseModel):
+    status: str
+    metrics: Dict[str, int]
+    results: List[ExtractionResponse]
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    request_id: Optional[str] = None
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[ExtractionResponse] = None
+
+class ReplayRequest(BaseModel):
+    confidence_threshold: Optional[float] = Field(default=None, ge=0, le=1)
+    required_fields: Optional[List[str]] = None
+    prompt_version: Optional[str] = None
+    limit: Optional[int] = Field(default=None, ge=1)
 
 # --- App Setup ---
-app = FastAPI(title="FTL Extraction Agent", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The graph (async nodes), LLM client and parsers are loaded lazily; warm up what this
+    # deployment needs in the background. The port opens at once and /ready reports when warm.
+    logger.info("Initializing AI Agent...")
+    app.state.warmup = asyncio.create_task(asyncio.to_thread(warmup))
+    yield
 
-# Build the Graph once on startup
-logger.info("Initializing AI Agent...")
-agent_app = build_agent()
+app = FastAPI(title="FTL Extraction Agent", version="1.0", lifespan=lifespan)
+
+# Durable queue for long-running documents (drained by `python -m Xfrate2.worker`)
+job_queue = JobQueue()
+
+@app.get("/ready")
+async def ready_endpoint():
+    """Readiness probe: 200 once the warmup hook has preloaded this deployment's components."""
+    task = getattr(app.state, "warmup", None)
+    if task is None or not task.done():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready", "warmup_seconds": task.result()}
 
 @app.post("/extract", response_model=ExtractionResponse)
 async def extract_endpoint(payload: ExtractionRequest):
-    logger.info(f"Received Request: {payload.request_id}")
-    
-    # 1. Prepare Initial State
-    initial_state = {
-        "document_url": payload.document_url,
-        "file_path": "", # Will be handled by Node 1
-        "extracted_text": "",
-        "file_type": "",
-        "raw_extraction": {},
-        "validation_errors": [],
-        "final_orders": [],
-        "needs_review": []
-    }
+    with request_context(payload.request_id, payload.log_level):
+        logger.info(f"Received Request: {payload.request_id}")
+
+        try:
+            return await _run_agent(payload)
+
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        except LocalFileNotAllowedError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+
+        except Exception as e:
+            logger.error(f"Processing failed: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/extract/upload", response_model=ExtractionResponse)
+async def extract_upload_endpoint(file: UploadFile = File(...), request_id: str = Form("req_default"),
+                                  log_level: Optional[str] = Form(None)):
+    """
+    Same as /extract, but the document arrives as a multipart upload.
+    The bytes go straight to the parsers, no download and no temp file
+    (the upload itself is only spooled to disk by Starlette past 1 MB).
+    """
+    logger.info(f"Received Upload: {request_id} ({file.filename})")
+
+    # Read in chunks so an oversized body is rejected without buffering it all
+    chunks = []
+    size = 0
+    while chunk := await file.read(1024 * 1024):
+        size += len(chunk)
+        if size > MAX_DOCUMENT_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_DOCUMENT_BYTES} bytes")
+        chunks.append(chunk)
 
     try:
-        # 2. Run the Agent
-        result = agent_app.invoke(initial_state)
-        
-        # 3. Format Response
-        success_list = result.get("final_orders", [])
-        review_list = result.get("needs_review", [])
-        
-        return ExtractionResponse(
-            status="completed",
-            request_id=payload.request_id,
-            metrics={
-                "total_found": len(success_list) + len(review_list),
-                "success": len(success_list),
-                "needs_review": len(review_list)
-            },
-            successful_orders=success_list,
-            orders_requiring_review=review_list
+        payload = ExtractionRequest(
+            document_url=f"upload://{file.filename or 'document.pdf'}", request_id=request_id, log_level=log_level
         )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    with request_context(payload.request_id, payload.log_level):
+        try:
+            return await _run_agent(payload, document_bytes=b"".join(chunks))
 
-    except Exception as e:
-        logger.error(f"Processing failed: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            logger.error(f"Processing failed: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/extract/batch", response_model=BatchExtractionResponse)
+async def extract_batch_endpoint(payload: BatchExtractionRequest):
+    """
+    Runs the agent over many documents concurrently.
+    At most `max_concurrency` graphs are in flight at once; a failing
+    document is reported in its own result and never fails the batch.
+    """
+    if len(payload.documents) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload.documents)} > {BATCH_MAX_DOCUMENTS} documents"
+        )
+
+    concurrency = min(payload.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    logger.info(f"Received Batch: {len(payload.documents)} documents (concurrency={concurrency})")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(doc: ExtractionRequest) -> ExtractionResponse:
+        async with semaphore:
+            try:
+                with request_context(doc.request_id, doc.log_level):
+                    return await _run_agent(doc)
+            except Exception as e:
+                logger.error(f"Batch item {doc.request_id} failed: {e}", exc_info=True)
+                return ExtractionResponse(
+                    status="failed",
+                    request_id=doc.request_id,
+                    metrics={"total_found": 0, "success": 0, "needs_review": 0},
+                    successful_orders=[],
+                    orders_requiring_review=[],
+                    error=str(e)
+                )
+
+    results = await asyncio.gather(*[run_one(doc) for doc in payload.documents])
+
+    # Aggregate the per-document metrics block across the batch
+    metrics = {"total_found": 0, "success": 0, "needs_review": 0}
+    for result in results:
+        for key in metrics:
+            metrics[key] += result.metrics.get(key, 0)
+    metrics["documents"] = len(results)
+    metrics["documents_failed"] = sum(1 for r in results if r.status == "failed")
+
+    return BatchExtractionResponse(
+        status="completed",
+        metrics=metrics,
+        results=results
+    )
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job_endpoint(payload: ExtractionRequest):
+    """
+    Queues a document for background extraction and returns immediately.
+    Poll GET /jobs/{job_id} for the result.
+    """
+    job_id = await asyncio.to_thread(job_queue.submit, payload.model_dump())
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_endpoint(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    return JobStatusResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        request_id=job["payload"].get("request_id"),
+        attempts=job["attempts"],
+        error=job["error"],
+        result=job["result"]
+    )
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    """Hit/miss counters of the extraction cache (this process)."""
+    return extraction_cache.stats()
+
+@app.get("/rate-limit/stats")
+async def rate_limit_stats_endpoint():
+    """Azure OpenAI limiter: queued requests, queue wait time and 429s (this process)."""
+    return rate_limiter.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus scrape target: per-node latency and outcome, LLM attempts,
+    retries, request latency and token usage, by file type and deployment (this process).
+    """
+    return Response(content=metrics_registry.render(), media_type=metrics_registry.content_type)
+
+@app.post("/replay")
+async def replay_endpoint(payload: ReplayRequest):
+    """
+    Re-validates stored extractions with candidate settings (no LLM calls)
+    and returns the success / review diff. See `python -m Xfrate2.replay`.
+    """
+    return await asyncio.to_thread(
+        replay_runs, replay_store,
+        confidence_threshold=payload.confidence_threshold,
+        required_fields=payload.required_fields,
+        prompt_version=payload.prompt_version,
+        limit=payload.limit,
+    )
+
+@app.delete("/cache")
+async def cache_invalidate_endpoint(content_hash: Optional[str] = None):
+    """
+    Drops the cached extraction for one document (sha256 of its bytes),
+    or the whole cache when no content_hash is given.
+    """
+    if not content_hash:
+        removed = await asyncio.to_thread(extraction_cache.invalidate, None)
+        return {"removed": removed}
+    removed = 0
+    # Text, scanned-page and residual-text results of a document are cached separately
+    for branch in CACHE_BRANCHES:
+        removed += await asyncio.to_thread(extraction_cache.invalidate, cache_key_for(content_hash, branch))
+    return {"removed": removed}
+
+# --- HELPERS ---
+
+async def _run_agent(payload: ExtractionRequest, document_bytes: Optional[bytes] = None) -> ExtractionResponse:
+    """Runs the graph for one request and formats the API response."""
+    # 1. Prepare Initial State
+    initial_state = build_initial_state(
+        payload.document_url, document_bytes, request_id=payload.request_id, log_level=payload.log_level
+    )
+
+    # 2. Run the Agent
+    result = await get_agent(async_mode=True).ainvoke(initial_state)
+    
+    # 3. Format Response
+    return ExtractionResponse(**build_response_payload(payload.request_id, result))
 
 if __name__ == "__main__":
     # Start the server locally
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)